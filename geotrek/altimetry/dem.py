@@ -0,0 +1,187 @@
+"""
+Memory-mapped copy of the DEM (``mnt`` raster table), to sample elevations
+in Python instead of querying the raster for each point.
+
+The copy is a single file: a JSON header, followed by elevations as float32
+values, stored by square tiles. Nodata pixels, and pixels not covered by the
+DEM tiles, are stored as NaN. It is mapped read-only, thus shared between
+processes through the system page cache.
+"""
+import os
+import sys
+import json
+import math
+import mmap
+import array
+import struct
+import logging
+
+from django.conf import settings
+from django.db import connection
+
+
+logger = logging.getLogger(__name__)
+
+NAN = float('nan')
+
+
+# PostGIS raster pixel types (c.f. WKB raster format)
+PIXEL_TYPES = {3: 'b', 4: 'B', 5: 'h', 6: 'H', 7: 'i', 8: 'I', 10: 'f', 11: 'd'}
+
+
+def parse_wkb_raster(wkb, nodata=None):
+    """
+    Returns (upper left x, upper left y, width, height, values) of the first
+    band of a raster in WKB format (``ST_AsBinary()``), values being an
+    ``array`` of rows (or a list if ``nodata`` is None). Nodata values are
+    replaced by ``nodata``.
+    """
+    endian = '<' if ord(wkb[0]) == 1 else '>'
+    (version, nbands, scalex, scaley, ipx, ipy,
+     skewx, skewy, srid, width, height) = struct.unpack_from(endian + 'HHddddddiHH', wkb, 1)
+    offset = 61
+    flags = ord(wkb[offset])
+    code = PIXEL_TYPES[flags & 0x0F]
+    size = struct.calcsize(code)
+    nodata_value = struct.unpack_from(endian + code, wkb, offset + 1)[0]
+    offset += 1 + size
+    values = array.array(code, wkb[offset:offset + width * height * size])
+    if (endian == '<') != (sys.byteorder == 'little'):
+        values.byteswap()
+    if flags & 0x40:
+        values = [nodata if v == nodata_value else v for v in values]
+        if nodata is not None:
+            values = array.array(code, values)
+    return ipx, ipy, width, height, values
+
+
+class DEM(object):
+    HEADER_SIZE = 4096
+    TILE_SIZE = 256
+
+    _current = None
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = json.loads(f.read(self.HEADER_SIZE).rstrip('\0'))
+            self.mtime = os.fstat(f.fileno()).st_mtime
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.xmin = header['xmin']
+        self.ymax = header['ymax']
+        self.resolution = header['resolution']
+        self.width = header['width']
+        self.height = header['height']
+        self.tile = header['tile']
+        self.ntiles = int(math.ceil(self.width / float(self.tile)))
+        self._value = struct.Struct('=f').unpack_from
+
+    @classmethod
+    def get(cls):
+        """
+        Returns the DEM copy of ``settings.ALTIMETRIC_DEM_CACHE``, opened once
+        per process and reopened when rebuilt. Returns None if there is none.
+        """
+        path = settings.ALTIMETRIC_DEM_CACHE
+        if not path or not os.path.exists(path):
+            return None
+        current = cls._current
+        if current is None or current.path != path or current.mtime != os.path.getmtime(path):
+            current = cls._current = cls(path)
+        return current
+
+    @classmethod
+    def build(cls, path=None):
+        """
+        Copy the DEM from ``mnt`` table to the file specified (by default
+        ``settings.ALTIMETRIC_DEM_CACHE``). Returns False if there is no DEM.
+        """
+        path = path or settings.ALTIMETRIC_DEM_CACHE
+        cursor = connection.cursor()
+        cursor.execute("SELECT 1 FROM raster_columns WHERE r_table_name = 'mnt'")
+        if cursor.fetchone() is None:
+            return False
+        cursor.execute("""
+        SELECT ST_XMin(e), ST_YMax(e), ST_XMax(e), ST_YMin(e),
+               (SELECT ST_ScaleX(rast) FROM mnt LIMIT 1)
+        FROM (SELECT ST_Extent(ST_Envelope(rast)) AS e FROM mnt) AS extent
+        """)
+        xmin, ymax, xmax, ymin, resolution = cursor.fetchone()
+        if xmin is None:
+            return False
+        tile = cls.TILE_SIZE
+        width = int(round((xmax - xmin) / resolution))
+        height = int(round((ymax - ymin) / resolution))
+        ntiles = int(math.ceil(width / float(tile)))
+        size = ntiles * int(math.ceil(height / float(tile))) * tile * tile * 4
+        header = json.dumps({'xmin': xmin, 'ymax': ymax, 'resolution': resolution,
+                             'width': width, 'height': height, 'tile': tile})
+
+        # Write a new file, and replace the current one atomically
+        tmppath = '%s.%s' % (path, os.getpid())
+        with open(tmppath, 'w+b') as f:
+            f.write(header.ljust(cls.HEADER_SIZE, '\0'))
+            # Pixels not covered by the DEM tiles are unknown
+            nantile = (array.array('f', [NAN]) * (tile * tile)).tostring()
+            for k in xrange(size // len(nantile)):
+                f.write(nantile)
+            f.flush()
+            data = mmap.mmap(f.fileno(), 0)
+            lastrid = 0
+            while True:
+                cursor.execute("SELECT rid, ST_AsBinary(rast) FROM mnt WHERE rid > %s ORDER BY rid LIMIT 100",
+                               [lastrid])
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                for lastrid, wkb in rows:
+                    ipx, ipy, w, h, values = parse_wkb_raster(str(wkb))
+                    col = int(round((ipx - xmin) / resolution))
+                    row = int(round((ymax - ipy) / resolution))
+                    for j in xrange(h):
+                        line = array.array('f', [NAN if v is None else v for v in values[j * w:(j + 1) * w]])
+                        y = row + j
+                        i = 0
+                        while i < w:
+                            x = col + i
+                            count = min(w - i, tile - x % tile)
+                            index = y // tile * ntiles + x // tile
+                            offset = cls.HEADER_SIZE + 4 * (index * tile * tile + y % tile * tile + x % tile)
+                            data[offset:offset + 4 * count] = line[i:i + count].tostring()
+                            i += count
+            data.close()
+        os.rename(tmppath, path)
+        logger.info("DEM copied to %s (%sx%s)" % (path, width, height))
+        return True
+
+    def _pixel(self, i, j):
+        tile = self.tile
+        index = j // tile * self.ntiles + i // tile
+        offset = self.HEADER_SIZE + 4 * (index * tile * tile + j % tile * tile + i % tile)
+        return self._value(self._map, offset)[0]
+
+    def elevation(self, x, y):
+        """
+        Returns the elevation at the specified coordinates, with bilinear
+        interpolation of pixels values, or None if outside the DEM or next
+        to a nodata pixel.
+        """
+        px = (x - self.xmin) / self.resolution
+        py = (self.ymax - y) / self.resolution
+        if not (0 <= px <= self.width and 0 <= py <= self.height):
+            return None
+        # Position relative to pixels centers
+        px = min(max(px - 0.5, 0), self.width - 1)
+        py = min(max(py - 0.5, 0), self.height - 1)
+        i, j = int(px), int(py)
+        i1, j1 = min(i + 1, self.width - 1), min(j + 1, self.height - 1)
+        dx, dy = px - i, py - j
+        pixels = self._pixel(i, j), self._pixel(i1, j), self._pixel(i, j1), self._pixel(i1, j1)
+        if any(math.isnan(v) for v in pixels):
+            return None
+        top = pixels[0] * (1 - dx) + pixels[1] * dx
+        bottom = pixels[2] * (1 - dx) + pixels[3] * dx
+        return top * (1 - dy) + bottom * dy
+
+    def elevations(self, coords):
+        return [self.elevation(x, y) for x, y in coords]
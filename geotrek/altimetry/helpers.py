@@ -1,52 +1,114 @@
+import math
+import base64
+import struct
 import logging
 
-from django.contrib.gis.geos import GEOSGeometry
 from django.utils.translation import ugettext as _
-from django.contrib.gis.geos import LineString
+from django.contrib.gis.geos import Polygon
 from django.conf import settings
 from django.db import connection
 
 import pygal
 from pygal.style import LightSolarizedStyle
 
+from .dem import DEM, parse_wkb_raster
+
 
 logger = logging.getLogger(__name__)
 
 
 class AltimetryHelper(object):
     @classmethod
-    def elevation_profile(cls, geometry3d, precision=None, offset=0):
+    def elevation_profile(cls, geometry3d, precision=None, offset=0, samples=None):
         """Extract elevation profile from a 3D geometry.
 
+        Returns (distance, x, y, elevation) of each vertex, distances being
+        measured along the geometry and coordinates given in ``API_SRID``.
+
         :precision:  geometry sampling in meters
+        :offset:  distance of the start of the geometry
+        :samples:  if given, the profile is resampled to this number of
+                   points, evenly spaced along the geometry
         """
-        precision = precision or settings.ALTIMETRIC_PROFILE_PRECISION
-
+        geomapi = geometry3d.transform(settings.API_SRID, clone=True)
         if geometry3d.geom_type == 'MultiLineString':
-            profile = []
-            for subcoords in geometry3d.coords:
-                subline = LineString(subcoords, srid=geometry3d.srid)
-                offset += subline.length
-                subprofile = AltimetryHelper.elevation_profile(subline, precision, offset)
-                profile.extend(subprofile)
-            return profile
+            lines, apilines = geometry3d.coords, geomapi.coords
+        else:
+            lines, apilines = [geometry3d.coords], [geomapi.coords]
 
-        # Add measure to 2D version of geometry3d
-        # Get distance from origin for each vertex
-        sql = """
-        WITH line2d AS (SELECT ST_force_2D('%(ewkt)s'::geometry) AS geom),
-             line_measure AS (SELECT ST_Addmeasure(geom, 0, ST_length(geom)) AS geom FROM line2d),
-             points2dm AS (SELECT (ST_DumpPoints(geom)).geom AS point FROM line_measure)
-        SELECT (%(offset)s + ST_M(point)) FROM points2dm;
-        """ % {'offset': offset, 'ewkt': geometry3d.ewkt}
-        cursor = connection.cursor()
-        cursor.execute(sql)
-        pointsm = cursor.fetchall()
         # Join (offset+distance, x, y, z) together
-        geom3dapi = geometry3d.transform(settings.API_SRID, clone=True)
-        assert len(pointsm) == len(geom3dapi.coords), 'Cannot map distance to xyz'
-        dxyz = [pointsm[i] + v for i, v in enumerate(geom3dapi.coords)]
-        return dxyz
+        profile = []
+        distance = offset
+        for coords, apicoords in zip(lines, apilines):
+            assert len(coords) == len(apicoords), 'Cannot map distance to xyz'
+            last = coords[0]
+            for coord, apicoord in zip(coords, apicoords):
+                distance += math.hypot(coord[0] - last[0], coord[1] - last[1])
+                profile.append((distance,) + apicoord)
+                last = coord
+        if samples:
+            profile = cls.resample_profile(profile, samples)
+        return profile
+
+    @classmethod
+    def resample_profile(cls, profile, samples):
+        """
+        Returns ``samples`` points of the profile, evenly spaced along it,
+        with coordinates and elevations interpolated linearly.
+        """
+        if len(profile) < 2 or samples < 2:
+            return profile[:samples]
+        start, end = profile[0][0], profile[-1][0]
+        step = (end - start) / float(samples - 1)
+        resampled = []
+        k = 0
+        for i in range(samples):
+            distance = start + i * step if i < samples - 1 else end
+            while k < len(profile) - 2 and profile[k + 1][0] < distance:
+                k += 1
+            (d1, x1, y1, z1), (d2, x2, y2, z2) = profile[k][:4], profile[k + 1][:4]
+            f = (distance - d1) / (d2 - d1) if d2 > d1 else 0.0
+            resampled.append((distance, x1 + (x2 - x1) * f, y1 + (y2 - y1) * f, z1 + (z2 - z1) * f))
+        return resampled
+
+    @classmethod
+    def simplify_profile(cls, profile, tolerance=None, points=None):
+        """
+        Simplify the profile with Douglas-Peucker algorithm on distance and
+        elevation: keeps the points whose elevation differs by more than
+        ``tolerance`` meters from the simplified profile, and/or only the
+        ``points`` most significant ones. Extremities are always kept.
+        """
+        count = len(profile)
+        if count <= 2:
+            return profile
+        # Significance of each point: elevation difference with the
+        # simplified profile when it is selected (at most its parent's one)
+        significance = [0.0] * count
+        significance[0] = significance[-1] = float('inf')
+        stack = [(0, count - 1, float('inf'))]
+        while stack:
+            first, last, parent = stack.pop()
+            if last - first < 2:
+                continue
+            d1, z1 = profile[first][0], profile[first][3]
+            d2, z2 = profile[last][0], profile[last][3]
+            ratio = (z2 - z1) / float(d2 - d1) if d2 > d1 else 0.0
+            farthest, index = -1.0, None
+            for k in xrange(first + 1, last):
+                difference = abs(profile[k][3] - z1 - (profile[k][0] - d1) * ratio)
+                if difference > farthest:
+                    farthest, index = difference, k
+            significance[index] = min(farthest, parent)
+            stack.append((first, index, significance[index]))
+            stack.append((index, last, significance[index]))
+
+        kept = range(count)
+        if tolerance is not None:
+            kept = [k for k in kept if significance[k] > tolerance]
+        if points is not None:
+            kept = sorted(sorted(kept, key=lambda k: -significance[k])[:max(points, 2)])
+        return [profile[k] for k in kept]
 
     @classmethod
     def profile_svg(cls, profile):
@@ -115,7 +177,14 @@ class AltimetryHelper(object):
         return (xmin, ymin, xmax, ymax)
 
     @classmethod
-    def elevation_area(cls, geom):
+    def elevation_area(cls, geom, compact=False):
+        """
+        Returns elevations of a grid around the specified geometry.
+
+        :compact:  if True, altitudes are given as base64 of little-endian
+                   int16 values (row by row, from south to north) instead
+                   of nested lists.
+        """
         xmin, ymin, xmax, ymax = cls._nice_extent(geom)
         width = xmax - xmin
         height = ymax - ymin
@@ -125,76 +194,32 @@ class AltimetryHelper(object):
             precision = int(width / max_resolution)
         if height / precision > 10000:
             precision = int(width / max_resolution)
-        cursor = connection.cursor()
-        try:
-            cursor.execute('SELECT * FROM mnt LIMIT 1;')
-        except:
-            logger.warn("No DEM present")
+        dem = DEM.get()
+        # Do not sample more densely than the DEM resolution
+        resolution = dem.resolution if dem is not None else cls.dem_resolution()
+        if resolution and precision < resolution:
+            precision = int(math.ceil(resolution))
+        if dem is not None:
+            area = cls._elevation_area_dem(dem, xmin, ymin, xmax, ymax, precision)
+        else:
+            area = cls._elevation_area_sql(xmin, ymin, xmax, ymax, precision)
+        if area is None:
             return {}
+        envelop_native, envelop, center_z, min_z, max_z, resolution_w, resolution_h, values = area
 
-        sql = """
-            -- Author: Celian Garcia
-            WITH columns AS (
-                    SELECT generate_series({xmin}::int, {xmax}::int, {precision}) AS x
-                ),
-                lines AS (
-                    SELECT generate_series({ymin}::int, {ymax}::int, {precision}) AS y
-                ),
-                resolution AS (
-                    SELECT x, y
-                    FROM (SELECT COUNT(x) AS x FROM columns) AS col,
-                         (SELECT COUNT(y) AS y FROM lines)   AS lin
-                ),
-                points2d AS (
-                    SELECT row_number() OVER () AS id,
-                           ST_SetSRID(ST_MakePoint(x, y), {srid}) AS geom,
-                           ST_Transform(ST_SetSRID(ST_MakePoint(x, y), {srid}), 4326) AS geomll
-                    FROM lines, columns
-                ),
-                draped AS (
-                    SELECT id, ST_Value(mnt.rast, p.geom)::int AS altitude
-                    FROM mnt, points2d AS p
-                    WHERE ST_Intersects(mnt.rast, p.geom)
-                ),
-                all_draped AS (
-                    SELECT geomll, geom, altitude
-                    FROM points2d LEFT JOIN draped ON (points2d.id = draped.id)
-                    ORDER BY points2d.id
-                ),
-                extent_latlng AS (
-                    SELECT ST_Envelope(ST_Union(geom)) AS extent,
-                           MIN(altitude) AS min_z,
-                           MAX(altitude) AS max_z,
-                           AVG(altitude) AS center_z
-                    FROM all_draped
-                )
-            SELECT extent,
-                   ST_transform(extent, 4326),
-                   center_z,
-                   min_z,
-                   max_z,
-                   resolution.x AS resolution_w,
-                   resolution.y AS resolution_h,
-                   altitude
-            FROM extent_latlng, resolution, all_draped;
-        """.format(xmin=xmin, ymin=ymin, xmax=xmax, ymax=ymax,
-                   srid=settings.SRID, precision=precision)
-        cursor.execute(sql)
-        result = cursor.fetchall()
-        first = result[0]
-        envelop_native, envelop, center_z, min_z, max_z, resolution_w, resolution_h, a = first
-        envelop = GEOSGeometry(envelop, srid=4326)
-        envelop_native = GEOSGeometry(envelop_native, srid=settings.SRID)
-
-        altitudes = []
-        row = []
-        for i, record in enumerate(result):
-            if i > 0 and i % resolution_w == 0:
-                altitudes.append(row)
-                row = []
-            elevation = (record[7] or 0.0) - min_z
-            row.append(elevation)
-        altitudes.append(row)
+        if compact:
+            altitudes = base64.b64encode(struct.pack('<%sh' % len(values),
+                                                     *[(value or 0) - min_z for value in values]))
+        else:
+            altitudes = []
+            row = []
+            for i, value in enumerate(values):
+                if i > 0 and i % resolution_w == 0:
+                    altitudes.append(row)
+                    row = []
+                elevation = (value or 0.0) - min_z
+                row.append(elevation)
+            altitudes.append(row)
 
         area = {
             'center': {
@@ -239,4 +264,104 @@ class AltimetryHelper(object):
             },
             'altitudes': altitudes
         }
+        if compact:
+            area['altitudes_encoding'] = 'base64-int16le'
         return area
+
+    @classmethod
+    def dem_resolution(cls):
+        """
+        Returns the resolution of the DEM table, or None if unknown.
+        """
+        cursor = connection.cursor()
+        cursor.execute("SELECT abs(scale_x) FROM raster_columns WHERE r_table_name = 'mnt'")
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    @classmethod
+    def _area_grid(cls, columns, lines, values):
+        known = [v for v in values if v is not None]
+        if not known:
+            return None
+        envelop_native = Polygon.from_bbox((columns[0], lines[0], columns[-1], lines[-1]))
+        envelop_native.srid = settings.SRID
+        envelop = envelop_native.transform(4326, clone=True)
+        return (envelop_native, envelop, sum(known) / float(len(known)), min(known), max(known),
+                len(columns), len(lines), values)
+
+    @classmethod
+    def _elevation_area_dem(cls, dem, xmin, ymin, xmax, ymax, precision):
+        """
+        Same grid as ``_elevation_area_sql()``, sampled from the DEM copy.
+        """
+        columns = range(xmin, xmax + 1, precision)
+        lines = range(ymin, ymax + 1, precision)
+        values = []
+        for y in lines:
+            for x in columns:
+                value = dem.elevation(x, y)
+                values.append(None if value is None else int(round(value)))
+        return cls._area_grid(columns, lines, values)
+
+    @classmethod
+    def _elevation_area_sql(cls, xmin, ymin, xmax, ymax, precision):
+        """
+        Clip the DEM around the grid, resample it at the grid resolution
+        (pixels centered on grid points), and read its values at once.
+        The coarsest DEM overview fitting the grid is used (c.f. ``ft_dem_table()``).
+        """
+        cursor = connection.cursor()
+        try:
+            cursor.execute('SELECT * FROM mnt LIMIT 1;')
+        except:
+            logger.warn("No DEM present")
+            return None
+
+        cursor.execute('SELECT ft_dem_table(%s)', [precision])
+        dem_table = connection.ops.quote_name(cursor.fetchone()[0])
+
+        columns = range(xmin, xmax + 1, precision)
+        lines = range(ymin, ymax + 1, precision)
+        width, height = len(columns), len(lines)
+        upperleftx = columns[0] - precision / 2.0
+        upperlefty = lines[-1] + precision / 2.0
+        sql = """
+            WITH grid AS (
+                    SELECT ST_MakeEmptyRaster(%(width)s, %(height)s, %(upperleftx)s, %(upperlefty)s,
+                                              %(precision)s, -%(precision)s, 0, 0, %(srid)s) AS ref,
+                           ST_Expand(ST_MakeEnvelope(%(xmin)s, %(ymin)s, %(xmax)s, %(ymax)s, %(srid)s),
+                                     %(precision)s) AS extent
+                ),
+                clipped AS (
+                    SELECT ST_Union(ST_Clip(rast, extent)) AS rast
+                    FROM {dem_table}, grid
+                    WHERE ST_Intersects(rast, extent)
+                )
+            SELECT ST_AsBinary(ST_Resample(clipped.rast, grid.ref))
+            FROM clipped, grid
+            WHERE clipped.rast IS NOT NULL;
+        """.format(dem_table=dem_table)
+        cursor.execute(sql, {'width': width, 'height': height,
+                             'upperleftx': upperleftx, 'upperlefty': upperlefty,
+                             'xmin': columns[0], 'ymin': lines[0], 'xmax': columns[-1], 'ymax': lines[-1],
+                             'precision': precision, 'srid': settings.SRID})
+        row = cursor.fetchone()
+        if row is None or row[0] is None:
+            return None
+        ipx, ipy, w, h, pixels = parse_wkb_raster(str(row[0]), nodata=None)
+
+        # Resampled raster is aligned on the grid, but covers the DEM extent only.
+        # Its rows go from north to south, whereas grid lines go from south to north.
+        col = int(round((ipx - upperleftx) / precision))
+        line = height - 1 - int(round((upperlefty - ipy) / precision))
+        values = [None] * (width * height)
+        for j in xrange(h):
+            y = line - j
+            if not 0 <= y < height:
+                continue
+            for i in xrange(w):
+                x = col + i
+                value = pixels[j * w + i]
+                if 0 <= x < width and value is not None:
+                    values[y * width + x] = int(round(value))
+        return cls._area_grid(columns, lines, values)
@@ -3,8 +3,45 @@ from django.db import connection
 from django.conf import settings
 from optparse import make_option
 import os.path
-from subprocess import call
+from subprocess import call, Popen, PIPE
 import tempfile
+import time
+
+from geotrek.altimetry.dem import DEM
+
+
+class CopyData(object):
+    """
+    File-like object reading the data of a COPY statement from a SQL dump,
+    up to its terminating line.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.rows = 0
+        self.size = 0
+        self.done = False
+
+    def readline(self, size=-1):
+        if self.done:
+            return ''
+        line = self.stream.readline()
+        if not line or line.rstrip('\r\n') == '\\.':
+            self.done = True
+            return ''
+        self.rows += 1
+        self.size += len(line)
+        return line
+
+    def read(self, size=-1):
+        lines = []
+        length = 0
+        while size < 0 or length < size:
+            line = self.readline()
+            if not line:
+                break
+            lines.append(line)
+            length += len(line)
+        return ''.join(lines)
 
 
 class Command(BaseCommand):
@@ -19,9 +56,27 @@ class Command(BaseCommand):
                     action='store_true',
                     default=False,
                     help='Replace existing DEM if any.'),
+        make_option('--cache-only',
+                    action='store_true',
+                    default=False,
+                    help='Only copy the existing DEM for elevation sampling (see ALTIMETRIC_DEM_CACHE).'),
+        make_option('--tile-size',
+                    type='int',
+                    dest='tile_size',
+                    default=100,
+                    help='Size of DEM tiles, in pixels (default 100).'),
+        make_option('--overviews',
+                    dest='overviews',
+                    default='',
+                    help='Comma separated factors of DEM overviews to build (e.g. 2,4,8).'),
     )
 
     def handle(self, *args, **options):
+        if options['cache_only']:
+            if not settings.ALTIMETRIC_DEM_CACHE:
+                raise CommandError('ALTIMETRIC_DEM_CACHE setting is not set.')
+            self.copy_dem()
+            return
 
         try:
             from osgeo import gdal, ogr, osr
@@ -43,6 +98,14 @@ class Command(BaseCommand):
         if len(args) != 1:
             self.stdout.write(self.usage('loaddem'))
             return
+        if options['tile_size'] <= 0:
+            raise CommandError('Tile size must be positive.')
+        try:
+            overviews = [int(factor) for factor in options['overviews'].split(',') if factor.strip()]
+        except ValueError:
+            raise CommandError('Overviews must be comma separated integers.')
+        if any(factor < 2 for factor in overviews):
+            raise CommandError('Overviews factors must be greater than 1.')
 
         # Obtain DEM path
         dem_path = args[0]
@@ -109,8 +172,11 @@ class Command(BaseCommand):
 
         # What to do with existing DEM (if any)
         if dem_exists and replace:
-            # Drop table
+            # Drop table, and its overviews
             cur = connection.cursor()
+            cur.execute('SELECT o_table_name FROM raster_overviews WHERE r_table_name = \'mnt\'')
+            for overview, in cur.fetchall():
+                cur.execute('DROP TABLE IF EXISTS %s' % connection.ops.quote_name(overview))
             sql = 'DROP TABLE mnt'
             cur.execute(sql)
             cur.close()
@@ -144,30 +210,58 @@ class Command(BaseCommand):
             raise CommandError(msg)
         self.stdout.write('DEM successfully clipped/projected.\n')
 
-        # Step 2: Convert to PostGISRaster format
-        output = tempfile.NamedTemporaryFile()  # SQL code for raster creation
-        cmd = 'raster2pgsql -c -C -I -M -t 100x100 %s mnt' % new_dem.name
+        # Step 2: Convert to PostGISRaster format, and stream it into database
+        cmd = 'raster2pgsql -c -C -I -M -Y -t {0}x{0} {1}{2} mnt'.format(
+            options['tile_size'],
+            '-l %s ' % ','.join(str(factor) for factor in overviews) if overviews else '',
+            new_dem.name)
+        self.stdout.write('\n-- Relaying to raster2pgsql ------------\n')
+        self.stdout.write(cmd)
+        self.stdout.write('\n-- Loading DEM into database -----------\n')
+        start = time.time()
         try:
-            self.stdout.write('\n-- Relaying to raster2pgsql ------------\n')
-            self.stdout.write(cmd)
-            ret = call(cmd, stdout=output.file, shell=True)
+            process = Popen(cmd, stdout=PIPE, shell=True)
+            try:
+                rows, size = self.load_sql(process.stdout)
+            except BaseException:
+                process.kill()
+                process.wait()
+                raise
+            ret = process.wait()
             if ret != 0:
                 raise Exception('raster2pgsql failed with exit code %d' % ret)
         except Exception as e:
-            output.close()
             msg = 'Caught %s: %s' % (e.__class__.__name__, e,)
             raise CommandError(msg)
         finally:
             new_dem.close()
-        self.stdout.write('DEM successfully converted to SQL.\n')
+        elapsed = max(time.time() - start, 0.001)
+        self.stdout.write('DEM successfully loaded: %d tiles, %.1f MB in %.1f s (%.1f MB/s).\n' % (
+            rows, size / 1e6, elapsed, size / 1e6 / elapsed))
+        self.copy_dem()
+        return
 
-        # Step 3: Dump SQL code into database
-        self.stdout.write('\n-- Loading DEM into database -----------\n')
+    def load_sql(self, stream):
+        """
+        Execute the SQL dump of ``raster2pgsql``, streaming the data of COPY
+        statements. Returns the number of rows copied, and their size in bytes.
+        """
         cur = connection.cursor()
-        output.file.seek(0)
-        for sql_line in output.file:
-            cur.execute(sql_line)
+        rows = size = 0
+        for line in iter(stream.readline, ''):
+            if line.startswith('COPY '):
+                data = CopyData(stream)
+                cur.copy_expert(line, data)
+                rows += data.rows
+                size += data.size
+            elif line.strip():
+                cur.execute(line)
         cur.close()
-        output.close()
-        self.stdout.write('DEM successfully loaded.\n')
-        return
+        return rows, size
+
+    def copy_dem(self):
+        if not settings.ALTIMETRIC_DEM_CACHE:
+            return
+        if not DEM.build():
+            raise CommandError('No DEM to copy, load it first.')
+        self.stdout.write('DEM successfully copied to %s.\n' % settings.ALTIMETRIC_DEM_CACHE)
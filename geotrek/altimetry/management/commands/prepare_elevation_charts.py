@@ -1,7 +1,14 @@
 import logging
+from multiprocessing import Pool
+from optparse import make_option
 
 from django.conf import settings
+from django.core.management.base import CommandError
 from django.core.urlresolvers import NoReverseMatch
+from django.db import connection
+from django.db.models import get_model
+
+from mapentity.helpers import is_file_newer
 
 from geotrek.common.management.commands.prepare_map_images import Command as PrepareImageCommand
 
@@ -11,11 +18,32 @@ from geotrek.altimetry.models import AltimetryMixin
 logger = logging.getLogger(__name__)
 
 
+def prepare_instance(job):
+    """Prepare charts of an instance, in a worker process."""
+    app_label, model_name, pk, options = job
+    command = Command()
+    command.options = options
+    command.handle_instance(get_model(app_label, model_name).objects.get(pk=pk))
+
+
 class Command(PrepareImageCommand):
     help = "Generates all altimetric profiles"
 
     start_model_msg = "Generate all elevation charts model %s"
 
+    option_list = PrepareImageCommand.option_list + (
+        make_option('--processes', '-j',
+                    type='int',
+                    dest='processes',
+                    default=1,
+                    help='Number of processes generating charts in parallel.'),
+        make_option('--local',
+                    action='store_true',
+                    dest='local',
+                    default=None,
+                    help='Convert charts to PNG in process with CairoSVG, instead of using convertit.'),
+    )
+
     def get_models(self):
         with_profiles = []
         models = super(Command, self).get_models()
@@ -31,9 +59,47 @@ class Command(PrepareImageCommand):
                 pass
         return with_profiles
 
+    def get_languages(self):
+        return [language for language, name in settings.MAPENTITY_CONFIG['TRANSLATED_LANGUAGES']]
+
+    def handle(self, *args, **options):
+        if options.get('local') or (options.get('local') is None and settings.ALTIMETRIC_PROFILE_LOCAL_RENDERING):
+            try:
+                import cairosvg  # NOQA
+            except ImportError:
+                raise CommandError('CairoSVG is not available. Can not convert charts locally.')
+
+        processes = options.get('processes') or 1
+        if processes <= 1:
+            return super(Command, self).handle(*args, **options)
+
+        # Dispatch instances with outdated charts to a pool of processes
+        self.options = options
+        job_options = dict((name, options[name]) for name in ('url', 'local') if name in options)
+        jobs = []
+        for model in self.get_models():
+            logger.info(self.start_model_msg % model)
+            for instance in self.get_instances(model):
+                if all(is_file_newer(instance.get_elevation_chart_path(language), instance.date_update)
+                       for language in self.get_languages()):
+                    continue
+                jobs.append((model._meta.app_label, model._meta.module_name, instance.pk, job_options))
+        logger.info('%s instances with outdated charts' % len(jobs))
+
+        # Workers open their own database connection
+        connection.close()
+        pool = Pool(processes)
+        try:
+            for result in pool.imap_unordered(prepare_instance, jobs):
+                pass
+        finally:
+            pool.close()
+            pool.join()
+
     def handle_instance(self, instance):
         rooturl = self.options.get('url', self.DEFAULT_URL)
-        for language, name in settings.MAPENTITY_CONFIG['TRANSLATED_LANGUAGES']:
-            refreshed = instance.prepare_elevation_chart(language, rooturl)
+        local = self.options.get('local')
+        for language in self.get_languages():
+            refreshed = instance.prepare_elevation_chart(language, rooturl, local=local)
             if not refreshed:
                 logger.info('%s profile up-to-date.' % instance.get_elevation_chart_path(language))
@@ -2,6 +2,8 @@ import os
 
 from django.conf import settings
 from django.contrib.gis.db import models
+from django.core.cache import get_cache
+from django.utils import translation
 from django.utils.translation import get_language, ugettext_lazy as _
 from django.template.defaultfilters import floatformat
 
@@ -43,14 +45,40 @@ class AltimetryMixin(models.Model):
         self.slope = fromdb.slope
         return self
 
-    def get_elevation_profile(self):
-        return AltimetryHelper.elevation_profile(self.geom_3d)
+    def _cached_elevation(self, name, compute):
+        """
+        Returns the result of ``compute()``, shared in the 'fat' cache until
+        the record is updated (or the cache entry expires).
+        """
+        date_update = getattr(self, 'date_update', None)
+        if self.pk is None or date_update is None:
+            return compute()
+        cache = get_cache('fat')
+        key = 'altimetry_%s_%s_%s_%s' % (self._meta.module_name, self.pk, name,
+                                         date_update.strftime('%Y%m%d%H%M%S%f'))
+        result = cache.get(key)
+        if result is None:
+            result = compute()
+            cache.set(key, result)
+        return result
+
+    def get_elevation_profile(self, samples=None, tolerance=None, points=None):
+        """
+        :tolerance:, :points:  simplify the profile (c.f. ``AltimetryHelper.simplify_profile()``)
+        """
+        if tolerance is not None or points is not None:
+            return self._cached_elevation('profile_%s_%s_%s' % (samples or '', tolerance, points),
+                                          lambda: AltimetryHelper.simplify_profile(self.get_elevation_profile(samples),
+                                                                                   tolerance, points))
+        return self._cached_elevation('profile_%s' % (samples or ''),
+                                      lambda: AltimetryHelper.elevation_profile(self.geom_3d, samples=samples))
 
-    def get_elevation_area(self):
-        return AltimetryHelper.elevation_area(self.geom)
+    def get_elevation_area(self, compact=False):
+        return AltimetryHelper.elevation_area(self.geom, compact=compact)
 
     def get_elevation_profile_svg(self):
-        return AltimetryHelper.profile_svg(self.get_elevation_profile())
+        return self._cached_elevation('svg_%s' % get_language(),
+                                      lambda: AltimetryHelper.profile_svg(self.get_elevation_profile()))
 
     @models.permalink
     def get_elevation_chart_url(self):
@@ -69,14 +97,26 @@ class AltimetryMixin(models.Model):
             os.mkdir(basefolder)
         return os.path.join(basefolder, '%s-%s-%s.png' % (self._meta.module_name, self.pk, language))
 
-    def prepare_elevation_chart(self, language, rooturl):
+    def prepare_elevation_chart(self, language, rooturl, local=None):
         """Converts SVG elevation URI to PNG on disk.
+
+        :local:  convert the SVG chart in process with CairoSVG, instead of
+                 using convertit (default ``ALTIMETRIC_PROFILE_LOCAL_RENDERING``)
         """
         from .views import HttpSVGResponse
         path = self.get_elevation_chart_path(language)
         # Do nothing if image is up-to-date
         if is_file_newer(path, self.date_update):
             return False
+        if local is None:
+            local = settings.ALTIMETRIC_PROFILE_LOCAL_RENDERING
+        # Fill profile and SVG cache, also used by views
+        with translation.override(language):
+            svg = self.get_elevation_profile_svg()
+        if local:
+            import cairosvg
+            cairosvg.svg2png(bytestring=svg, write_to=path)
+            return True
         # Download converted chart as png using convertit
         source = smart_urljoin(rooturl, self.get_elevation_chart_url())
         convertit_download(source,
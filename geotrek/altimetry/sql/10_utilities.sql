@@ -13,8 +13,22 @@ CREATE TYPE elevation_infos AS (
 );
 
 
+CREATE OR REPLACE FUNCTION geotrek.ft_dem_table(step float) RETURNS text AS $$
+    -- Coarsest DEM table (``mnt`` or one of its overviews, c.f. ``loaddem``)
+    -- whose resolution is at least the sampling step
+    SELECT coalesce((SELECT o.o_table_name::text
+                     FROM raster_overviews AS o, raster_columns AS c
+                     WHERE o.r_table_name = 'mnt' AND c.r_table_name = 'mnt'
+                       AND abs(c.scale_x) * o.overview_factor <= $1
+                     ORDER BY o.overview_factor DESC
+                     LIMIT 1), 'mnt');
+$$ LANGUAGE sql STABLE;
+
+
 CREATE OR REPLACE FUNCTION geotrek.ft_drape_line(linegeom geometry, step integer)
     RETURNS SETOF geometry AS $$
+DECLARE
+    dem_table text;
 BEGIN
     -- Use sampling steps for draping geometry on DEM
     -- http://blog.mathieu-leplatre.info/drape-lines-on-a-dem-with-postgis.html
@@ -26,28 +40,48 @@ BEGIN
         -- (Use-case is when assembling paths geometries to build topologies)
         RETURN QUERY SELECT (ST_DumpPoints(ST_Force_3D(linegeom))).geom AS geom;
 
+    ELSIF NOT EXISTS (SELECT 1 FROM raster_columns WHERE r_table_name = 'mnt') THEN
+        RETURN QUERY SELECT ST_Force_3D(p) FROM ft_densify_line(linegeom, step) AS p;
+
     ELSE
-        RETURN QUERY
-            WITH -- Get endings of each segment of the line
-                 r1 AS (SELECT ST_PointN(linegeom, generate_series(1, ST_NPoints(linegeom)-1)) as p1,
-                               ST_PointN(linegeom, generate_series(2, ST_NPoints(linegeom))) as p2,
-                               generate_series(2, ST_NPoints(linegeom)) = ST_NPoints(linegeom) as is_last),
-                 -- Get the number of sub-segments
-                 r2 AS (SELECT p1, p2, is_last, trunc(ST_Distance(p1, p2) / step)::integer + 1 AS n FROM r1),
-                 -- Get relative positions of new points along the segment (without last point, except for last segment)
-                 r3 AS (SELECT p1, p2, generate_series(0, CASE WHEN is_last THEN n ELSE n - 1 END)/n::double precision AS f FROM r2),
-                 -- Create new points
-                 r4 AS (SELECT ST_MakePoint(ST_X(p1) + (ST_X(p2) - ST_X(p1)) * f,
-                                            ST_Y(p1) + (ST_Y(p2) - ST_Y(p1)) * f) as p,
-                               ST_SRID(p1) AS srid FROM r3),
-                 -- Set SRID of new points
-                 r5 AS (SELECT ST_SetSRID(p, srid) as p FROM r4)
-            SELECT add_point_elevation(p) FROM r5;
+        -- Do not sample more densely than the DEM resolution, and use
+        -- its coarsest overview fitting the step
+        SELECT greatest(step, abs(scale_x)::integer) INTO step FROM raster_columns WHERE r_table_name = 'mnt';
+        dem_table := ft_dem_table(step);
+
+        -- Sample all points with one join on the DEM
+        RETURN QUERY EXECUTE format('
+            WITH points AS (SELECT row_number() OVER () AS id, p FROM ft_densify_line($1, $2) AS p),
+                 sampled AS (SELECT DISTINCT ON (id) id, p, ST_Value(rast, 1, p)::integer AS ele
+                             FROM points LEFT JOIN %I ON ST_Intersects(rast, p)
+                             ORDER BY id, ST_Value(rast, 1, p) IS NULL)
+            SELECT ST_SetSRID(ST_MakePoint(ST_X(p), ST_Y(p), coalesce(ele, 0)), ST_SRID($1))
+            FROM sampled ORDER BY id', dem_table)
+            USING linegeom, step;
     END IF;
 END;
 $$ LANGUAGE plpgsql;
 
 
+CREATE OR REPLACE FUNCTION geotrek.ft_densify_line(linegeom geometry, step integer)
+    RETURNS SETOF geometry AS $$
+    -- Points of the line, with new points so that two of them are at most
+    -- step apart (c.f. ``ft_drape_line()``)
+    WITH -- Get endings of each segment of the line
+         r1 AS (SELECT ST_PointN($1, generate_series(1, ST_NPoints($1)-1)) as p1,
+                       ST_PointN($1, generate_series(2, ST_NPoints($1))) as p2,
+                       generate_series(2, ST_NPoints($1)) = ST_NPoints($1) as is_last),
+         -- Get the number of sub-segments
+         r2 AS (SELECT p1, p2, is_last, trunc(ST_Distance(p1, p2) / $2)::integer + 1 AS n FROM r1),
+         -- Get relative positions of new points along the segment (without last point, except for last segment)
+         r3 AS (SELECT p1, p2, generate_series(0, CASE WHEN is_last THEN n ELSE n - 1 END)/n::double precision AS f FROM r2)
+    -- Create new points
+    SELECT ST_SetSRID(ST_MakePoint(ST_X(p1) + (ST_X(p2) - ST_X(p1)) * f,
+                                   ST_Y(p1) + (ST_Y(p2) - ST_Y(p1)) * f), ST_SRID($1))
+    FROM r3;
+$$ LANGUAGE sql IMMUTABLE;
+
+
 
 CREATE OR REPLACE FUNCTION geotrek.add_point_elevation(geom geometry) RETURNS geometry AS $$
 DECLARE
@@ -79,12 +113,7 @@ $$ LANGUAGE plpgsql;
 
 CREATE OR REPLACE FUNCTION geotrek.ft_elevation_infos(geom geometry) RETURNS elevation_infos AS $$
 DECLARE
-    num_points integer;
     current geometry;
-    points3d geometry[];
-    ele integer;
-    last_ele integer;
-    last_last_ele integer;
     result elevation_infos;
 BEGIN
     -- Skip if no DEM (speed-up tests)
@@ -109,26 +138,24 @@ BEGIN
 
     -- Now geom is LineString only.
 
-    -- Compute gain and elevation using (higher resolution)
-    result.positive_gain := 0;
-    result.negative_gain := 0;
-    last_ele := NULL;
-    last_last_ele := NULL;
-    points3d := ARRAY[]::geometry[];
-
-    FOR current IN SELECT * FROM ft_drape_line(geom, {{ALTIMETRIC_PROFILE_PRECISION}}) LOOP
-        -- Smooth the elevation profile
-        ele := (ST_Z(current)::integer + coalesce(last_ele, ST_Z(current)::integer)) / 2;
-        -- Create the 3d points
-        points3d := array_append(points3d, ST_MakePoint(ST_X(current), ST_Y(current), ele));
-        -- Add positive only if ele - last_ele > 0
-        result.positive_gain := result.positive_gain + greatest(ele - coalesce(last_ele, ele), 0);
-        -- Add negative only if ele - last_ele < 0
-        result.negative_gain := result.negative_gain + least(ele - coalesce(last_ele, ele), 0);
-        last_ele := ele;
-        last_last_ele := last_ele;
-    END LOOP;
-    result.draped := ST_SetSRID(ST_MakeLine(points3d), ST_SRID(geom));
+    -- Drape it, smooth elevations (each one is the mean with the previous
+    -- smoothed one) and compute gains at once.
+    WITH RECURSIVE
+        draped AS (SELECT array_agg(ST_X(p) ORDER BY id) AS xs,
+                          array_agg(ST_Y(p) ORDER BY id) AS ys,
+                          array_agg(ST_Z(p)::integer ORDER BY id) AS zs
+                   FROM (SELECT row_number() OVER () AS id, p
+                         FROM ft_drape_line(geom, {{ALTIMETRIC_PROFILE_PRECISION}}) AS p) AS points),
+        smoothed(k, ele) AS (SELECT 1, zs[1] FROM draped
+                             UNION ALL
+                             SELECT k + 1, (zs[k + 1] + ele) / 2 FROM smoothed, draped
+                             WHERE k < array_length(zs, 1)),
+        gains AS (SELECT k, ele, ele - lag(ele) OVER (ORDER BY k) AS diff FROM smoothed)
+    SELECT ST_SetSRID(ST_MakeLine(ST_MakePoint(xs[k], ys[k], ele) ORDER BY k), ST_SRID(geom)),
+           coalesce(sum(greatest(diff, 0)), 0),
+           coalesce(sum(least(diff, 0)), 0)
+    INTO result.draped, result.positive_gain, result.negative_gain
+    FROM gains, draped;
 
     result.min_elevation := ST_ZMin(result.draped)::integer;
     result.max_elevation := ST_ZMax(result.draped)::integer;
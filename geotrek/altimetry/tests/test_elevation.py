@@ -1,11 +1,24 @@
+import os
+import base64
+import struct
+import datetime
+import tempfile
+from StringIO import StringIO
+
+import mock
+
 from django.conf import settings
 from django.test import TestCase
+from django.core.management import call_command
+from django.test.utils import override_settings
 from django.db import connections, DEFAULT_DB_ALIAS
 from django.contrib.gis.geos import MultiLineString, LineString
 
 from geotrek.core.models import Path
 from geotrek.core.factories import TopologyFactory
 from geotrek.altimetry.helpers import AltimetryHelper
+from geotrek.altimetry.dem import DEM
+from geotrek.altimetry.management.commands.loaddem import Command as LoadDEMCommand
 
 
 class ElevationTest(TestCase):
@@ -44,6 +57,40 @@ class ElevationTest(TestCase):
         self.assertEqual(profile[5][3], 16.0)
         self.assertEqual(profile[6][3], 23.0)
 
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+                               'fat': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'altimetry-tests'}})
+    def test_elevation_profile_cached_until_update(self):
+        profile = self.path.get_elevation_profile()
+        svg = self.path.get_elevation_profile_svg()
+        with mock.patch('geotrek.altimetry.models.AltimetryHelper') as helper:
+            # Cached values are pickled
+            helper.elevation_profile.return_value = []
+            self.assertEqual(self.path.get_elevation_profile(), profile)
+            self.assertEqual(self.path.get_elevation_profile_svg(), svg)
+            self.assertFalse(helper.elevation_profile.called)
+            self.assertFalse(helper.profile_svg.called)
+            self.path.date_update += datetime.timedelta(seconds=1)
+            self.path.get_elevation_profile()
+            self.assertTrue(helper.elevation_profile.called)
+
+    def test_elevation_chart_rendered_locally(self):
+        cairosvg = mock.Mock()
+        path = self.path.get_elevation_chart_path('en')
+        if os.path.exists(path):
+            os.remove(path)
+        with mock.patch.dict('sys.modules', {'cairosvg': cairosvg}):
+            self.assertTrue(self.path.prepare_elevation_chart('en', 'http://localhost', local=True))
+        kwargs = cairosvg.svg2png.call_args[1]
+        self.assertIn('Generated with pygal', kwargs['bytestring'])
+        self.assertEqual(kwargs['write_to'], path)
+
+    def test_drape_line_partly_outside_dem(self):
+        cur = connections[DEFAULT_DB_ALIAS].cursor()
+        cur.execute("SELECT ST_X(p), ST_Z(p) FROM ft_drape_line(ST_GeomFromText('LINESTRING(78 117, 178 117)', %s), 25) AS p",
+                    [settings.SRID])
+        self.assertEqual(cur.fetchall(), [(78, 5), (98, 5), (118, 0), (138, 0), (158, 0), (178, 0)])
+
     def test_elevation_topology_line(self):
         topo = TopologyFactory.create(no_path=True)
         topo.add_path(self.path, start=0.2, end=0.8)
@@ -56,6 +103,22 @@ class ElevationTest(TestCase):
         self.assertEqual(topo.max_elevation, 12)
         self.assertEqual(len(topo.geom_3d.coords), 5)
 
+    def test_update_altimetry_after_dem_change(self):
+        topo = TopologyFactory.create(no_path=True)
+        topo.add_path(self.path, start=0.2, end=0.8)
+        topo.save()
+        cur = connections[DEFAULT_DB_ALIAS].cursor()
+        cur.execute("UPDATE mnt SET rast = ST_MapAlgebraExpr(rast, 1, '16BSI', '[rast] + 100')")
+        call_command('update_altimetry', batch_size=1, stdout=StringIO())
+        self.path.reload()
+        self.assertEqual(self.path.min_elevation, 104)
+        self.assertEqual(self.path.max_elevation, 123)
+        self.assertEqual(self.path.ascent, 19)
+        topo.reload()
+        self.assertEqual(topo.min_elevation, 105)
+        self.assertEqual(topo.max_elevation, 112)
+        self.assertEqual(topo.ascent, 7)
+
     def test_elevation_topology_point(self):
         topo = TopologyFactory.create(no_path=True)
         topo.add_path(self.path, start=0.6, end=0.6)
@@ -96,6 +159,20 @@ class ElevationProfileTest(TestCase):
 
         profile = AltimetryHelper.elevation_profile(geom)
         self.assertEqual(len(profile), 4)
+        self.assertEqual([p[0] for p in profile], [0.0, 1.0, 1.0, 3.5])
+
+    def test_elevation_profile_resampled(self):
+        geom = LineString((0, 0, 0), (10, 0, 10), (10, 30, 40), srid=settings.SRID)
+        profile = AltimetryHelper.elevation_profile(geom, samples=5)
+        self.assertEqual([p[0] for p in profile], [0.0, 10.0, 20.0, 30.0, 40.0])
+        self.assertEqual([p[3] for p in profile], [0.0, 10.0, 20.0, 30.0, 40.0])
+
+    def test_elevation_profile_simplified(self):
+        profile = [(d, 0, 0, z) for d, z in ((0, 0), (10, 1), (20, 10), (30, 2), (40, 0), (50, 0.5), (60, 0))]
+        simplified = AltimetryHelper.simplify_profile(profile, tolerance=1)
+        self.assertEqual([p[0] for p in simplified], [0, 10, 20, 30, 40, 60])
+        simplified = AltimetryHelper.simplify_profile(profile, points=4)
+        self.assertEqual([p[0] for p in simplified], [0, 20, 30, 60])
 
     def test_elevation_svg_output(self):
         geom = LineString((1.5, 2.5, 8), (2.5, 2.5, 10),
@@ -182,6 +259,46 @@ class ElevationAreaTest(TestCase):
         self.assertEqual(extent['altitudes']['max'], 45)
         self.assertEqual(extent['altitudes']['min'], 0)
 
+    def test_area_provides_altitudes_of_dem_pixels(self):
+        # Grid point (75, 119) is in the DEM pixel (3, 0)
+        self.assertEqual(self.area['altitudes'][6][5], 5)
+        # Grid point (1250, 769) is outside the DEM
+        self.assertEqual(self.area['altitudes'][-1][-1], 0)
+
+    def test_area_uses_coarsest_overview_fitting_step(self):
+        cur = connections[DEFAULT_DB_ALIAS].cursor()
+        cur.execute("SELECT AddRasterConstraints('mnt'::name, 'rast'::name)")
+        cur.execute('CREATE TABLE o_2_mnt AS SELECT rid, ST_Rescale(rast, 50, -50) AS rast FROM mnt')
+        cur.execute("SELECT AddRasterConstraints('o_2_mnt'::name, 'rast'::name)")
+        cur.execute("SELECT AddOverviewConstraints('o_2_mnt'::name, 'rast'::name, 'mnt'::name, 'rast'::name, 2)")
+        self.assertEqual(AltimetryHelper.dem_resolution(), 25)
+        tables = []
+        for step in (10, 25, 49, 50, 866):
+            cur.execute('SELECT ft_dem_table(%s)', [step])
+            tables.append(cur.fetchone()[0])
+        self.assertEqual(tables, ['mnt', 'mnt', 'mnt', 'o_2_mnt', 'o_2_mnt'])
+
+    def test_area_provides_compact_altitudes(self):
+        area = AltimetryHelper.elevation_area(self.geom, compact=True)
+        self.assertEqual(area['altitudes_encoding'], 'base64-int16le')
+        values = struct.unpack('<%sh' % (53 * 33), base64.b64decode(area['altitudes']))
+        self.assertEqual([values[i:i + 53] for i in range(0, len(values), 53)],
+                         [tuple(row) for row in self.area['altitudes']])
+
+
+class LoadDEMTest(TestCase):
+    def test_load_sql_streams_copy_data(self):
+        cur = connections[DEFAULT_DB_ALIAS].cursor()
+        cur.execute('CREATE TABLE loaddem_test (value integer)')
+        dump = StringIO('COPY loaddem_test (value) FROM stdin;\n'
+                        '1\n2\n'
+                        '\\.\n'
+                        'INSERT INTO loaddem_test VALUES (3);\n')
+        rows, size = LoadDEMCommand().load_sql(dump)
+        self.assertEqual((rows, size), (2, 4))
+        cur.execute('SELECT value FROM loaddem_test ORDER BY value')
+        self.assertEqual(cur.fetchall(), [(1,), (2,), (3,)])
+
 
 class LengthTest(TestCase):
 
@@ -208,6 +325,58 @@ class LengthTest(TestCase):
         self.assertEqual(round(self.path.length, 9), 86.449290957)
 
 
+class DEMTest(TestCase):
+
+    def setUp(self):
+        # Create a simple fake DEM, and copy it
+        conn = connections[DEFAULT_DB_ALIAS]
+        cur = conn.cursor()
+        cur.execute('CREATE TABLE mnt (rid serial primary key, rast raster)')
+        cur.execute('INSERT INTO mnt (rast) VALUES (ST_MakeEmptyRaster(100, 125, 0, 125, 25, -25, 0, 0, %s))', [settings.SRID])
+        cur.execute('UPDATE mnt SET rast = ST_AddBand(rast, \'16BSI\')')
+        demvalues = [[0, 0, 3, 5], [2, 2, 10, 15], [5, 15, 20, 25], [20, 25, 30, 35], [30, 35, 40, 45]]
+        for y in range(0, 5):
+            for x in range(0, 4):
+                cur.execute('UPDATE mnt SET rast = ST_SetValue(rast, %s, %s, %s::float)', [x + 1, y + 1, demvalues[y][x]])
+        self.path = tempfile.mktemp()
+        self.assertTrue(DEM.build(self.path))
+        self.addCleanup(os.remove, self.path)
+
+    def test_pixels_centers(self):
+        dem = DEM(self.path)
+        self.assertEqual((dem.width, dem.height), (4, 5))
+        self.assertEqual(dem.elevation(12.5, 112.5), 0)
+        self.assertEqual(dem.elevation(62.5, 87.5), 10)
+        self.assertEqual(dem.elevation(87.5, 12.5), 45)
+
+    def test_bilinear_interpolation(self):
+        dem = DEM(self.path)
+        self.assertEqual(dem.elevation(75, 87.5), 12.5)
+        self.assertEqual(dem.elevation(62.5, 75), 15)
+        self.assertEqual(dem.elevation(75, 75), (10 + 15 + 20 + 25) / 4.0)
+        self.assertEqual(dem.elevations([(200, 200), (-1, 50)]), [None, None])
+
+    def test_nodata(self):
+        conn = connections[DEFAULT_DB_ALIAS]
+        cur = conn.cursor()
+        cur.execute('UPDATE mnt SET rast = ST_SetBandNoDataValue(rast, 1, 45)')
+        self.assertTrue(DEM.build(self.path))
+        dem = DEM(self.path)
+        self.assertEqual(dem.elevation(87.5, 12.5), None)
+        # Not interpolated with nodata pixels
+        self.assertEqual(dem.elevation(80, 20), None)
+        self.assertEqual(dem.elevation(62.5, 87.5), 10)
+
+    def test_area_uses_dem_copy(self):
+        geom = LineString((10, 10), (90, 110), srid=settings.SRID)
+        expected = AltimetryHelper.elevation_area(geom)
+        with override_settings(ALTIMETRIC_DEM_CACHE=self.path):
+            area = AltimetryHelper.elevation_area(geom)
+        self.assertEqual(area['resolution'], expected['resolution'])
+        self.assertEqual(area['size'], expected['size'])
+        self.assertEqual(len(area['altitudes']), len(expected['altitudes']))
+
+
 class SamplingTest(TestCase):
 
     step = settings.ALTIMETRIC_PROFILE_PRECISION
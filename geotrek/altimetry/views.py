@@ -1,3 +1,4 @@
+import math
 import os
 
 from django.views.generic.edit import BaseDetailView
@@ -39,15 +40,45 @@ class ElevationChart(LastModifiedMixin, BaseDetailView):
 
 class ElevationProfile(LastModifiedMixin, JSONResponseMixin,
                        PublicOrReadPermMixin, BaseDetailView):
-    """Extract elevation profile from a path and return it as JSON"""
+    """Extract elevation profile from a path and return it as JSON
+    (simplified if ``tolerance`` or ``points`` parameters are given)"""
+
+    # Simplification levels are part of cache keys: bound them
+    MAX_TOLERANCE = 1000  # meters
+    MAX_POINTS = 1000
+
+    def get_parameter(self, name, cast):
+        """Positive finite value of parameter, or None if missing or invalid."""
+        try:
+            value = cast(self.request.GET[name])
+        except (KeyError, ValueError):
+            return None
+        if math.isnan(value) or math.isinf(value) or value < 0:
+            return None
+        return value
+
+    def get_tolerance(self):
+        tolerance = self.get_parameter('tolerance', float)
+        if tolerance is None:
+            return None
+        return min(round(tolerance, 1), self.MAX_TOLERANCE)
+
+    def get_points(self):
+        points = self.get_parameter('points', int)
+        if points is None:
+            return None
+        # Extremities are always kept
+        return min(max(points, 2), self.MAX_POINTS)
 
     def get_context_data(self, **kwargs):
         """
         Put elevation profile into response context.
         """
         data = {}
+        profile = self.object.get_elevation_profile(tolerance=self.get_tolerance(),
+                                                    points=self.get_points())
         # Formatted as distance, elevation, [lng, lat]
-        for step in self.object.get_elevation_profile():
+        for step in profile:
             formatted = step[0], step[3], step[1:3]
             data.setdefault('profile', []).append(formatted)
         return data
@@ -55,13 +86,17 @@ class ElevationProfile(LastModifiedMixin, JSONResponseMixin,
 
 class ElevationArea(LastModifiedMixin, JSONResponseMixin, PublicOrReadPermMixin,
                     BaseDetailView):
-    """Extract elevation profile on an area and return it as JSON"""
+    """Extract elevation profile on an area and return it as JSON
+    (with compact altitudes if ``compact`` parameter is given)"""
+
+    def compact(self):
+        return bool(self.request.GET.get('compact'))
 
     def view_cache_key(self):
         """Used by the ``view_cache_response_content`` decorator.
         """
         obj = self.get_object()
-        return 'altimetry_dem_area_%s' % obj.pk
+        return 'altimetry_dem_area_%s%s' % (obj.pk, '_compact' if self.compact() else '')
 
     def latest_updated(self):
         """Used by the ``view_cache_response_content`` decorator.
@@ -74,7 +109,7 @@ class ElevationArea(LastModifiedMixin, JSONResponseMixin, PublicOrReadPermMixin,
         return super(ElevationArea, self).dispatch(*args, **kwargs)
 
     def get_context_data(self, **kwargs):
-        return self.object.get_elevation_area()
+        return self.object.get_elevation_area(compact=self.compact())
 
 
 def serve_elevation_chart(request, model_name, pk):
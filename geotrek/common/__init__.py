@@ -13,7 +13,8 @@ from django.core.exceptions import ImproperlyConfigured
 
 from mapentity.helpers import api_bbox
 
-from geotrek.common.utils.postgresql import load_sql_files, move_models_to_schemas
+from geotrek.common.utils.postgresql import (load_sql_files, install_version_triggers,
+                                             move_models_to_schemas)
 
 
 """
@@ -25,6 +26,7 @@ from geotrek.common.utils.postgresql import load_sql_files, move_models_to_schem
 def run_initial_sql_post_migrate(sender, **kwargs):
     app_label = kwargs.get('app')
     load_sql_files(app_label)
+    install_version_triggers(app_label)
     move_models_to_schemas(app_label)
 
 
@@ -33,6 +35,7 @@ def run_initial_sql_post_syncdb(sender, **kwargs):
     models_module = app.__name__
     app_label = models_module.rsplit('.')[-2]
     load_sql_files(app_label)
+    install_version_triggers(app_label)
     move_models_to_schemas(app_label)
 
 
@@ -4,6 +4,8 @@ from django.utils import translation
 from django.utils.datastructures import SortedDict
 from django.utils.translation.trans_real import get_supported_language_variant
 
+from geotrek.common.mixins import share_properties
+
 
 language_code_prefix_re = re.compile(r'^/api/([\w-]+)(/|$)')
 
@@ -28,3 +30,16 @@ class APILocaleMiddleware(object):
         if language:
             translation.activate(language)
             request.LANGUAGE_CODE = translation.get_language()
+
+
+class SharedPropertiesMiddleware(object):
+    """
+    Share the values of properties added with ``add_property()`` between
+    instances of the same object, during each request.
+    """
+    def process_request(self, request):
+        share_properties(True)
+
+    def process_response(self, request, response):
+        share_properties(False)
+        return response
@@ -2,6 +2,7 @@ import os
 import logging
 import shutil
 import datetime
+import threading
 
 from django.conf import settings
 from django.db.models import Manager as DefaultManager
@@ -13,8 +14,10 @@ from easy_thumbnails.alias import aliases
 from easy_thumbnails.exceptions import InvalidImageFormatError
 from easy_thumbnails.files import get_thumbnailer
 from embed_video.backends import detect_backend
+from mapentity.models import MapEntityMixin as BaseMapEntityMixin
 
 from geotrek.common.utils import classproperty
+from geotrek.common.utils.postgresql import tables_version
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +39,41 @@ class TimeStampedModelMixin(models.Model):
         self.date_update = fromdb.date_update
         return self
 
+    @classmethod
+    def table_version(cls, operations=None):
+        """
+        Version and date of the latest change of the model tables, e.g. for
+        cache keys (c.f. ``tables_version()``).
+        """
+        tables = [cls._meta.db_table] + [p._meta.db_table for p in cls._meta.get_parent_list()]
+        return tables_version(tables, operations)
+
+    @classmethod
+    def changed_since(cls, version):
+        return cls.table_version()[0] > version
+
+    @classmethod
+    def latest_updated(cls):
+        """
+        Date of the latest change of the model tables, deletions included,
+        without scanning records (c.f. ``table_version()``).
+        """
+        return cls.table_version()[1]
+
+
+class MapEntityMixin(BaseMapEntityMixin):
+    """
+    MapEntity models whose cache validators follow their tables versions,
+    instead of the latest ``date_update`` of their records
+    (c.f. ``TimeStampedModelMixin.latest_updated()``).
+    """
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def latest_updated(cls):
+        return cls.table_version()[1]
+
 
 class NoDeleteMixin(models.Model):
     deleted = models.BooleanField(editable=False, default=False, db_column='supprime', verbose_name=_(u"Deleted"))
@@ -381,10 +419,125 @@ class OptionalPictogramMixin(PictogramMixin):
 OptionalPictogramMixin._meta.get_field('pictogram').blank = True
 
 
+_properties_generation = {'value': 0}
+_shared_properties = threading.local()
+
+
+def invalidate_properties(sender=None, **kwargs):
+    """
+    Forget the values of all properties added with ``add_property()``.
+    Connected to model signals, since any written object can change them.
+
+    Writes that do not send signals (``QuerySet.update()``, raw SQL, and
+    what triggers do as a result) must call it explicitly, as done by
+    ``TopologyHelper``. Only the current process is concerned: values are
+    kept per instance, or per request when shared (c.f. ``share_properties()``).
+    """
+    _properties_generation['value'] += 1
+
+
+models.signals.post_save.connect(invalidate_properties, dispatch_uid='invalidate_properties_save')
+models.signals.post_delete.connect(invalidate_properties, dispatch_uid='invalidate_properties_delete')
+models.signals.m2m_changed.connect(invalidate_properties, dispatch_uid='invalidate_properties_m2m')
+
+
+def share_properties(enabled=True):
+    """
+    Share (or stop sharing) the values of properties added with ``add_property()``
+    between instances of the same object, in the current thread.
+    (c.f. ``geotrek.common.middleware.SharedPropertiesMiddleware``)
+    """
+    _shared_properties.values = {} if enabled else None
+
+
+def prefetch_properties(objects, names):
+    """
+    Compute the properties ``names`` added with ``add_property()`` for all
+    ``objects`` (instances of the same model) at once, and attach their values.
+    Names of other attributes, or of properties that cannot be prefetched, are
+    ignored. Returns ``objects``: a queryset is evaluated, and keeps the
+    instances with their values in its cache.
+    """
+    instances = list(objects)
+    if not instances:
+        return objects
+    model = instances[0].__class__
+    for name in names:
+        descriptor = getattr(model, name, None)
+        if not isinstance(descriptor, memoized_property) or descriptor.prefetch is None:
+            continue
+        pending = [o for o in instances if not descriptor.is_attached(o)]
+        if not pending:
+            continue
+        if callable(descriptor.prefetch):
+            values = descriptor.prefetch(pending)
+        else:
+            prefetch_properties(pending, descriptor.prefetch)
+            values = dict((o.pk, descriptor.func(o)) for o in pending)
+        for obj in pending:
+            if obj.pk in values:
+                descriptor.attach(obj, values[obj.pk])
+    return objects
+
+
+class memoized_property(object):
+    """
+    A read-only property, computed once per instance until any object is
+    written (or the instance reloaded).
+
+    ``prefetch`` computes it for a list of instances at once (c.f.
+    ``prefetch_properties()``): either a function returning a dict
+    {instance pk: value}, or the names of the properties it is computed from.
+    """
+    def __init__(self, name, func, prefetch=None):
+        self.name = name
+        self.func = func
+        self.prefetch = prefetch
+        self.__doc__ = func.__doc__
+
+    def _values(self, instance):
+        generation = _properties_generation['value']
+        generation_values = instance.__dict__.get('_properties_cache')
+        if generation_values is None or generation_values[0] != generation:
+            generation_values = instance.__dict__['_properties_cache'] = (generation, {})
+        return generation, generation_values[1]
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        generation, values = self._values(instance)
+
+        if self.name not in values:
+            shared = getattr(_shared_properties, 'values', None)
+            if shared is not None and instance.pk is not None:
+                key = (instance.__class__, instance.pk, self.name)
+                if shared.get(key, (None,))[0] != generation:
+                    shared[key] = (generation, self.func(instance))
+                values[self.name] = shared[key][1]
+            else:
+                values[self.name] = self.func(instance)
+        return values[self.name]
+
+    def attach(self, instance, value):
+        self._values(instance)[1][self.name] = value
+
+    def is_attached(self, instance):
+        return self.name in self._values(instance)[1]
+
+    def __set__(self, instance, value):
+        raise AttributeError("can't set attribute")
+
+
 class AddPropertyMixin(object):
     @classmethod
-    def add_property(cls, name, func, verbose_name):
+    def add_property(cls, name, func, verbose_name, prefetch=None):
         if hasattr(cls, name):
             raise AttributeError("%s has already an attribute %s" % (cls, name))
-        setattr(cls, name, property(func))
+        setattr(cls, name, memoized_property(name, func, prefetch))
         setattr(cls, '%s_verbose_name' % name, verbose_name)
+
+    def invalidate_properties(self):
+        """
+        Forget the values of properties added with ``add_property()``.
+        """
+        self.__dict__.pop('_properties_cache', None)
@@ -45,3 +45,51 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+
+
+-------------------------------------------------------------------------------
+-- Versions of tables, logged once per statement (see ``TimeStampedModelMixin.table_version()``)
+-------------------------------------------------------------------------------
+
+DO $$
+BEGIN
+    -- We can't use IF NOT EXISTS until PostgreSQL 9.5.
+    CREATE SEQUENCE o_t_version_seq;
+EXCEPTION
+  WHEN duplicate_table THEN
+    RAISE NOTICE 'Sequence exists.';
+END;
+$$;
+
+-- Append-only: concurrent transactions never wait for each other's version
+CREATE TABLE IF NOT EXISTS o_t_version (
+    version bigint PRIMARY KEY,
+    nom_table varchar(64) NOT NULL,
+    operation varchar(8) NOT NULL,
+    date_update timestamp NOT NULL
+);
+
+DROP INDEX IF EXISTS o_t_version_nom_table_idx;
+CREATE INDEX o_t_version_nom_table_idx ON o_t_version(nom_table, operation, version);
+
+CREATE OR REPLACE FUNCTION geotrek.ft_version_update() RETURNS trigger AS $$
+DECLARE
+    t_version bigint;
+BEGIN
+    -- Statement-level trigger: one row per statement, whatever the number of rows
+    t_version := nextval('o_t_version_seq');
+    INSERT INTO o_t_version (version, nom_table, operation, date_update)
+    VALUES (t_version, TG_TABLE_NAME, TG_OP, statement_timestamp() AT TIME ZONE 'UTC');
+
+    -- Now and then, keep only the latest version of each table and operation.
+    -- A single transaction prunes at a time, the others do not wait for it.
+    IF t_version % 100 = 0 AND pg_try_advisory_xact_lock(hashtext('o_t_version')) THEN
+        DELETE FROM o_t_version v
+        WHERE EXISTS (SELECT 1 FROM o_t_version latest
+                      WHERE latest.nom_table = v.nom_table
+                        AND latest.operation = v.operation
+                        AND latest.version > v.version);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
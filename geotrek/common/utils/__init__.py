@@ -129,6 +129,85 @@ def intersecting(cls, obj, distance=None):
     return qs
 
 
+def intersecting_many(cls, objects, distance=0):
+    """ Same as ``intersecting()`` for several objects of the same model, with
+    one spatial join: returns a dict {object pk: queryset of cls instances}.
+    """
+    objects = list(objects)
+    if not objects:
+        return {}
+    # Geometries may be stored in parent tables (e.g. topologies)
+    obj_field = objects[0]._meta.get_field('geom')
+    cls_field = cls._meta.get_field('geom')
+    condition = 'ST_DWithin(o.{o_geom}, c.{c_geom}, %s)' if distance else 'ST_Intersects(o.{o_geom}, c.{c_geom})'
+    if objects[0].__class__ == cls:
+        # Prevent self intersection
+        condition += ' AND o.{o_pk} != c.{c_pk}'
+    sql = """
+    SELECT o.{o_pk}, c.{c_pk}
+    FROM {o_table} o, {c_table} c
+    WHERE o.{o_pk} = ANY(%s) AND """ + condition + """
+    ORDER BY o.{o_pk}, CASE WHEN GeometryType(o.{o_geom}) = 'LINESTRING'
+        THEN ST_Line_Locate_Point(o.{o_geom}, ST_StartPoint(ST_GeometryN(ST_Intersection(o.{o_geom}, c.{c_geom}), 1)))
+    END
+    """
+    sql = sql.format(o_table=obj_field.model._meta.db_table, o_pk=obj_field.model._meta.pk.column,
+                     o_geom=obj_field.column, c_table=cls_field.model._meta.db_table,
+                     c_pk=cls_field.model._meta.pk.column, c_geom=cls_field.column)
+    params = [[o.pk for o in objects]] + ([distance] if distance else [])
+    cursor = connection.cursor()
+    cursor.execute(sql, params)
+    qs = cls.objects
+    if hasattr(qs, 'existing'):
+        qs = qs.existing()
+    return group_related(qs, [o.pk for o in objects], cursor.fetchall())
+
+
+def group_related(queryset, keys, pairs):
+    """ Small helper to group the instances of ``queryset`` by key, from a list
+    of (key, instance pk) pairs, preserving their order. Each group is a
+    queryset, already evaluated (like ``prefetch_related()`` ones).
+    """
+    instances = queryset.in_bulk(set(pk for key, pk in pairs))
+    grouped = dict((key, []) for key in keys)
+    for key, pk in pairs:
+        if pk in instances and instances[pk] not in grouped[key]:
+            grouped[key].append(instances[pk])
+    return dict((key, evaluated_queryset(queryset, values)) for key, values in grouped.items())
+
+
+class PrefetchedQuerySetMixin(object):
+    """ Queryset of instances fetched beforehand: iterating it yields them
+    without any query, whereas its clones (``filter()``, ``get()``...) query
+    the database as usual.
+    """
+    prefetched = None
+
+    def iterator(self):
+        if self.prefetched is None:
+            return super(PrefetchedQuerySetMixin, self).iterator()
+        return iter(self.prefetched)
+
+
+_prefetched_classes = {}
+
+
+def evaluated_queryset(queryset, instances):
+    """ Returns a queryset of the given ``instances``, of the same class as
+    ``queryset``, already evaluated without querying them again (like
+    ``prefetch_related()`` ones).
+    """
+    base = queryset.__class__
+    if base not in _prefetched_classes:
+        _prefetched_classes[base] = type(str('Prefetched%s' % base.__name__),
+                                         (PrefetchedQuerySetMixin, base), {})
+    filtered = queryset.filter(pk__in=[i.pk for i in instances])
+    qs = _prefetched_classes[base](model=filtered.model, query=filtered.query, using=filtered.db)
+    qs.prefetched = instances
+    len(qs)  # Evaluate
+    return qs
+
+
 def plain_text_preserve_linebreaks(value):
     value = re.sub(ur'\s*<br\s*/?>\s*', u'##~~~~~~##', value)
     value = re.sub(ur'\s*<p>\s*', u'##~~~~~~####~~~~~~##', value)
@@ -7,6 +7,7 @@ from functools import wraps
 from django.db import connection, models
 from django.conf import settings
 from django.db.models import get_app, get_models
+from django.utils.timezone import utc
 
 
 logger = logging.getLogger(__name__)
@@ -52,6 +53,38 @@ def debug_pg_notices(f):
     return wrapped
 
 
+def tables_version(tables, operations=None):
+    """
+    Returns the version and the date of the latest change of the specified
+    tables, logged once per statement by ``ft_version_update()`` triggers.
+    Changes can be restricted to some operations (e.g. ``['DELETE']``).
+    Returns ``(0, None)`` if the tables were never changed.
+    """
+    cursor = connection.cursor()
+    cursor.execute("""
+    SELECT version, date_update FROM o_t_version
+    WHERE nom_table = ANY(%s) AND (%s OR operation = ANY(%s))
+    ORDER BY version DESC LIMIT 1
+    """, [list(tables), operations is None, list(operations or [])])
+    row = cursor.fetchone()
+    if row is None:
+        return 0, None
+    return row[0], row[1].replace(tzinfo=utc)
+
+
+def tables_changed_since(version, tables=None):
+    """
+    Returns the names of the tables changed since the specified version
+    (c.f. ``tables_version()``).
+    """
+    cursor = connection.cursor()
+    cursor.execute("""
+    SELECT DISTINCT nom_table FROM o_t_version
+    WHERE version > %s AND (%s OR nom_table = ANY(%s))
+    """, [version, tables is None, list(tables or [])])
+    return set(row[0] for row in cursor.fetchall())
+
+
 def load_sql_files(app_label):
     """
     Look for SQL files in Django app, and load them into database.
@@ -99,6 +132,23 @@ def load_sql_files(app_label):
             raise
 
 
+def install_version_triggers(app_label):
+    """
+    Log changes of the tables of timestamped models once per statement
+    (c.f. ``tables_version()``), on which their cache validators are keyed.
+    """
+    cursor = connection.cursor()
+    for model in get_models(get_app(app_label)):
+        if not hasattr(model, 'table_version') or model._meta.proxy or not model._meta.managed:
+            continue
+        table_name = model._meta.db_table
+        cursor.execute("DROP TRIGGER IF EXISTS %(table)s_version_iud_tgr ON %(table)s;"
+                       "CREATE TRIGGER %(table)s_version_iud_tgr"
+                       " AFTER INSERT OR UPDATE OR DELETE ON %(table)s"
+                       " FOR EACH STATEMENT EXECUTE PROCEDURE ft_version_update();" % {'table': table_name})
+        logger.debug("Installed version trigger on %s" % table_name)
+
+
 def move_models_to_schemas(app_label):
     """
     Move models tables to PostgreSQL schemas.
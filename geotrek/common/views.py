@@ -13,6 +13,7 @@ from mapentity import views as mapentity_views
 from mapentity.settings import app_settings
 
 from geotrek.common.utils import sql_extent
+from geotrek.common.mixins import prefetch_properties
 from geotrek import __version__
 
 # async data imports
@@ -58,6 +59,28 @@ class FormsetMixin(object):
         return context
 
 
+class PrefetchPropertiesFormatMixin(object):
+    """
+    Compute the properties of the exported columns for all objects at once.
+    """
+    def get_queryset(self):
+        qs = super(PrefetchPropertiesFormatMixin, self).get_queryset()
+        # Evaluated now, the queryset keeps the prefetched instances
+        return prefetch_properties(qs, self.columns)
+
+
+class PrefetchPropertiesViewSetMixin(object):
+    """
+    Compute the properties ``prefetched_properties`` for all listed objects at once.
+    """
+    prefetched_properties = ['cities', 'districts', 'areas']
+
+    def get_serializer(self, instance=None, *args, **kwargs):
+        if kwargs.get('many') and instance is not None:
+            instance = prefetch_properties(instance, self.prefetched_properties)
+        return super(PrefetchPropertiesViewSetMixin, self).get_serializer(instance, *args, **kwargs)
+
+
 class PublicOrReadPermMixin(object):
 
     def get_object(self, queryset=None):
@@ -9,6 +9,7 @@ from django.conf import settings
 from django.contrib.gis.forms.fields import LineStringField
 from django.contrib.gis.geos import fromstr, Point, LineString
 
+from .helpers import PathHelper
 from .models import Topology, Path
 from .widgets import PointLineTopologyWidget, SnappedLineStringWidget
 
@@ -80,15 +81,17 @@ class SnappedLineStringField(LineStringField):
             snaplist = value.get('snap', [])
             if geom.num_coords != len(snaplist):
                 raise ValueError("Snap list length != %s (%s)" % (geom.num_coords, snaplist))
-            paths = [Path.objects.get(pk=pk) if pk is not None else None
-                     for pk in snaplist]
+            paths = Path.objects.in_bulk([pk for pk in snaplist if pk is not None])
             coords = list(geom.coords)
-            for i, (vertex, path) in enumerate(zip(coords, paths)):
-                if path:
-                    # Snap vertex on path
-                    snap = path.snap(Point(*vertex, srid=geom.srid))
-                    coords[i] = snap.coords
+            snapped = [(i, paths[int(pk)]) for i, pk in enumerate(snaplist) if pk is not None]
+            if snapped:
+                # Snap vertices on paths, all at once
+                points = [Point(*coords[i], srid=geom.srid) for i, path in snapped]
+                snaps = PathHelper.snap_many([path for i, path in snapped], points)
+                for (i, path), snap in zip(snapped, snaps):
+                    if snap is not None:
+                        coords[i] = snap.coords
             return LineString(*coords, srid=settings.SRID)
-        except (TypeError, Path.DoesNotExist, ValueError) as e:
+        except (TypeError, KeyError, ValueError) as e:
             logger.warning("User input error: %s" % e)
             raise ValidationError(self.error_messages['invalid_snap_line'])
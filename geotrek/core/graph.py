@@ -1,4 +1,6 @@
+import heapq
 import math
+import uuid
 from collections import defaultdict
 
 
@@ -55,3 +57,206 @@ def graph_edges_nodes_of_qs(qs):
         'edges': dict(edges),
         'nodes': dict(nodes),
     }
+
+
+def graph_state_of_qs(qs, version=0):
+    """
+    return an incremental graph of paths network, at the given version:
+    state {
+        base: unique id of this graph, node ids are valid within it
+        version: version of paths network
+        graph: graph on the form of ``graph_edges_nodes_of_qs``
+        adjacency: adjacency lists on the form of ``graph_adjacency``
+        node_ids: {coord_point: node_id}
+    }
+    """
+    state = {
+        'base': uuid.uuid4().hex,
+        'version': version,
+        'graph': {'edges': {}, 'nodes': {}},
+        'adjacency': {},
+        'node_ids': {},
+    }
+    for path in qs:
+        graph_add_path(state, path)
+    return state
+
+
+def graph_add_path(state, path):
+    node_ids = state['node_ids']
+    coords = path.geom.coords
+    start = node_ids.setdefault(coords[0], len(node_ids) + 1)
+    end = node_ids.setdefault(coords[-1], len(node_ids) + 1)
+
+    edge = path_modifier(path)
+    edge['nodes_id'] = [start, end]
+    edge_id = edge['id']
+
+    graph, adjacency = state['graph'], state['adjacency']
+    graph['edges'][edge_id] = edge
+    graph['nodes'].setdefault(start, {})[end] = edge_id
+    graph['nodes'].setdefault(end, {})[start] = edge_id
+    adjacency.setdefault(start, []).append((end, edge_id, edge['length']))
+    adjacency.setdefault(end, []).append((start, edge_id, edge['length']))
+
+
+def graph_remove_path(state, edge_id):
+    graph, adjacency = state['graph'], state['adjacency']
+    edge = graph['edges'].pop(edge_id, None)
+    if edge is None:
+        return
+
+    start, end = edge['nodes_id']
+    for node, other in ((start, end), (end, start)):
+        remaining = [n for n in adjacency.get(node, []) if n[1] != edge_id]
+        if remaining:
+            adjacency[node] = remaining
+        else:
+            adjacency.pop(node, None)
+        neighbours = graph['nodes'].get(node, {})
+        if neighbours.get(other) == edge_id:
+            # Another edge may link the same nodes
+            others = [e for n, e, l in remaining if n == other]
+            if others:
+                neighbours[other] = others[-1]
+            else:
+                del neighbours[other]
+        if not neighbours:
+            graph['nodes'].pop(node, None)
+
+
+def graph_update(state, version, changed_ids, paths):
+    """
+    Bring the graph ``state`` to ``version``: ``changed_ids`` are the ids of paths
+    added, modified or deleted since its version, and ``paths`` those that still exist.
+    """
+    for edge_id in changed_ids:
+        graph_remove_path(state, edge_id)
+    for path in paths:
+        graph_add_path(state, path)
+    state['version'] = version
+
+
+def graph_compact(state, edge_ids=None):
+    """
+    return edges of the graph ``state`` as a list of numeric arrays:
+    [[edge_id, start_node_id, end_node_id, length], ...]
+    """
+    edges = state['graph']['edges']
+    if edge_ids is None:
+        edge_ids = edges.keys()
+    return [[edge_id] + edges[edge_id]['nodes_id'] + [edges[edge_id]['length']]
+            for edge_id in sorted(edge_ids) if edge_id in edges]
+
+
+def graph_adjacency(graph):
+    """
+    return the adjacency lists of a graph built by ``graph_edges_nodes_of_qs``:
+    adjacency {
+        node_id: [(neighbour_node_id, edge_id, length), ...]
+    }
+
+    Unlike graph nodes, it keeps every edge between two same nodes.
+    """
+    adjacency = defaultdict(list)
+    for edge_id, edge in graph['edges'].items():
+        start, end = edge['nodes_id']
+        adjacency[start].append((end, edge_id, edge['length']))
+        adjacency[end].append((start, edge_id, edge['length']))
+    return dict(adjacency)
+
+
+def shortest_path(adjacency, sources, targets):
+    """
+    Dijkstra algorithm from several sources to several targets.
+
+    ``sources`` and ``targets`` are dicts {node_id: cost}, with the cost to
+    reach the source node, and to leave the graph from the target node.
+
+    return (cost, [(edge_id, from_node_id, to_node_id), ...], target_node_id)
+    or None if targets can't be reached.
+    """
+    tentative = dict(sources)
+    previous = {}
+    visited = set()
+    best = None
+
+    heap = [(cost, node) for node, cost in sources.items()]
+    heapq.heapify(heap)
+    while heap:
+        cost, node = heapq.heappop(heap)
+        if best is not None and cost >= best[0]:
+            break
+        if node in visited:
+            continue
+        visited.add(node)
+        if node in targets:
+            total = cost + targets[node]
+            if best is None or total < best[0]:
+                best = (total, node)
+        for neighbour, edge_id, length in adjacency.get(node, []):
+            if neighbour in visited:
+                continue
+            neighbour_cost = cost + length
+            if neighbour_cost < tentative.get(neighbour, float('inf')):
+                tentative[neighbour] = neighbour_cost
+                previous[neighbour] = (node, edge_id)
+                heapq.heappush(heap, (neighbour_cost, neighbour))
+
+    if best is None:
+        return None
+
+    total, target = best
+    steps = []
+    node = target
+    while node in previous:
+        from_node, edge_id = previous[node]
+        steps.insert(0, (edge_id, from_node, node))
+        node = from_node
+    return total, steps, target
+
+
+def route(graph, adjacency, markers):
+    """
+    return the shortest way through ``markers``, a list of (path_id, position)
+    snapped on the graph edges, as a list of sub-topologies in the
+    ``TopologyHelper.serialize`` format (one per way between markers).
+
+    Raise ``KeyError`` if a marker is not on the graph, and ``ValueError`` if
+    two markers are not connected.
+    """
+    edges = graph['edges']
+    subtopologies = []
+    for (start_id, start_pos), (end_id, end_pos) in zip(markers[:-1], markers[1:]):
+        start_edge, end_edge = edges[start_id], edges[end_id]
+        if start_id == end_id:
+            subtopologies.append({'paths': [start_id],
+                                  'positions': {0: (start_pos, end_pos)}})
+            continue
+
+        # Leave start path from one of its extremities, reach end path by one of its extremities
+        start_length, end_length = start_edge['length'], end_edge['length']
+        sources, targets = {}, {}
+        start_costs = (start_pos * start_length, (1 - start_pos) * start_length)
+        for node, cost in zip(start_edge['nodes_id'], start_costs):
+            sources[node] = min(cost, sources.get(node, float('inf')))
+        end_costs = (end_pos * end_length, (1 - end_pos) * end_length)
+        for node, cost in zip(end_edge['nodes_id'], end_costs):
+            targets[node] = min(cost, targets.get(node, float('inf')))
+
+        found = shortest_path(adjacency, sources, targets)
+        if found is None:
+            raise ValueError("Paths %s and %s are not connected" % (start_id, end_id))
+        cost, steps, target = found
+
+        first_node = steps[0][1] if steps else target
+        paths = [start_id]
+        positions = {0: (start_pos, 0.0 if first_node == start_edge['nodes_id'][0] else 1.0)}
+        for edge_id, from_node, to_node in steps:
+            forward = from_node == edges[edge_id]['nodes_id'][0]
+            positions[len(paths)] = (0.0, 1.0) if forward else (1.0, 0.0)
+            paths.append(edge_id)
+        positions[len(paths)] = (0.0 if target == end_edge['nodes_id'][0] else 1.0, end_pos)
+        paths.append(end_id)
+        subtopologies.append({'paths': paths, 'positions': positions})
+    return subtopologies
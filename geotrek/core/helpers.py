@@ -1,17 +1,36 @@
 import json
 import logging
+from contextlib import contextmanager
 
 from django.conf import settings
-from django.db import connection
+from django.db import connection, connections, transaction
 from django.contrib.gis.geos import Point
 from django.db.models.query import QuerySet
 
-from geotrek.common.utils import sqlfunction, uniquify
+from geotrek.common.mixins import invalidate_properties
+from geotrek.common.utils import sqlfunction, group_related
 
 
 logger = logging.getLogger(__name__)
 
 
+# Compute again altimetry of rows of a table, as done by triggers on geometry
+# update, but without updating geometry (c.f. ``update_altimetry()``)
+ALTIMETRY_UPDATE_SQL = """
+UPDATE %(table)s AS t
+SET geom_3d = (i.elevation).draped,
+    longueur = ST_3DLength((i.elevation).draped),
+    pente = (i.elevation).slope,
+    altitude_minimum = (i.elevation).min_elevation,
+    altitude_maximum = (i.elevation).max_elevation,
+    denivelee_positive = (i.elevation).positive_gain,
+    denivelee_negative = (i.elevation).negative_gain
+FROM (SELECT id, ft_elevation_infos(geom) AS elevation FROM %(table)s
+      WHERE id BETWEEN %%s AND %%s AND date_update < %%s) AS i
+WHERE t.id = i.id
+"""
+
+
 class TopologyHelper(object):
     @classmethod
     def deserialize(cls, serialized):
@@ -87,24 +106,30 @@ class TopologyHelper(object):
 
         kind = objdict[0].get('kind')
         offset = objdict[0].get('offset', 0.0)
-        topology = TopologyFactory.create(no_path=True, kind=kind, offset=offset)
-        # Remove all existing path aggregation (WTF: created from factory ?)
-        PathAggregation.objects.filter(topo_object=topology).delete()
 
         try:
+            # Fetch all paths at once
+            pks = set([int(path_id) for subtopology in objdict for path_id in subtopology['paths']])
+            paths = Path.objects.in_bulk(pks)
+            aggregations = []
             counter = 0
             for j, subtopology in enumerate(objdict):
                 last_topo = j == len(objdict) - 1
                 positions = subtopology.get('positions', {})
-                paths = subtopology['paths']
+                paths_ids = subtopology['paths']
                 # Create path aggregations
-                for i, path in enumerate(paths):
-                    last_path = i == len(paths) - 1
+                for i, path_id in enumerate(paths_ids):
+                    last_path = i == len(paths_ids) - 1
                     # Javascript hash keys are parsed as a string
                     idx = str(i)
                     start_position, end_position = positions.get(idx, (0.0, 1.0))
-                    path = Path.objects.get(pk=path)
-                    topology.add_path(path, start=start_position, end=end_position, order=counter, reload=False)
+                    path = paths.get(int(path_id))
+                    if path is None:
+                        raise Path.DoesNotExist("Path %s does not exist" % path_id)
+                    aggregations.append(PathAggregation(path=path,
+                                                        start_position=start_position,
+                                                        end_position=end_position,
+                                                        order=counter))
                     if not last_topo and last_path:
                         counter += 1
                         # Intermediary marker.
@@ -123,16 +148,63 @@ class TopologyHelper(object):
                             pos = start_position
                         elif end_position == 1.0:
                             pos = start_position
-                        elif len(paths) == 1:
+                        elif len(paths_ids) == 1:
                             pos = end_position
                         assert pos >= 0, "Invalid position (%s, %s)." % (start_position, end_position)
-                        topology.add_path(path, start=pos, end=pos, order=counter, reload=False)
+                        aggregations.append(PathAggregation(path=path,
+                                                            start_position=pos,
+                                                            end_position=pos,
+                                                            order=counter))
                     counter += 1
-        except (AssertionError, ValueError, KeyError, Path.DoesNotExist) as e:
+        except (AssertionError, ValueError, KeyError, TypeError, Path.DoesNotExist) as e:
             raise ValueError("Invalid serialized topology : %s" % e)
-        topology.save()
+
+        topology = TopologyFactory.create(no_path=True, kind=kind, offset=offset)
+        for aggregation in aggregations:
+            aggregation.topo_object = topology
+        # Insert all aggregations in one statement, and compute geometry once
+        with cls.postpone_geometry():
+            PathAggregation.objects.bulk_create(aggregations)
+        topology.reload()
         return topology
 
+    @classmethod
+    @contextmanager
+    def postpone_geometry(cls):
+        """
+        Within this block, the geometries of topologies whose paths, aggregations
+        or offset are modified are not computed by triggers on each row. They are
+        computed once each when leaving the block (c.f. ``ft_flush_evenements_geometry``).
+        """
+        with transaction.atomic():
+            cursor = connection.cursor()
+            cursor.execute("SELECT ft_postpone_evenements_geometry();")
+            # If the block fails, the transaction is rolled back with the
+            # queued topologies: do not flush them in an aborted transaction.
+            yield
+            cursor.execute("SELECT ft_flush_evenements_geometry();")
+            invalidate_properties()
+
+    @classmethod
+    def update_altimetry(cls, first, last, before):
+        """
+        Same as ``PathHelper.update_altimetry()`` for topologies. If topology
+        is enabled, their 3D geometries are built again from their paths,
+        which must be up-to-date.
+        Returns the number of topologies updated.
+        """
+        from .models import Topology
+
+        cursor = connection.cursor()
+        if settings.TREKKING_TOPOLOGY_ENABLED:
+            cursor.execute("""
+            SELECT update_geometry_of_evenement(id) FROM %s
+            WHERE id BETWEEN %%s AND %%s AND date_update < %%s
+            """ % Topology._meta.db_table, [first, last, before])
+        else:
+            cursor.execute(ALTIMETRY_UPDATE_SQL % {'table': Topology._meta.db_table}, [first, last, before])
+        return cursor.rowcount
+
     @classmethod
     def _topologypoint(cls, lng, lat, kind=None, snap=None):
         """
@@ -145,8 +217,12 @@ class TopologyHelper(object):
         point = Point(lng, lat, srid=settings.API_SRID)
         point.transform(settings.SRID)
         if snap is None:
-            closest = Path.closest(point)
-            position, offset = closest.interpolate(point)
+            # Closest path and interpolation in one query
+            snapped = PathHelper.closest_many([point])[0]
+            if snapped is None:
+                raise Path.DoesNotExist("No path to snap point on")
+            pk, position, offset = snapped
+            closest = Path.objects.get(pk=pk)
         else:
             closest = Path.objects.get(pk=snap)
             position, offset = closest.interpolate(point)
@@ -202,10 +278,9 @@ class TopologyHelper(object):
 
     @classmethod
     def overlapping(cls, klass, queryset):
-        from .models import Path, Topology, PathAggregation
+        from .models import Topology, PathAggregation
 
         all_objects = klass.objects.existing()
-        is_generic = klass.KIND == Topology.KIND
         single_input = isinstance(queryset, QuerySet)
 
         if single_input:
@@ -216,44 +291,147 @@ class TopologyHelper(object):
         if len(topology_pks) == 0:
             return all_objects.filter(pk__in=[])
 
-        sql = """
-        WITH topologies AS (SELECT id FROM %(topology_table)s WHERE id IN (%(topology_list)s)),
-        -- Concerned aggregations
-             aggregations AS (SELECT * FROM %(aggregations_table)s a, topologies t
-                              WHERE a.evenement = t.id),
-        -- Concerned paths along with (start, end)
-             paths_aggr AS (SELECT a.pk_debut AS start, a.pk_fin AS end, p.id, a.ordre AS order
-                            FROM %(paths_table)s p, aggregations a
-                            WHERE a.troncon = p.id
-                            ORDER BY a.ordre)
-        -- Retrieve primary keys
-        SELECT t.id
-        FROM %(topology_table)s t, %(aggregations_table)s a, paths_aggr pa
-        WHERE a.troncon = pa.id AND a.evenement = t.id
-          AND least(a.pk_debut, a.pk_fin) <= greatest(pa.start, pa.end)
-          AND greatest(a.pk_debut, a.pk_fin) >= least(pa.start, pa.end)
-          AND %(extra_condition)s
-        ORDER BY (pa.order + CASE WHEN pa.start > pa.end THEN (1 - a.pk_debut) ELSE a.pk_debut END);
+        # Aggregations overlapping those of the specified topologies
+        # (c.f. ``ft_troncon_interval()`` and its index)
+        overlap = """
+        FROM %(aggregations_table)s a, %(aggregations_table)s pa
+        WHERE pa.evenement IN (%(topology_list)s)
+          AND ft_troncon_interval(a.troncon, a.pk_debut, a.pk_fin)
+           && ft_troncon_interval(pa.troncon, pa.pk_debut, pa.pk_fin)
         """ % {
-            'topology_table': Topology._meta.db_table,
             'aggregations_table': PathAggregation._meta.db_table,
-            'paths_table': Path._meta.db_table,
             'topology_list': ','.join(topology_pks),
-            'extra_condition': 'true' if is_generic else "kind = '%s'" % klass.KIND
         }
+        # Order by progression along the specified topologies
+        ordering = """
+        SELECT MIN(pa.ordre + CASE WHEN pa.pk_debut > pa.pk_fin THEN (1 - a.pk_debut) ELSE a.pk_debut END)
+        %(overlap)s AND a.evenement = %(topology_table)s.id
+        """ % {'overlap': overlap, 'topology_table': Topology._meta.db_table}
+        where = "%(topology_table)s.id IN (SELECT a.evenement %(overlap)s)" % {
+            'overlap': overlap, 'topology_table': Topology._meta.db_table}
+
+        return all_objects.extra(select={'ordering': ordering}, where=[where],
+                                 order_by=('ordering',))
 
+    @classmethod
+    def overlapping_many(cls, queryset, topologies):
+        """
+        Same as ``overlapping()`` for several topologies at once, with one join:
+        returns a dict {topology pk: objects of queryset}, ordered by
+        progression along each topology.
+        """
+        from .models import PathAggregation
+
+        topology_pks = [t.pk for t in topologies]
+        if len(topology_pks) == 0:
+            return {}
         cursor = connection.cursor()
-        cursor.execute(sql)
-        result = cursor.fetchall()
-        pk_list = uniquify([row[0] for row in result])
+        cursor.execute("""
+        SELECT pa.evenement, a.evenement
+        FROM %(aggregations_table)s a, %(aggregations_table)s pa
+        WHERE pa.evenement = ANY(%%s)
+          AND ft_troncon_interval(a.troncon, a.pk_debut, a.pk_fin)
+           && ft_troncon_interval(pa.troncon, pa.pk_debut, pa.pk_fin)
+        GROUP BY pa.evenement, a.evenement
+        ORDER BY pa.evenement,
+                 MIN(pa.ordre + CASE WHEN pa.pk_debut > pa.pk_fin THEN (1 - a.pk_debut) ELSE a.pk_debut END)
+        """ % {'aggregations_table': PathAggregation._meta.db_table}, [topology_pks])
+        return group_related(queryset, topology_pks, cursor.fetchall())
+
+    # Topology fields computed by triggers: never written by Django,
+    # but read back on each update.
+    COMPUTED_FIELDS = ('geom_3d', 'length', 'ascent', 'descent', 'min_elevation',
+                       'max_elevation', 'slope', 'date_insert', 'date_update')
+
+    @classmethod
+    def update(cls, topologies, fields, using=None):
+        """
+        Write the specified fields of topologies (``e_t_evenement`` table only)
+        in one ``UPDATE``, and read back the fields computed by triggers in the
+        same query (``RETURNING``). Without any field to write, computed fields
+        are only read. Returns the set of updated topologies pks.
 
-        # Return a QuerySet and preserve pk list order
-        # http://stackoverflow.com/a/1310188/141895
-        ordering = 'CASE %s END' % ' '.join(['WHEN %s.id=%s THEN %s' % (Topology._meta.db_table, id_, i)
-                                             for i, id_ in enumerate(pk_list)])
-        queryset = all_objects.filter(pk__in=pk_list).extra(
-            select={'ordering': ordering}, order_by=('ordering',))
-        return queryset
+        Like the former ``save()`` prefetch, the geometry of lines is only
+        written if not computed yet, and the one of points if specified.
+        """
+        from .models import Topology, PathAggregation
+
+        db = connections[using] if using else connection
+        qn = db.ops.quote_name
+        opts = Topology._meta
+        written = [opts.get_field(name) for name in fields if name not in cls.COMPUTED_FIELDS]
+        if not topologies:
+            return set()
+        returned = [opts.get_field(name) for name in cls.COMPUTED_FIELDS + ('geom', 'offset', 'deleted')]
+        select = "SELECT id, FALSE, %s FROM %s WHERE id = ANY(%%s)" % (
+            ', '.join(qn(f.column) for f in returned), opts.db_table)
+
+        cursor = db.cursor()
+        if not written:
+            cursor.execute(select, [[topology.pk for topology in topologies]])
+            return cls._set_returned(topologies, returned, cursor.fetchall())
+
+        rows, params = [], []
+        for topology in topologies:
+            placeholders = ['%s::integer']
+            params.append(topology.pk)
+            for field in written:
+                value = field.get_db_prep_save(field.pre_save(topology, False), connection=db)
+                placeholder = field.get_placeholder(value, db) if hasattr(field, 'get_placeholder') else '%s'
+                placeholders.append('(%s)::%s' % (placeholder, field.db_type(db)))
+                params.append(value)
+            rows.append('(%s)' % ', '.join(placeholders))
+
+        assignments = []
+        for field in written:
+            value = 'v.%s' % qn(field.column)
+            if field.name == 'geom' and settings.TREKKING_TOPOLOGY_ENABLED:
+                # Same test as ``Topology.ispoint()``
+                assignments.append("""%(column)s = CASE WHEN EXISTS (
+                    SELECT 1 FROM %(aggregations_table)s et
+                    WHERE et.evenement = e.id AND et.pk_debut != et.pk_fin)
+                  THEN COALESCE(e.%(column)s, %(value)s)
+                  ELSE COALESCE(%(value)s, e.%(column)s) END""" % {
+                    'column': qn(field.column), 'value': value,
+                    'aggregations_table': PathAggregation._meta.db_table})
+            else:
+                assignments.append('%s = %s' % (qn(field.column), value))
+
+        # The offset trigger recomputes geometries after the update: those
+        # are not visible in ``RETURNING`` and are read once again.
+        cursor.execute("""
+        WITH v (id, %(columns)s) AS (VALUES %(rows)s),
+             previous AS (SELECT e.id, e.decallage FROM %(topology_table)s e, v WHERE e.id = v.id)
+        UPDATE %(topology_table)s e SET %(assignments)s
+          FROM v, previous p
+         WHERE e.id = v.id AND p.id = v.id
+        RETURNING e.id, e.decallage IS DISTINCT FROM p.decallage, %(returned)s
+        """ % {
+            'columns': ', '.join(qn(f.column) for f in written),
+            'rows': ', '.join(rows),
+            'topology_table': opts.db_table,
+            'assignments': ', '.join(assignments),
+            'returned': ', '.join('e.%s' % qn(f.column) for f in returned),
+        }, params)
+        results = cursor.fetchall()
+        moved = [row[0] for row in results if row[1]]
+        if moved:
+            cursor.execute(select, [moved])
+            results += cursor.fetchall()
+        # Written without model signals
+        invalidate_properties()
+        return cls._set_returned(topologies, returned, results)
+
+    @classmethod
+    def _set_returned(cls, topologies, returned, results):
+        bypk = {}
+        for topology in topologies:
+            bypk.setdefault(topology.pk, []).append(topology)
+        for row in results:
+            for topology in bypk[row[0]]:
+                for field, value in zip(returned, row[2:]):
+                    setattr(topology, field.attname, value)
+        return set(row[0] for row in results)
 
 
 class PathHelper(object):
@@ -261,37 +439,216 @@ class PathHelper(object):
     def snap(cls, path, point):
         if not path.pk:
             raise ValueError("Cannot compute snap on unsaved path")
-        if point.srid != path.geom.srid:
-            point.transform(path.geom.srid)
+        return cls.snap_many(path, [point])[0]
+
+    @classmethod
+    def snap_many(cls, path_or_paths, points):
+        """
+        Returns the points snapped (i.e closest) to the path line geometry,
+        or to the paths given for each point, in one query.
+        Points whose path does not exist (anymore) are None.
+        """
+        pks, ewkts = cls._paths_points(path_or_paths, points)
         cursor = connection.cursor()
-        sql = """
-        WITH p AS (SELECT ST_ClosestPoint(geom, '%(ewkt)s'::geometry) AS geom
-                   FROM %(table)s
-                   WHERE id = '%(pk)s')
-        SELECT ST_X(p.geom), ST_Y(p.geom) FROM p
-        """ % {'ewkt': point.ewkt, 'table': path._meta.db_table, 'pk': path.pk}
-        cursor.execute(sql)
-        result = cursor.fetchall()
-        return Point(*result[0], srid=path.geom.srid)
+        cursor.execute("""
+        WITH p AS (SELECT q.n, ST_ClosestPoint(t.geom, ST_GeomFromEWKT(q.ewkt)) AS geom
+                   FROM (SELECT generate_series(1, %s) AS n,
+                                unnest(%s::integer[]) AS troncon,
+                                unnest(%s::text[]) AS ewkt) AS q
+                   LEFT JOIN l_t_troncon t ON t.id = q.troncon)
+        SELECT ST_X(p.geom), ST_Y(p.geom), ST_SRID(p.geom) FROM p ORDER BY p.n
+        """, [len(pks), pks, ewkts])
+        return [Point(x, y, srid=srid) if x is not None else None for x, y, srid in cursor.fetchall()]
 
     @classmethod
     def interpolate(cls, path, point):
         if not path.pk:
             raise ValueError("Cannot compute interpolation on unsaved path")
-        if point.srid != path.geom.srid:
-            point.transform(path.geom.srid)
+        positions, offsets = cls.interpolate_many(path, [point])
+        return positions[0], offsets[0]
+
+    @classmethod
+    def interpolate_many(cls, path_or_paths, points):
+        """
+        Returns positions ([0.0-1.0]) and offsets (distance) of the points
+        along the path, or along the paths given for each point, in one query.
+        Positions and offsets are returned as two lists, with None for points
+        whose path does not exist (anymore).
+        """
+        pks, ewkts = cls._paths_points(path_or_paths, points)
         cursor = connection.cursor()
-        sql = """
+        cursor.execute("""
         SELECT position, distance
-        FROM ft_troncon_interpolate(%(pk)s, ST_GeomFromText('POINT(%(x)s %(y)s)',%(srid)s))
-             AS (position FLOAT, distance FLOAT)
-        """ % {'pk': path.pk,
-               'x': point.x,
-               'y': point.y,
-               'srid': path.geom.srid}
-        cursor.execute(sql)
+        FROM ft_troncons_interpolate(%s::integer[], ARRAY(SELECT ST_GeomFromEWKT(ewkt) FROM unnest(%s::text[]) AS ewkt))
+             AS (idx INTEGER, position FLOAT, distance FLOAT)
+        ORDER BY idx
+        """, [pks, ewkts])
         result = cursor.fetchall()
-        return result[0]
+        return [position for position, _ in result], [offset for _, offset in result]
+
+    @classmethod
+    def _paths_points(cls, path_or_paths, points):
+        """
+        Returns paths ids and points EWKT (in paths SRID), with one path per point.
+        """
+        paths = path_or_paths
+        if not isinstance(paths, (list, tuple)):
+            paths = [paths] * len(points)
+        if len(paths) != len(points):
+            raise ValueError("Expected one path per point (%s != %s)" % (len(paths), len(points)))
+        ewkts = []
+        for path, point in zip(paths, points):
+            if point.srid != path.geom.srid:
+                point = point.transform(path.geom.srid, clone=True)
+            ewkts.append(point.ewkt)
+        return [path.pk for path in paths], ewkts
+
+    @classmethod
+    def closest(cls, point, radius=None):
+        """
+        Returns the id of the closest visible path of the point, or None if
+        there is no path (c.f. ``closest_many()``).
+        """
+        if radius is None:
+            radius = settings.PATH_CLOSEST_SEARCH_RADIUS
+        if point.srid != settings.SRID:
+            point = point.transform(settings.SRID, clone=True)
+        cursor = connection.cursor()
+        cursor.execute("SELECT ft_troncon_closest(ST_GeomFromEWKT(%s), %s)", [point.ewkt, radius])
+        return cursor.fetchone()[0]
+
+    @classmethod
+    def closest_many(cls, points, radius=None):
+        """
+        Returns for each point its closest visible path id, its position
+        ([0.0-1.0]) and offset (distance) along this path, in one query.
+
+        Paths are searched within ``radius`` (``PATH_CLOSEST_SEARCH_RADIUS``
+        by default) using the spatial index, then within a radius doubled
+        until a path is found.
+        Results are None for points without path.
+        """
+        if radius is None:
+            radius = settings.PATH_CLOSEST_SEARCH_RADIUS
+        ewkts = []
+        for point in points:
+            if point.srid != settings.SRID:
+                point = point.transform(settings.SRID, clone=True)
+            ewkts.append(point.ewkt)
+        if not ewkts:
+            return []
+        cursor = connection.cursor()
+        cursor.execute("""
+        SELECT idx, troncon, position, distance
+        FROM ft_troncons_snap(ARRAY(SELECT ST_GeomFromEWKT(ewkt) FROM unnest(%s::text[]) AS ewkt), %s)
+             AS (idx INTEGER, troncon INTEGER, position FLOAT, distance FLOAT)
+        """, [ewkts, radius])
+        results = [None] * len(ewkts)
+        for idx, pk, position, distance in cursor.fetchall():
+            results[idx - 1] = (pk, position, distance)
+        return results
+
+    @classmethod
+    def topologies_many(cls, queryset, paths):
+        """
+        Returns a dict {path pk: objects of queryset}, for the topologies
+        lying on several paths, in one query.
+        """
+        from .models import PathAggregation
+
+        path_pks = [p.pk for p in paths]
+        pairs = PathAggregation.objects.filter(path__in=path_pks)\
+                                       .order_by('path', 'topo_object')\
+                                       .values_list('path', 'topo_object').distinct()
+        return group_related(queryset, path_pks, list(pairs))
+
+    @classmethod
+    def bulk_import(cls, lines, structure, chunk=1000):
+        """
+        Create paths from (geometry, name, external id) tuples all at once,
+        with geometries in ``settings.SRID``:
+        they are snapped and split at their intersections in one pass, and only
+        those crossing existing paths go through the row by row triggers
+        (c.f. ``ft_troncons_import()``). Returns the number of paths created.
+        """
+        cursor = connection.cursor()
+        with TopologyHelper.postpone_geometry():
+            for i in xrange(0, len(lines), chunk):
+                geoms, names, eids = zip(*lines[i:i + chunk])
+                cursor.execute("""
+                INSERT INTO l_t_troncon_import (structure, nom, id_externe, geom)
+                SELECT %s, unnest(%s::text[]), unnest(%s::text[]), ST_GeomFromText(unnest(%s::text[]), %s)
+                """, [structure.pk, list(names), [eid or '' for eid in eids],
+                      [geom.wkt for geom in geoms], settings.SRID])
+            cursor.execute("SELECT ft_troncons_import()")
+            return cursor.fetchone()[0]
+
+    @classmethod
+    def reverse_many(cls, pks):
+        """
+        Reverse paths and the positions of their aggregations, with one update
+        statement each: the affected topologies are computed once each.
+        """
+        from .models import Path
+
+        with TopologyHelper.postpone_geometry():
+            # Invert positions first: positions of points with offset are
+            # computed again by trigger along the reversed geometry.
+            cls.reverse_aggregations(pks)
+            cursor = connection.cursor()
+            cursor.execute("UPDATE %s SET geom = ST_Reverse(geom) WHERE id = ANY(%%s)" % Path._meta.db_table,
+                           [list(pks)])
+
+    @classmethod
+    def reverse_aggregations(cls, pks):
+        """
+        Invert the positions of aggregations on reversed paths, in one statement.
+        """
+        from .models import PathAggregation
+
+        cursor = connection.cursor()
+        cursor.execute("""
+        UPDATE %s SET pk_debut = 1 - pk_debut, pk_fin = 1 - pk_fin WHERE troncon = ANY(%%s)
+        """ % PathAggregation._meta.db_table, [list(pks)])
+
+    @classmethod
+    def update_altimetry(cls, first, last, before):
+        """
+        Drape again the paths with ids between ``first`` and ``last``, not
+        updated since ``before``. Only altimetry fields are written, thus
+        geometry triggers (splitting, topologies) are not fired.
+        Returns the number of paths updated.
+        """
+        from .models import Path
+
+        cursor = connection.cursor()
+        cursor.execute(ALTIMETRY_UPDATE_SQL % {'table': Path._meta.db_table}, [first, last, before])
+        return cursor.rowcount
+
+    @classmethod
+    def graph_changes(cls, since=0, until=None):
+        """
+        Returns the current version of paths network, the ids of paths added,
+        modified or deleted since version ``since`` (up to ``until`` if
+        given), and whether these changes are complete (i.e. ``since`` was
+        neither pruned from the log nor rolled back).
+
+        Versions are given in commit order, thus changes committed after a
+        read always get a higher version. Changes of the current transaction
+        get their version now.
+        """
+        cursor = connection.cursor()
+        cursor.execute("SELECT ft_troncon_graph_log_version()")
+        cursor.execute("""
+        WITH current AS (SELECT COALESCE(MAX(version), 0) AS version FROM l_t_troncon_graph_log)
+        SELECT current.version,
+               ARRAY(SELECT DISTINCT troncon FROM l_t_troncon_graph_log
+                     WHERE version > %(since)s AND (%(until)s IS NULL OR version <= %(until)s)),
+               %(since)s = current.version OR EXISTS (SELECT 1 FROM l_t_troncon_graph_log
+                                                      WHERE version = %(since)s)
+        FROM current
+        """, {'since': since, 'until': until})
+        return cursor.fetchone()
 
     @classmethod
     def disjoint(cls, geom, pk):
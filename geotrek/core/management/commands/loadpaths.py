@@ -0,0 +1,73 @@
+import os.path
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.gis.gdal import DataSource, OGRException
+from django.db import transaction
+
+from geotrek.authent.models import Structure
+from geotrek.core.helpers import PathHelper
+from geotrek.core.models import Path
+
+
+class Command(BaseCommand):
+    args = '<line_layer>'
+    help = 'Load a layer with linestring geometries as paths, all at once.\n'
+    help += 'Paths are snapped and split at their intersections in one pass, '
+    help += 'instead of one by one.\n'
+    can_import_settings = True
+
+    option_list = BaseCommand.option_list + (
+        make_option('--name-field',
+                    dest='name_field',
+                    default='name',
+                    help='Field of the layer with paths names.'),
+        make_option('--eid-field',
+                    dest='eid_field',
+                    default=None,
+                    help='Field of the layer with paths external ids.'),
+        make_option('--structure',
+                    dest='structure',
+                    default=settings.DEFAULT_STRUCTURE_NAME,
+                    help='Name of the structure of paths.'),
+        make_option('--encoding',
+                    dest='encoding',
+                    default='utf-8',
+                    help='Encoding of the layer fields.'),
+    )
+
+    def handle(self, *args, **options):
+        # Validate arguments
+        if len(args) != 1:
+            raise CommandError('Filename missing. See help')
+
+        filename = args[0]
+
+        if not os.path.exists(filename):
+            raise CommandError('File does not exists at: %s' % filename)
+
+        try:
+            datasource = DataSource(filename, encoding=options['encoding'])
+        except OGRException as e:
+            raise CommandError('Layer format is not recognized by GDAL: %s' % e)
+        layer = datasource[0]
+        self.stdout.write('%s objects found' % len(layer))
+
+        name_length = Path._meta.get_field('name').max_length
+        lines = []
+        for feature in layer:
+            geometry = feature.geom
+            geometry.coord_dim = 2
+            if layer.srs is not None:
+                geometry.transform(settings.SRID)
+            name = feature.get(options['name_field']) if options['name_field'] in layer.fields else None
+            eid = feature.get(options['eid_field']) if options['eid_field'] else None
+            parts = geometry if geometry.geom_type.name.startswith('Multi') else [geometry]
+            for part in parts:
+                lines.append((part.geos, (name or '')[:name_length] or None, eid and unicode(eid)))
+
+        structure = Structure.objects.get_or_create(name=options['structure'])[0]
+        with transaction.atomic():
+            count = PathHelper.bulk_import(lines, structure)
+        self.stdout.write('%s paths created' % count)
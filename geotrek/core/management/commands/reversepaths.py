@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from geotrek.core.models import Path
+
+
+class Command(BaseCommand):
+    args = '<path_id path_id ...>'
+    help = 'Reverse the direction of paths, all at once.\n'
+    help += 'Related topologies are kept in place, and computed once each.\n'
+
+    def handle(self, *args, **options):
+        # Validate arguments
+        if not args:
+            raise CommandError('Paths ids missing. See help')
+        try:
+            pks = set([int(pk) for pk in args])
+        except ValueError as e:
+            raise CommandError('Invalid path id: %s' % e)
+
+        paths = Path.objects.filter(pk__in=pks)
+        missing = pks - set(paths.values_list('pk', flat=True))
+        if missing:
+            raise CommandError('Paths do not exist: %s' % ', '.join(str(pk) for pk in sorted(missing)))
+
+        with transaction.atomic():
+            Path.reverse_many(paths)
+        self.stdout.write('%s paths reversed' % len(pks))
@@ -0,0 +1,92 @@
+from multiprocessing import Pool
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from geotrek.core.helpers import PathHelper, TopologyHelper
+from geotrek.core.models import Path, Topology
+
+
+HELPERS = {'paths': PathHelper, 'topologies': TopologyHelper}
+
+
+def update_batch(job):
+    """Update altimetry of a batch of records, in a worker process."""
+    name, first, last, before = job
+    with transaction.atomic():
+        return HELPERS[name].update_altimetry(first, last, before)
+
+
+class Command(BaseCommand):
+    help = 'Compute again altimetry of all paths and topologies (e.g. after loaddem --replace),\n'
+    help += 'by batches of records, in parallel.\n'
+    help += 'Records updated after the start of the command are skipped, thus an interrupted\n'
+    help += 'run is resumed by giving its start date (see --before).\n'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--processes', '-j',
+                    type='int',
+                    dest='processes',
+                    default=1,
+                    help='Number of processes updating batches in parallel.'),
+        make_option('--batch-size',
+                    type='int',
+                    dest='batch_size',
+                    default=500,
+                    help='Number of records of a batch (default 500).'),
+        make_option('--before',
+                    dest='before',
+                    default=None,
+                    help='Only update records not updated since this date (default: now).'),
+    )
+
+    def handle(self, *args, **options):
+        if options['before']:
+            before = parse_datetime(options['before'])
+            if before is None:
+                raise CommandError('Invalid date: %s' % options['before'])
+            if timezone.is_naive(before):
+                before = timezone.make_aware(before, timezone.get_default_timezone())
+        else:
+            before = timezone.now()
+        if options['batch_size'] <= 0:
+            raise CommandError('Batch size must be positive.')
+        self.stdout.write('To resume this update, run it with --before="%s"\n' % before.isoformat())
+
+        # Paths first, since topologies are built from their 3D geometries
+        for name, model in (('paths', Path), ('topologies', Topology)):
+            jobs = self.get_batches(name, model, before, options['batch_size'])
+            self.run(name, jobs, options['processes'])
+
+    def get_batches(self, name, model, before, size):
+        """Ranges of ids of records not updated since ``before``."""
+        cursor = connection.cursor()
+        cursor.execute('SELECT id FROM %s WHERE date_update < %%s ORDER BY id' % model._meta.db_table, [before])
+        ids = [row[0] for row in cursor.fetchall()]
+        return [(name, ids[i], ids[min(i + size, len(ids)) - 1], before) for i in range(0, len(ids), size)]
+
+    def run(self, name, jobs, processes):
+        self.stdout.write('%s batches of %s to update\n' % (len(jobs), name))
+        if not jobs:
+            return
+        if processes > 1:
+            # Workers open their own database connection
+            connection.close()
+            pool = Pool(processes)
+            results = pool.imap_unordered(update_batch, jobs)
+        else:
+            pool = None
+            results = (update_batch(job) for job in jobs)
+        try:
+            total = 0
+            for done, count in enumerate(results, 1):
+                total += count
+                self.stdout.write('%s: batch %s/%s done (%s%%), %s updated\n' % (
+                    name, done, len(jobs), 100 * done // len(jobs), total))
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
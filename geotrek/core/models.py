@@ -7,11 +7,9 @@ from django.conf import settings
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.gis.geos import fromstr, LineString
 
-from mapentity.models import MapEntityMixin
-
 from geotrek.authent.models import StructureRelated
 from geotrek.common.mixins import (TimeStampedModelMixin, NoDeleteMixin,
-                                   AddPropertyMixin)
+                                   AddPropertyMixin, MapEntityMixin)
 from geotrek.common.utils import classproperty
 from geotrek.common.utils.postgresql import debug_pg_notices
 from geotrek.altimetry.models import AltimetryMixin
@@ -91,10 +89,7 @@ class Path(AddPropertyMixin, MapEntityMixin, AltimetryMixin,
         Returns the closest path of the point.
         Will fail if no path in database.
         """
-        # TODO: move to custom manager
-        if point.srid != settings.SRID:
-            point = point.transform(settings.SRID, clone=True)
-        return cls.objects.all().distance(point).order_by('distance')[0]
+        return cls.objects.get(pk=PathHelper.closest(point))
 
     def is_overlap(self):
         return not PathHelper.disjoint(self.geom, self.pk)
@@ -109,6 +104,13 @@ class Path(AddPropertyMixin, MapEntityMixin, AltimetryMixin,
         self.is_reversed = True
         return self
 
+    @classmethod
+    def reverse_many(cls, queryset):
+        """
+        Reverse several paths at once, as well as related topologies.
+        """
+        PathHelper.reverse_many(list(queryset.values_list('pk', flat=True)))
+
     def interpolate(self, point):
         """
         Returns position ([0.0-1.0]) and offset (distance) of the point
@@ -129,18 +131,21 @@ class Path(AddPropertyMixin, MapEntityMixin, AltimetryMixin,
             self.geom = fromdb.geom
             AltimetryMixin.reload(self, fromdb)
             TimeStampedModelMixin.reload(self, fromdb)
+        self.invalidate_properties()
         return self
 
     @debug_pg_notices
     def save(self, *args, **kwargs):
         # If the path was reversed, we have to invert related topologies
-        if self.is_reversed:
-            for aggr in self.aggregations.all():
-                aggr.start_position = 1 - aggr.start_position
-                aggr.end_position = 1 - aggr.end_position
-                aggr.save()
-            self._is_reversed = False
-        super(Path, self).save(*args, **kwargs)
+        # all at once, and compute their geometries once each.
+        if self.is_reversed and self.pk:
+            with TopologyHelper.postpone_geometry():
+                # Before the geometry, c.f. ``PathHelper.reverse_many()``
+                PathHelper.reverse_aggregations([self.pk])
+                super(Path, self).save(*args, **kwargs)
+            self.is_reversed = False
+        else:
+            super(Path, self).save(*args, **kwargs)
         self.reload()
 
     @property
@@ -282,22 +287,22 @@ class Topology(AddPropertyMixin, AltimetryMixin, TimeStampedModelMixin, NoDelete
             AltimetryMixin.reload(self, fromdb)
             TimeStampedModelMixin.reload(self, fromdb)
             NoDeleteMixin.reload(self, fromdb)
+        self.invalidate_properties()
         return self
 
+    @classmethod
+    def save_many(cls, topologies, fields):
+        """ Update the specified fields of many topologies at once, and read
+        back the ones computed by triggers (c.f. ``TopologyHelper.update()``).
+        """
+        TopologyHelper.update(topologies, fields)
+        for topology in topologies:
+            topology.invalidate_properties()
+        return topologies
+
     @debug_pg_notices
     def save(self, *args, **kwargs):
-        # HACK: these fields are readonly from the Django point of view
-        # but they can be changed at DB level. Since Django write all fields
-        # to DB anyway, it is important to update it before writting
-        if self.pk and settings.TREKKING_TOPOLOGY_ENABLED:
-            existing = self.__class__.objects.get(pk=self.pk)
-            self.length = existing.length
-            # In the case of points, the geom can be set by Django. Don't override.
-            point_geom_not_set = self.ispoint() and self.geom is None
-            geom_already_in_db = not self.ispoint() and existing.geom is not None
-            if (point_geom_not_set or geom_already_in_db):
-                self.geom = existing.geom
-        else:
+        if not self.pk or not settings.TREKKING_TOPOLOGY_ENABLED:
             if not self.deleted and self.geom is None:
                 # We cannot have NULL geometry. So we use an empty one,
                 # it will be computed or overwritten by triggers.
@@ -312,9 +317,23 @@ class Topology(AddPropertyMixin, AltimetryMixin, TimeStampedModelMixin, NoDelete
         shortmodelname = self._meta.object_name.lower().replace('edge', '')
         self.offset = settings.TOPOLOGY_STATIC_OFFSETS.get(shortmodelname, self.offset)
 
-        # Save into db
-        super(Topology, self).save(*args, **kwargs)
-        self.reload()
+        if not self.pk or not settings.TREKKING_TOPOLOGY_ENABLED or kwargs.get('force_insert'):
+            super(Topology, self).save(*args, **kwargs)
+            self.reload()
+            return
+
+        # Write topology fields in one query, which reads back the ones
+        # computed by triggers. Fields of subclasses tables are saved after.
+        update_fields = kwargs.pop('update_fields', None)
+        if update_fields is None:
+            update_fields = [f.name for f in self._meta.concrete_fields if not f.primary_key]
+        topology_fields = [f.name for f in Topology._meta.local_concrete_fields]
+        TopologyHelper.update([self], [name for name in update_fields if name in topology_fields],
+                              using=kwargs.get('using'))
+        saved = [name for name in update_fields if name not in topology_fields]
+        if saved:
+            super(Topology, self).save(*args, update_fields=saved, **kwargs)
+        self.invalidate_properties()
 
     def serialize(self, **kwargs):
         return TopologyHelper.serialize(self, **kwargs)
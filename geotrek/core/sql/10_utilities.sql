@@ -66,6 +66,39 @@ $$ LANGUAGE plpgsql;
 -------------------------------------------------------------------------------
 
 CREATE OR REPLACE FUNCTION geotrek.ft_Smart_MakeLine(lines geometry[]) RETURNS geometry AS $$
+DECLARE
+    result geometry;
+    t_end geometry;
+    nblines int;
+    reversed boolean[];
+BEGIN
+    -- Lines are usually given in order (c.f. aggregations order): walk through
+    -- them once, reversing those in the opposite direction. Search for
+    -- connectable lines only if extremities do not match.
+    nblines := coalesce(array_length(lines, 1), 0);
+    reversed := array_fill(false, ARRAY[nblines]);
+    t_end := ST_EndPoint(lines[1]);
+    FOR i IN 2..nblines LOOP
+        IF ST_Distance(ST_StartPoint(lines[i]), t_end) < 1 THEN
+            t_end := ST_EndPoint(lines[i]);
+        ELSIF ST_Distance(ST_EndPoint(lines[i]), t_end) < 1 THEN
+            reversed[i] := true;
+            t_end := ST_StartPoint(lines[i]);
+        ELSE
+            RETURN ft_Smart_MakeLine_Unordered(lines);
+        END IF;
+    END LOOP;
+
+    SELECT ST_MakeLine(CASE WHEN reversed[n] THEN ST_Reverse(lines[n]) ELSE lines[n] END ORDER BY n)
+      INTO result
+      FROM generate_series(1, nblines) AS n;
+    result := ST_SetSRID(result, ST_SRID(lines[1]));
+    RETURN result;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION geotrek.ft_Smart_MakeLine_Unordered(lines geometry[]) RETURNS geometry AS $$
 DECLARE
     result geometry;
     t_line geometry;
@@ -34,24 +34,12 @@ CREATE TRIGGER e_t_evenement_date_update_tgr
     FOR EACH ROW EXECUTE PROCEDURE ft_date_update();
 
 ---------------------------------------------------------------------
--- Make sure cache key (base on lastest updated) is refresh on DELETE
+-- Table version is bumped once per statement, for cache keys (see
+-- ``o_t_version`` and ``install_version_triggers()``)
 ---------------------------------------------------------------------
 
 DROP TRIGGER IF EXISTS e_t_evenement_latest_updated_d_tgr ON e_t_evenement;
-
-CREATE OR REPLACE FUNCTION geotrek.evenement_latest_updated_d() RETURNS trigger AS $$
-DECLARE
-BEGIN
-    -- Touch latest path
-    UPDATE e_t_evenement SET date_update = NOW()
-    WHERE id IN (SELECT id FROM e_t_evenement ORDER BY date_update DESC LIMIT 1);
-    RETURN NULL;
-END;
-$$ LANGUAGE plpgsql;
-
-CREATE TRIGGER e_t_evenement_latest_updated_d_tgr
-AFTER DELETE ON e_t_evenement
-FOR EACH ROW EXECUTE PROCEDURE evenement_latest_updated_d();
+DROP FUNCTION IF EXISTS geotrek.evenement_latest_updated_d() CASCADE;
 
 
 -------------------------------------------------------------------------------
@@ -153,6 +141,89 @@ END;
 $$ LANGUAGE plpgsql;
 
 
+-------------------------------------------------------------------------------
+-- Queue geometry computation of Evenements
+-- * Postponed mode: until flush (see ``TopologyHelper.postpone_geometry()``)
+-- * Deferred mode: until commit (see ``TOPOLOGY_DEFERRED_GEOMETRY`` setting)
+-------------------------------------------------------------------------------
+
+CREATE UNLOGGED TABLE IF NOT EXISTS e_t_evenement_dirty (
+    transaction bigint NOT NULL,
+    evenement integer
+);
+
+DROP INDEX IF EXISTS e_t_evenement_dirty_transaction_idx;
+CREATE INDEX e_t_evenement_dirty_transaction_idx ON e_t_evenement_dirty(transaction, evenement);
+
+
+CREATE OR REPLACE FUNCTION geotrek.ft_postpone_evenements_geometry() RETURNS void AS $$
+BEGIN
+    -- A row without evenement marks the current transaction as postponing
+    INSERT INTO e_t_evenement_dirty (transaction, evenement)
+    VALUES (txid_current(), NULL);
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION geotrek.update_geometry_of_evenements(eids integer[]) RETURNS void AS $$
+DECLARE
+    eid integer;
+BEGIN
+    IF {{TOPOLOGY_DEFERRED_GEOMETRY}} OR EXISTS (SELECT 1 FROM e_t_evenement_dirty
+                                                 WHERE transaction = txid_current()) THEN
+        -- Add evenements to the dirty set, they will be computed once
+        INSERT INTO e_t_evenement_dirty (transaction, evenement)
+            SELECT DISTINCT txid_current(), q.eid
+            FROM unnest(eids) AS q(eid)
+            WHERE NOT EXISTS (SELECT 1 FROM e_t_evenement_dirty
+                              WHERE transaction = txid_current() AND evenement = q.eid);
+        RETURN;
+    END IF;
+
+    FOREACH eid IN ARRAY eids LOOP
+        PERFORM update_geometry_of_evenement(eid);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION geotrek.ft_flush_evenements_geometry() RETURNS integer AS $$
+DECLARE
+    eid integer;
+    t_count integer;
+BEGIN
+    -- Empty the dirty set first, and compute each queued evenement once
+    t_count := 0;
+    FOR eid IN WITH queued AS (DELETE FROM e_t_evenement_dirty
+                               WHERE transaction = txid_current()
+                               RETURNING evenement)
+               SELECT DISTINCT evenement FROM queued WHERE evenement IS NOT NULL
+    LOOP
+        PERFORM update_geometry_of_evenement(eid);
+        t_count := t_count + 1;
+    END LOOP;
+    RETURN t_count;
+END;
+$$ LANGUAGE plpgsql;
+
+
+DROP TRIGGER IF EXISTS e_t_evenement_dirty_flush_tgr ON e_t_evenement_dirty;
+
+CREATE OR REPLACE FUNCTION geotrek.evenements_geometry_flush() RETURNS trigger AS $$
+BEGIN
+    -- Fired at commit for each queued row: the first one computes them all,
+    -- the next ones find an empty dirty set.
+    PERFORM ft_flush_evenements_geometry();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE CONSTRAINT TRIGGER e_t_evenement_dirty_flush_tgr
+AFTER INSERT ON e_t_evenement_dirty
+DEFERRABLE INITIALLY DEFERRED
+FOR EACH ROW EXECUTE PROCEDURE evenements_geometry_flush();
+
+
 -------------------------------------------------------------------------------
 -- Update geometry when offset change
 -------------------------------------------------------------------------------
@@ -167,7 +238,7 @@ BEGIN
     -- Since the evenement to be modified is available in NEW, we could improve
     -- performance with some refactoring.
 
-    PERFORM update_geometry_of_evenement(NEW.id);
+    PERFORM update_geometry_of_evenements(ARRAY[NEW.id]);
 
     RETURN NULL;
 END;
@@ -175,7 +246,8 @@ $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER e_t_evenement_offset_u_tgr
 AFTER UPDATE OF decallage ON e_t_evenement
-FOR EACH ROW EXECUTE PROCEDURE update_evenement_geom_when_offset_changes();
+FOR EACH ROW WHEN (OLD.decallage IS DISTINCT FROM NEW.decallage)
+EXECUTE PROCEDURE update_evenement_geom_when_offset_changes();
 
 -------------------------------------------------------------------------------
 -- Update altimetry when geom change (Geotrek-light)
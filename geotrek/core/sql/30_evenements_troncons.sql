@@ -39,6 +39,89 @@ END;
 $$ LANGUAGE plpgsql;
 
 
+CREATE OR REPLACE FUNCTION geotrek.ft_troncons_interpolate(troncons integer[], points geometry[]) RETURNS SETOF RECORD AS $$
+DECLARE
+    i integer;
+BEGIN
+    -- For each point: its index, position and offset along its path
+    -- (NULL if the path does not exist)
+    FOR i IN 1 .. COALESCE(array_length(points, 1), 0) LOOP
+        RETURN QUERY SELECT i, interpolated.position, interpolated.distance
+                     FROM l_t_troncon t,
+                          ST_InterpolateAlong(t.geom, points[i]) AS interpolated (position FLOAT, distance FLOAT)
+                     WHERE t.id = troncons[i];
+        IF NOT FOUND THEN
+            RETURN QUERY SELECT i, NULL::float, NULL::float;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION geotrek.ft_troncon_closest(point geometry, radius float) RETURNS integer AS $$
+DECLARE
+    tid integer;
+    search_radius float;
+BEGIN
+    -- Visible paths within radius, found with spatial index
+    SELECT id INTO tid
+    FROM l_t_troncon
+    WHERE visible AND ST_DWithin(geom, point, radius)
+    ORDER BY ST_Distance(geom, point)
+    LIMIT 1;
+
+    IF tid IS NULL AND EXISTS(SELECT 1 FROM l_t_troncon WHERE visible) THEN
+        -- Nothing around: widen the radius until a path is found.
+        -- (KNN ``<->`` orders by bounding boxes before PostGIS 2.2, thus
+        -- would not give the closest path for sure)
+        search_radius := GREATEST(radius, 1);
+        WHILE tid IS NULL LOOP
+            search_radius := search_radius * 2;
+            SELECT id INTO tid
+            FROM l_t_troncon
+            WHERE visible AND ST_DWithin(geom, point, search_radius)
+            ORDER BY ST_Distance(geom, point)
+            LIMIT 1;
+        END LOOP;
+    END IF;
+    RETURN tid;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION geotrek.ft_troncons_snap(points geometry[], radius float) RETURNS SETOF RECORD AS $$
+DECLARE
+    i integer;
+    tid integer;
+BEGIN
+    -- For each point: its index, closest path, position and offset along it
+    FOR i IN 1 .. COALESCE(array_length(points, 1), 0) LOOP
+        tid := ft_troncon_closest(points[i], radius);
+        RETURN QUERY SELECT i, t.id, interpolated.position, interpolated.distance
+                     FROM l_t_troncon t,
+                          ST_InterpolateAlong(t.geom, points[i]) AS interpolated (position FLOAT, distance FLOAT)
+                     WHERE t.id = tid;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-------------------------------------------------------------------------------
+-- Index of Evenements intervals along Troncons
+-- Each aggregation is a box (troncon, start) - (troncon, end), so that
+-- overlapping aggregations are found with the ``&&`` operator and GiST index
+-- (c.f. ``TopologyHelper.overlapping()``)
+-------------------------------------------------------------------------------
+
+CREATE OR REPLACE FUNCTION geotrek.ft_troncon_interval(troncon integer, pk_debut float, pk_fin float) RETURNS box AS $$
+    SELECT box(point($1, least($2, $3)), point($1, greatest($2, $3)));
+$$ LANGUAGE sql IMMUTABLE;
+
+DROP INDEX IF EXISTS e_r_evenement_troncon_interval_idx;
+CREATE INDEX e_r_evenement_troncon_interval_idx ON e_r_evenement_troncon
+USING gist(ft_troncon_interval(troncon, pk_debut, pk_fin));
+
+
 -------------------------------------------------------------------------------
 -- Compute geometry of Evenements
 -------------------------------------------------------------------------------
@@ -47,7 +130,6 @@ DROP TRIGGER IF EXISTS e_r_evenement_troncon_geometry_tgr ON e_r_evenement_tronc
 
 CREATE OR REPLACE FUNCTION geotrek.ft_evenements_troncons_geometry() RETURNS trigger AS $$
 DECLARE
-    eid integer;
     eids integer[];
 BEGIN
     IF TG_OP = 'INSERT' THEN
@@ -61,9 +143,7 @@ BEGIN
         END IF;
     END IF;
 
-    FOREACH eid IN ARRAY eids LOOP
-        PERFORM update_geometry_of_evenement(eid);
-    END LOOP;
+    PERFORM update_geometry_of_evenements(eids);
 
     RETURN NULL;
 END;
@@ -56,28 +56,16 @@ CREATE TRIGGER l_t_troncon_date_update_tgr
 -------------------------------------------------------------------------------
 
 CREATE OR REPLACE FUNCTION geotrek.check_path_not_overlap(pid integer, line geometry) RETURNS BOOL AS $$
-DECLARE
-    t_count integer;
-    tolerance float;
 BEGIN
-    -- Note: I gave up with the idea of checking almost overlap/touch.
-
-    -- tolerance := 1.0;
     -- Crossing and extremity touching is OK.
-    -- Overlapping and --almost overlapping-- is KO.
-    SELECT COUNT(*) INTO t_count
-    FROM l_t_troncon
-    WHERE pid != id
-      AND ST_GeometryType(ST_intersection(geom, line)) IN ('ST_LineString', 'ST_MultiLineString');
-      -- not extremity touching
-      -- AND ST_Touches(geom, line) = false
-      -- not crossing
-      -- AND ST_GeometryType(ST_intersection(geom, line)) NOT IN ('ST_Point', 'ST_MultiPoint')
-      -- overlap is a line
-      -- AND ST_GeometryType(ST_intersection(geom, ST_buffer(line, tolerance))) IN ('ST_LineString', 'ST_MultiLineString')
-      -- not almost touching, at most twice
-      -- AND       ST_Length(ST_intersection(geom, ST_buffer(line, tolerance))) > (4 * tolerance);
-    RETURN t_count = 0;
+    -- Overlapping is KO: interiors intersection is a line (DE-9IM).
+    -- Candidates come from the spatial index, exact predicate is only
+    -- evaluated on them.
+    RETURN NOT EXISTS (SELECT 1
+                         FROM l_t_troncon
+                        WHERE geom && line
+                          AND id != pid
+                          AND ST_Relate(geom, line, '1********'));
 END;
 $$ LANGUAGE plpgsql;
 
@@ -92,20 +80,22 @@ DROP TRIGGER IF EXISTS l_t_troncon_90_evenements_geom_u_tgr ON l_t_troncon;
 CREATE OR REPLACE FUNCTION geotrek.update_evenement_geom_when_troncon_changes() RETURNS trigger AS $$
 DECLARE
     eid integer;
+    eids integer[];
     egeom geometry;
     linear_offset float;
     side_offset float;
 BEGIN
     -- Geometry of linear topologies are always updated
     -- Geometry of point topologies are updated if offset = 0
-    FOR eid IN SELECT e.id
-               FROM e_r_evenement_troncon et, e_t_evenement e
-               WHERE et.troncon = NEW.id AND et.evenement = e.id
-               GROUP BY e.id
-               HAVING BOOL_OR(et.pk_debut != et.pk_fin) OR e.decallage = 0.0
-    LOOP
-        PERFORM update_geometry_of_evenement(eid);
-    END LOOP;
+    SELECT array_agg(sub.id) INTO eids
+    FROM (SELECT e.id
+          FROM e_r_evenement_troncon et, e_t_evenement e
+          WHERE et.troncon = NEW.id AND et.evenement = e.id
+          GROUP BY e.id
+          HAVING BOOL_OR(et.pk_debut != et.pk_fin) OR e.decallage = 0.0) AS sub;
+    IF eids IS NOT NULL THEN
+        PERFORM update_geometry_of_evenements(eids);
+    END IF;
 
     -- Special case of point geometries with offset != 0
     FOR eid, egeom IN SELECT e.id, e.geom
@@ -199,21 +189,89 @@ FOR EACH ROW EXECUTE PROCEDURE troncons_related_objects_d();
 
 
 ---------------------------------------------------------------------
--- Make sure cache key (base on lastest updated) is refresh on DELETE
+-- Table version is bumped once per statement, for cache keys (see
+-- ``o_t_version`` and ``install_version_triggers()``)
 ---------------------------------------------------------------------
 
 DROP TRIGGER IF EXISTS l_t_troncon_latest_updated_d_tgr ON l_t_troncon;
+DROP FUNCTION IF EXISTS geotrek.troncon_latest_updated_d() CASCADE;
+
+
+---------------------------------------------------------------------
+-- Log changes of paths network, to update graph incrementally
+---------------------------------------------------------------------
+
+DO $$
+BEGIN
+    -- We can't use IF NOT EXISTS until PostgreSQL 9.5.
+    CREATE SEQUENCE l_t_troncon_graph_log_version_seq;
+EXCEPTION
+  WHEN duplicate_table THEN
+    RAISE NOTICE 'Sequence exists.';
+END;
+$$;
 
-CREATE OR REPLACE FUNCTION geotrek.troncon_latest_updated_d() RETURNS trigger AS $$
+-- Changes get their version at commit (NULL until then), all changes of a
+-- transaction sharing the same one.
+CREATE TABLE IF NOT EXISTS l_t_troncon_graph_log (
+    version integer,
+    troncon integer NOT NULL
+);
+
+DROP INDEX IF EXISTS l_t_troncon_graph_log_troncon_idx;
+DROP INDEX IF EXISTS l_t_troncon_graph_log_version_idx;
+CREATE INDEX l_t_troncon_graph_log_version_idx ON l_t_troncon_graph_log(version);
+
+DROP TRIGGER IF EXISTS l_t_troncon_graph_log_iud_tgr ON l_t_troncon;
+DROP TRIGGER IF EXISTS l_t_troncon_graph_log_version_tgr ON l_t_troncon_graph_log;
+
+CREATE OR REPLACE FUNCTION geotrek.troncon_graph_log_iud() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO l_t_troncon_graph_log (troncon) VALUES (OLD.id);
+    ELSIF TG_OP = 'INSERT' OR NOT ST_OrderingEquals(OLD.geom, NEW.geom) OR OLD.visible != NEW.visible THEN
+        INSERT INTO l_t_troncon_graph_log (troncon) VALUES (NEW.id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER l_t_troncon_graph_log_iud_tgr
+AFTER INSERT OR UPDATE OR DELETE ON l_t_troncon
+FOR EACH ROW EXECUTE PROCEDURE troncon_graph_log_iud();
+
+
+CREATE OR REPLACE FUNCTION geotrek.ft_troncon_graph_log_version() RETURNS integer AS $$
 DECLARE
+    t_version integer;
+BEGIN
+    -- Pending changes visible here are those of the current transaction.
+    IF NOT EXISTS (SELECT 1 FROM l_t_troncon_graph_log WHERE version IS NULL) THEN
+        RETURN NULL;
+    END IF;
+    -- The lock is held until commit: versions are given in commit order,
+    -- and a reader never sees a version lower than one it has already seen.
+    -- (Advisory lock: a table lock would conflict with the pending changes
+    -- of other transactions, and deadlock at their commit)
+    PERFORM pg_advisory_xact_lock(hashtext('l_t_troncon_graph_log'));
+    t_version := nextval('l_t_troncon_graph_log_version_seq');
+    UPDATE l_t_troncon_graph_log SET version = t_version WHERE version IS NULL;
+    -- Prune old changes: graphs older than that are built again.
+    DELETE FROM l_t_troncon_graph_log WHERE version <= t_version - {{PATH_GRAPH_LOG_SIZE}};
+    RETURN t_version;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION geotrek.troncon_graph_log_version() RETURNS trigger AS $$
 BEGIN
-    -- Touch latest path
-    UPDATE l_t_troncon SET date_update = NOW()
-    WHERE id IN (SELECT id FROM l_t_troncon ORDER BY date_update DESC LIMIT 1);
+    -- Fired at commit for each change: the first one versions them all,
+    -- the next ones find no pending change.
+    PERFORM ft_troncon_graph_log_version();
     RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
-CREATE TRIGGER l_t_troncon_latest_updated_d_tgr
-AFTER DELETE ON l_t_troncon
-FOR EACH ROW EXECUTE PROCEDURE troncon_latest_updated_d();
+CREATE CONSTRAINT TRIGGER l_t_troncon_graph_log_version_tgr
+AFTER INSERT ON l_t_troncon_graph_log
+DEFERRABLE INITIALLY DEFERRED
+FOR EACH ROW EXECUTE PROCEDURE troncon_graph_log_version();
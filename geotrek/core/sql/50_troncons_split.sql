@@ -1,80 +1,63 @@
 DROP TRIGGER IF EXISTS l_t_troncon_00_snap_geom_iu_tgr ON l_t_troncon;
 
-CREATE OR REPLACE FUNCTION geotrek.troncons_snap_extremities() RETURNS trigger AS $$
+CREATE OR REPLACE FUNCTION geotrek.ft_snap_to_vertex(geometry, geometry, float8) RETURNS geometry AS $$
+    -- Closest point of line $2 to point $1, or the closest vertex of line $2
+    -- to this point within distance $3
+    SELECT COALESCE((SELECT v.geom
+                       FROM ST_DumpPoints($2) AS v
+                      WHERE ST_Distance(v.geom, ST_ClosestPoint($2, $1)) < $3
+                   ORDER BY ST_Distance(v.geom, ST_ClosestPoint($2, $1)), v.path[1]
+                      LIMIT 1),
+                    ST_ClosestPoint($2, $1));
+$$ LANGUAGE sql IMMUTABLE;
+
+
+CREATE OR REPLACE FUNCTION geotrek.ft_troncon_snap_extremity(pid integer, extremity geometry, snap_distance float8) RETURNS geometry AS $$
 DECLARE
-    linestart geometry;
-    lineend geometry;
     other geometry;
-    closest geometry;
     result geometry;
-    newline geometry[];
-    d float8;
-
-    DISTANCE float8;
 BEGIN
-    DISTANCE := {{PATH_SNAPPING_DISTANCE}};
-
-    linestart := ST_StartPoint(NEW.geom);
-    lineend := ST_EndPoint(NEW.geom);
-
-    closest := NULL;
-    SELECT ST_ClosestPoint(geom, linestart), geom INTO closest, other
+    -- Closest path among the candidates of the spatial index
+    SELECT geom INTO other
       FROM l_t_troncon
-      WHERE geom && ST_Buffer(NEW.geom, DISTANCE * 2)
-        AND id != NEW.id
-        AND ST_Distance(geom, linestart) < DISTANCE
-      ORDER BY ST_Distance(geom, linestart)
-      LIMIT 1;
-
-    IF closest IS NULL THEN
-        result := linestart;
-    ELSE
-        result := closest;
-        d := DISTANCE;
-        FOR i IN 1..ST_NPoints(other) LOOP
-            IF ST_Distance(closest, ST_PointN(other, i)) < DISTANCE AND ST_Distance(closest, ST_PointN(other, i)) < d THEN
-                d := ST_Distance(closest, ST_PointN(other, i));
-                result := ST_PointN(other, i);
-            END IF;
-        END LOOP;
-        IF NOT ST_Equals(linestart, result) THEN
-            RAISE NOTICE 'Snapped start % to %, from %', ST_AsText(linestart), ST_AsText(result), ST_AsText(other);
-        END IF;
+     WHERE geom && ST_Expand(extremity, snap_distance)
+       AND id != pid
+       AND ST_Distance(geom, extremity) < snap_distance
+  ORDER BY ST_Distance(geom, extremity)
+     LIMIT 1;
+
+    IF other IS NULL THEN
+        RETURN extremity;
+    END IF;
+    result := ft_snap_to_vertex(extremity, other, snap_distance);
+    IF NOT ST_Equals(extremity, result) THEN
+        RAISE NOTICE 'Snapped % to %, from %', ST_AsText(extremity), ST_AsText(result), ST_AsText(other);
     END IF;
-    newline := array_append(newline, result);
+    RETURN result;
+END;
+$$ LANGUAGE plpgsql;
 
-    FOR i IN 2..ST_NPoints(NEW.geom)-1 LOOP
-        newline := array_append(newline, ST_PointN(NEW.geom, i));
-    END LOOP;
 
-    closest := NULL;
-    SELECT ST_ClosestPoint(geom, lineend), geom INTO closest, other
+-- Holds a row while ``ft_troncons_import()`` inserts paths it has already
+-- snapped and noded: snapping and splitting triggers are skipped for them.
+-- The row is deleted before commit, so only the importing transaction sees it.
+CREATE UNLOGGED TABLE IF NOT EXISTS l_t_troncon_import_bulk (
+    running boolean NOT NULL DEFAULT TRUE
+);
 
-      FROM l_t_troncon
-      WHERE geom && ST_Buffer(NEW.geom, DISTANCE * 2)
-        AND id != NEW.id
-        AND ST_Distance(geom, lineend) < DISTANCE
-      ORDER BY ST_Distance(geom, lineend)
-      LIMIT 1;
-    IF closest IS NULL THEN
-        result := lineend;
-    ELSE
-        result := closest;
-        d := DISTANCE;
-        FOR i IN 1..ST_NPoints(other) LOOP
-            IF ST_Distance(closest, ST_PointN(other, i)) < DISTANCE AND ST_Distance(closest, ST_PointN(other, i)) < d THEN
-                d := ST_Distance(closest, ST_PointN(other, i));
-                result := ST_PointN(other, i);
-            END IF;
-        END LOOP;
-        IF NOT ST_Equals(lineend, result) THEN
-            RAISE NOTICE 'Snapped end % to %, from %', ST_AsText(lineend), ST_AsText(result), ST_AsText(other);
-        END IF;
+CREATE OR REPLACE FUNCTION geotrek.troncons_snap_extremities() RETURNS trigger AS $$
+DECLARE
+    DISTANCE float8;
+BEGIN
+    IF EXISTS (SELECT 1 FROM l_t_troncon_import_bulk) THEN
+        RETURN NEW;
     END IF;
-    newline := array_append(newline, result);
 
-    RAISE NOTICE 'New geom %', ST_AsText(ST_MakeLine(newline));
-    NEW.geom := ST_MakeLine(newline);
+    DISTANCE := {{PATH_SNAPPING_DISTANCE}};
+
+    NEW.geom := ST_SetPoint(NEW.geom, 0, ft_troncon_snap_extremity(NEW.id, ST_StartPoint(NEW.geom), DISTANCE));
+    NEW.geom := ST_SetPoint(NEW.geom, ST_NPoints(NEW.geom) - 1, ft_troncon_snap_extremity(NEW.id, ST_EndPoint(NEW.geom), DISTANCE));
+    RAISE NOTICE 'New geom %', ST_AsText(NEW.geom);
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
@@ -108,6 +91,10 @@ DECLARE
     intersections_on_new float8[];
     intersections_on_current float8[];
 BEGIN
+    -- Bulk imported paths are already noded (c.f. ``ft_troncons_import()``)
+    IF EXISTS (SELECT 1 FROM l_t_troncon_import_bulk) THEN
+        RETURN NULL;
+    END IF;
 
     -- Copy original geometry
     newgeom := NEW.geom;
@@ -433,3 +420,110 @@ $$ LANGUAGE plpgsql;
 CREATE TRIGGER l_t_troncon_10_split_geom_iu_tgr
 AFTER INSERT OR UPDATE OF geom ON l_t_troncon
 FOR EACH ROW EXECUTE PROCEDURE troncons_evenement_intersect_split();
+
+
+-------------------------------------------------------------------------------
+-- Bulk import of paths
+-- Paths are staged in l_t_troncon_import, snapped and noded all together, then
+-- inserted without the row by row snapping and splitting triggers (skipped
+-- through l_t_troncon_import_bulk, without locking l_t_troncon).
+-- Only those crossing existing paths go through these triggers, which split
+-- existing paths and their topologies (c.f. ``loadpaths`` command).
+-------------------------------------------------------------------------------
+
+CREATE UNLOGGED TABLE IF NOT EXISTS l_t_troncon_import (
+    id serial PRIMARY KEY,
+    structure integer NOT NULL,
+    nom varchar(20),
+    remarques text,
+    depart varchar(250),
+    arrivee varchar(250),
+    id_externe varchar(128) NOT NULL DEFAULT '',
+    bulk boolean NOT NULL DEFAULT TRUE,
+    geom geometry NOT NULL
+);
+
+DROP INDEX IF EXISTS l_t_troncon_import_geom_idx;
+CREATE INDEX l_t_troncon_import_geom_idx ON l_t_troncon_import USING gist(geom);
+
+
+CREATE OR REPLACE FUNCTION geotrek.ft_troncons_import() RETURNS integer AS $$
+DECLARE
+    t_count integer;
+    total integer;
+
+    DISTANCE float8;
+    TOLERANCE float8;
+BEGIN
+    DISTANCE := {{PATH_SNAPPING_DISTANCE}};
+    TOLERANCE := 0.01;
+
+    -- Snap extremities to existing paths, or to paths staged before
+    -- (as if they were inserted one after the other)
+    WITH extremities AS (SELECT i.id,
+                                ST_StartPoint(i.geom) AS linestart,
+                                ST_EndPoint(i.geom) AS lineend
+                           FROM l_t_troncon_import i),
+         snapped AS (SELECT e.id,
+                            COALESCE((SELECT ft_snap_to_vertex(e.linestart, o.geom, DISTANCE)
+                                        FROM (SELECT t.geom FROM l_t_troncon t
+                                               UNION ALL
+                                              SELECT s.geom FROM l_t_troncon_import s WHERE s.id < e.id) AS o
+                                       WHERE ST_DWithin(o.geom, e.linestart, DISTANCE)
+                                    ORDER BY ST_Distance(o.geom, e.linestart)
+                                       LIMIT 1), e.linestart) AS linestart,
+                            COALESCE((SELECT ft_snap_to_vertex(e.lineend, o.geom, DISTANCE)
+                                        FROM (SELECT t.geom FROM l_t_troncon t
+                                               UNION ALL
+                                              SELECT s.geom FROM l_t_troncon_import s WHERE s.id < e.id) AS o
+                                       WHERE ST_DWithin(o.geom, e.lineend, DISTANCE)
+                                    ORDER BY ST_Distance(o.geom, e.lineend)
+                                       LIMIT 1), e.lineend) AS lineend
+                       FROM extremities e)
+    UPDATE l_t_troncon_import i
+       SET geom = ST_SetPoint(ST_SetPoint(i.geom, 0, s.linestart), ST_NPoints(i.geom) - 1, s.lineend)
+      FROM snapped s
+     WHERE i.id = s.id;
+
+    -- Split staged paths at their intersections, in one pass
+    WITH noded AS (SELECT row_number() OVER () AS n, sub.geom
+                     FROM (SELECT (ST_Dump(ST_Node(ST_Collect(geom)))).geom AS geom
+                             FROM l_t_troncon_import) AS sub),
+         segments AS (SELECT DISTINCT ON (n.n) i.*, n.geom AS segment
+                        FROM noded n, l_t_troncon_import i
+                       WHERE ST_DWithin(i.geom, ST_Line_Interpolate_Point(n.geom, 0.5), TOLERANCE)
+                    ORDER BY n.n, ST_Distance(i.geom, ST_Line_Interpolate_Point(n.geom, 0.5))),
+         staged AS (DELETE FROM l_t_troncon_import)
+    INSERT INTO l_t_troncon_import (structure, nom, remarques, depart, arrivee, id_externe, geom)
+         SELECT structure, nom, remarques, depart, arrivee, id_externe, segment
+           FROM segments;
+
+    -- Paths crossing existing ones will be inserted row by row
+    UPDATE l_t_troncon_import i SET bulk = FALSE
+     WHERE EXISTS (SELECT 1 FROM l_t_troncon t
+                    WHERE ST_Intersects(t.geom, i.geom)
+                      AND NOT ST_Relate(t.geom, i.geom, 'FF*F*****'));
+
+    INSERT INTO l_t_troncon_import_bulk DEFAULT VALUES;
+
+    INSERT INTO l_t_troncon (structure, visible, valide, nom, remarques, depart, arrivee, id_externe, geom)
+         SELECT structure, TRUE, TRUE, nom, remarques, depart, arrivee, id_externe, geom
+           FROM l_t_troncon_import
+          WHERE bulk
+       ORDER BY id;
+    GET DIAGNOSTICS total = ROW_COUNT;
+
+    DELETE FROM l_t_troncon_import_bulk;
+
+    INSERT INTO l_t_troncon (structure, visible, valide, nom, remarques, depart, arrivee, id_externe, geom)
+         SELECT structure, TRUE, TRUE, nom, remarques, depart, arrivee, id_externe, geom
+           FROM l_t_troncon_import
+          WHERE NOT bulk
+       ORDER BY id;
+    GET DIAGNOSTICS t_count = ROW_COUNT;
+    RAISE NOTICE 'Imported % paths at once, % crossing existing ones', total, t_count;
+
+    DELETE FROM l_t_troncon_import;
+    RETURN total + t_count;
+END;
+$$ LANGUAGE plpgsql;
@@ -1,13 +1,16 @@
 import json
 
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
 from django.contrib.auth.models import User
 from django.contrib.gis.geos import LineString
 from django.core.urlresolvers import reverse
 
 from geotrek.core.factories import PathFactory
-from geotrek.core.graph import graph_edges_nodes_of_qs
-from geotrek.core.models import Path
+from geotrek.core.graph import (graph_edges_nodes_of_qs, graph_adjacency, route,
+                                graph_state_of_qs, graph_update)
+from geotrek.core.helpers import PathHelper
+from geotrek.core.models import Path, Topology
 
 
 class SimpleGraph(TestCase):
@@ -55,6 +58,72 @@ class SimpleGraph(TestCase):
         computed_graph = graph_edges_nodes_of_qs(Path.objects.order_by('id'))
         self.assertDictEqual(computed_graph, graph)
 
+    def test_python_graph_update(self):
+        p1 = PathFactory(geom=LineString((0, 0), (1, 0)))
+        p2 = PathFactory(geom=LineString((1, 0), (2, 0)))
+        state = graph_state_of_qs(Path.objects.order_by('id'), version=1)
+
+        p2.delete()
+        p3 = PathFactory(geom=LineString((1, 0), (1, 1)))
+        graph_update(state, 2, [p2.pk, p3.pk], [p3])
+        self.assertEqual(state['version'], 2)
+        self.assertDictEqual(state['graph'], {
+            'nodes': {
+                1: {2: p1.pk},
+                2: {1: p1.pk, 4: p3.pk},
+                4: {2: p3.pk},
+            },
+            'edges': {
+                p1.pk: {'nodes_id': [1, 2], 'length': p1.length, 'id': p1.pk},
+                p3.pk: {'nodes_id': [2, 4], 'length': p3.length, 'id': p3.pk},
+            }
+        })
+        self.assertEqual(state['adjacency'], graph_adjacency(state['graph']))
+
+    def test_graph_changes(self):
+        p1 = PathFactory(geom=LineString((0, 0), (1, 0)))
+        version, changed, known = PathHelper.graph_changes()
+        self.assertIn(p1.pk, changed)
+
+        p2 = PathFactory(geom=LineString((0, 5), (1, 5)))
+        new_version, changed, known = PathHelper.graph_changes(version)
+        self.assertTrue(known)
+        self.assertTrue(new_version > version)
+        self.assertEqual(changed, [p2.pk])
+        self.assertEqual(PathHelper.graph_changes(version, version)[1], [])
+
+        # Up-to-date
+        self.assertEqual(PathHelper.graph_changes(new_version), (new_version, [], True))
+        # Pruned or rolled back
+        self.assertFalse(PathHelper.graph_changes(new_version + 1)[2])
+
+    def test_json_graph_delta(self):
+        p1 = PathFactory(geom=LineString((0, 0), (1, 0)))
+        p2 = PathFactory(geom=LineString((1, 0), (2, 0)))
+        url = reverse('core:path_json_graph_delta')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        graph = json.loads(response.content)
+        self.assertTrue(graph['full'])
+        self.assertEqual(graph['edges'], [[p1.pk, 1, 2, p1.length], [p2.pk, 2, 3, p2.length]])
+
+        p2.delete()
+        p3 = PathFactory(geom=LineString((1, 0), (1, 1)))
+        response = self.client.get(url, {'base': graph['base'], 'version': graph['version']})
+        delta = json.loads(response.content)
+        self.assertFalse(delta['full'])
+        self.assertTrue(delta['version'] > graph['version'])
+        self.assertEqual(delta['edges'], [[p3.pk, 2, 4, p3.length]])
+        self.assertEqual(delta['removed'], [p2.pk])
+
+    def test_json_graph_delta_unknown_base(self):
+        path = PathFactory(geom=LineString((0, 0), (1, 0)))
+        url = reverse('core:path_json_graph_delta')
+        response = self.client.get(url, {'base': 'unknown', 'version': 1})
+        graph = json.loads(response.content)
+        self.assertTrue(graph['full'])
+        self.assertEqual(graph['edges'], [[path.pk, 1, 2, path.length]])
+
     def test_json_graph_empty(self):
 
         response = self.client.get(self.url)
@@ -80,3 +149,92 @@ class SimpleGraph(TestCase):
         expires = response['Expires']
         self.assertNotEqual(expires, None)
         self.assertEqual(expires, last_modified)
+
+
+class RouteTest(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user('homer', 'h@s.com', 'dooh')
+        success = self.client.login(username=user.username, password='dooh')
+        self.assertTrue(success)
+        self.url = reverse('core:path_json_route')
+
+    def test_route_takes_shortest_way(self):
+        """
+          +----c----+
+          |         |
+        --a-+     +-b--
+            |     |
+            +-d-e-+
+        """
+        graph = {
+            'nodes': {},
+            'edges': {
+                'a': {'nodes_id': [1, 2], 'length': 10},
+                'b': {'nodes_id': [3, 4], 'length': 10},
+                'c': {'nodes_id': [2, 3], 'length': 20},
+                'd': {'nodes_id': [2, 5], 'length': 5},
+                'e': {'nodes_id': [3, 5], 'length': 5},
+            }
+        }
+        subtopologies = route(graph, graph_adjacency(graph), [('a', 0.5), ('b', 0.5)])
+        self.assertEqual(subtopologies, [{'paths': ['a', 'd', 'e', 'b'],
+                                          'positions': {0: (0.5, 1.0),
+                                                        1: (0.0, 1.0),
+                                                        2: (1.0, 0.0),
+                                                        3: (0.0, 0.5)}}])
+
+    def test_route_not_connected(self):
+        graph = {
+            'nodes': {},
+            'edges': {
+                'a': {'nodes_id': [1, 2], 'length': 10},
+                'b': {'nodes_id': [3, 4], 'length': 10},
+            }
+        }
+        self.assertRaises(ValueError, route, graph, graph_adjacency(graph), [('a', 0.5), ('b', 0.5)])
+
+    def test_json_route_can_be_deserialized(self):
+        p1 = PathFactory(geom=LineString((0, 0), (10, 0)))
+        p2 = PathFactory(geom=LineString((20, 0), (10, 0)))
+        p3 = PathFactory(geom=LineString((20, 0), (30, 0)))
+        markers = [{'path': p1.pk, 'position': 0.5},
+                   {'path': p2.pk, 'position': 0.5},
+                   {'path': p3.pk, 'position': 0.5}]
+        response = self.client.get(self.url, {'markers': json.dumps(markers)})
+        self.assertEqual(response.status_code, 200)
+        topology = Topology.deserialize(response.content)
+        self.assertEqual(topology.geom.coords, ((5, 0), (10, 0), (15, 0), (20, 0), (25, 0)))
+
+    def test_json_route_requires_two_markers(self):
+        path = PathFactory(geom=LineString((0, 0), (10, 0)))
+        markers = [{'path': path.pk, 'position': 0.5}]
+        response = self.client.get(self.url, {'markers': json.dumps(markers)})
+        self.assertEqual(response.status_code, 400)
+
+
+class GraphChangesConcurrencyTest(TransactionTestCase):
+    def test_interleaved_path_edits(self):
+        p1 = PathFactory(geom=LineString((0, 0), (1, 0)))
+        p2 = PathFactory(geom=LineString((0, 5), (1, 5)))
+        version = PathHelper.graph_changes()[0]
+
+        other = connection.__class__(connection.settings_dict, alias='other')
+        try:
+            cursors = connection.cursor(), other.cursor()
+            for cursor, path in zip(cursors, (p1, p2)):
+                # Fail instead of waiting forever on a deadlock
+                cursor.execute("SET statement_timeout = 5000")
+                cursor.execute("BEGIN")
+                cursor.execute("UPDATE l_t_troncon SET geom = ST_Translate(geom, 0, 1) WHERE id = %s", [path.pk])
+            for cursor in cursors:
+                cursor.execute("COMMIT")
+        finally:
+            other.close()
+
+        new_version, changed, known = PathHelper.graph_changes(version)
+        self.assertTrue(known)
+        self.assertEqual(sorted(changed), sorted([p1.pk, p2.pk]))
+        # One version per transaction, in commit order
+        self.assertEqual(PathHelper.graph_changes(version, version + 1)[1], [p1.pk])
+        self.assertEqual(new_version, version + 2)
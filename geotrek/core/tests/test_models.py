@@ -5,10 +5,11 @@ from django.test import TestCase
 from django.contrib.gis.geos import LineString
 from django.db import IntegrityError
 
+from geotrek.common.mixins import share_properties
 from geotrek.common.utils import dbnow
 from geotrek.authent.factories import UserFactory
 from geotrek.authent.models import Structure
-from geotrek.core.factories import (PathFactory, StakeFactory)
+from geotrek.core.factories import (PathFactory, StakeFactory, TrailFactory)
 from geotrek.core.models import Path
 
 
@@ -84,6 +85,39 @@ class PathTest(TestCase):
         self.assertNotEqual(p.length, 0)
 
 
+class PathPropertiesTest(TestCase):
+    def setUp(self):
+        self.path = PathFactory.create()
+
+    def test_properties_are_computed_once(self):
+        trails = self.path.trails
+        self.assertIs(self.path.trails, trails)
+        with self.assertNumQueries(1):
+            list(self.path.trails)
+            list(self.path.trails)
+
+    def test_properties_are_computed_again_when_objects_are_written(self):
+        trails = self.path.trails
+        self.assertEqual(len(trails), 0)
+        TrailFactory.create(no_path=True).add_path(self.path)
+        self.assertEqual(len(self.path.trails), 1)
+
+    def test_properties_are_computed_again_when_reloaded(self):
+        trails = self.path.trails
+        self.path.reload()
+        self.assertIsNot(self.path.trails, trails)
+
+    def test_properties_can_be_shared_between_instances(self):
+        share_properties(True)
+        try:
+            other = Path.objects.get(pk=self.path.pk)
+            self.assertIs(other.trails, self.path.trails)
+        finally:
+            share_properties(False)
+        other = Path.objects.get(pk=self.path.pk)
+        self.assertIsNot(other.trails, self.path.trails)
+
+
 class PathVisibilityTest(TestCase):
     def setUp(self):
         self.path = PathFactory()
@@ -95,8 +129,10 @@ class PathVisibilityTest(TestCase):
     def test_invisible_paths_do_not_appear_in_queryset(self):
         self.assertEqual(len(Path.objects.all()), 1)
 
-    def test_latest_updated_bypass_invisible(self):
-        self.assertEqual(Path.latest_updated(), self.path.date_update)
+    def test_latest_updated_follows_table_version(self):
+        # Changes of invisible paths are not ignored, they only invalidate caches
+        self.assertTrue(Path.latest_updated() >= self.invisible.date_update)
+        self.assertEqual(Path.latest_updated(), Path.table_version()[1])
 
     def test_splitted_paths_do_not_become_visible(self):
         PathFactory(geom=LineString((10, 0), (12, 0)), visible=False)
@@ -139,6 +175,12 @@ class PathGeometryTest(TestCase):
         p = PathFactory.create(geom=LineString((2.5, 0), (3, 1), (3.5, 0)))
         self.assertFalse(p.is_overlap())
 
+    def test_overlap_geometry_and_crossing(self):
+        PathFactory.create(geom=LineString((0, 0), (10, 0), (10, 10)))
+        # Overlapping and crossing elsewhere is still overlapping
+        p = PathFactory.create(geom=LineString((5, 0), (8, 0), (8, 5), (12, 5)))
+        self.assertTrue(p.is_overlap())
+
     def test_snapping(self):
         # Sinosoid line
         coords = [(x, math.sin(x)) for x in range(10)]
@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
+from django.db import connection
 from django.test import TestCase
 from django.contrib.gis.geos import LineString, Point
 from django.conf import settings
 
+from geotrek.authent.factories import StructureFactory
 from geotrek.common.utils import almostequal
 
 from geotrek.core.factories import PathFactory, TopologyFactory, NetworkFactory, UsageFactory
+from geotrek.core.helpers import PathHelper
 from geotrek.core.models import Path, Topology
 
 
@@ -1367,3 +1370,58 @@ class SplitPathGenericTopologyTest(TestCase):
         # But topology resulting geometry did not change
         originalgeom = LineString((2.2071067811865470, 0), *originalgeom[1:])
         self.assertEqual(topology.geom, originalgeom)
+
+
+class BulkImportTest(TestCase):
+    def test_import_splits_paths_at_once(self):
+        """
+                          G
+                          +
+                          |
+        E +---------------+---------------+ F  + I ----+ J
+                          |
+                          +
+                          H
+        """
+        structure = StructureFactory.create()
+        count = PathHelper.bulk_import([
+            (LineString((10, 0), (14, 0)), u"EF", u"1"),
+            (LineString((12, 2), (12, -2)), u"GH", u"2"),
+            (LineString((14.5, 0), (16, 0)), u"IJ", u"3"),
+        ], structure)
+        self.assertEqual(count, 5)
+        self.assertEqual(Path.objects.filter(name="EF").count(), 2)
+        self.assertEqual(Path.objects.filter(name="GH").count(), 2)
+        # Extremity was snapped
+        ij = Path.objects.get(name="IJ")
+        self.assertEqual(ij.geom, LineString((14, 0), (16, 0)))
+        self.assertEqual(ij.eid, u"3")
+        self.assertEqual(ij.structure, structure)
+
+    def test_import_splits_existing_paths_and_topologies(self):
+        """
+                   C
+        A +--------+--------+ B
+                   |
+                   +
+                   D
+        """
+        ab = PathFactory.create(name="AB", geom=LineString((0, 0), (4, 0)))
+        topology = TopologyFactory.create(no_path=True)
+        topology.add_path(ab, start=0.25, end=0.75)
+        PathHelper.bulk_import([(LineString((2, 2), (2, -2)), u"CD", None)],
+                               StructureFactory.create())
+        self.assertEqual(Path.objects.filter(name="AB").count(), 2)
+        self.assertEqual(Path.objects.filter(name="CD").count(), 2)
+        topology.reload()
+        self.assertEqual(len(topology.paths.all()), 2)
+        self.assertEqual(topology.geom, LineString((1, 0), (2, 0), (3, 0)))
+
+    def test_triggers_run_again_after_import(self):
+        PathHelper.bulk_import([(LineString((0, 0), (4, 0)), u"AB", None)],
+                               StructureFactory.create())
+        cursor = connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM l_t_troncon_import_bulk")
+        self.assertEqual(cursor.fetchone()[0], 0)
+        PathFactory.create(name="CD", geom=LineString((2, 2), (2, -2)))
+        self.assertEqual(Path.objects.filter(name="AB").count(), 2)
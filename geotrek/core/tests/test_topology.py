@@ -1,6 +1,7 @@
 import json
 import math
 
+from django.db import connection, DatabaseError
 from django.test import TestCase
 from django.conf import settings
 from django.contrib.gis.geos import Point, LineString
@@ -9,6 +10,7 @@ from geotrek.common.utils import dbnow, almostequal
 from geotrek.core.factories import (PathFactory, PathAggregationFactory,
                                     TopologyFactory)
 from geotrek.core.models import Path, Topology, PathAggregation
+from geotrek.core.helpers import TopologyHelper, PathHelper
 
 
 class TopologyTest(TestCase):
@@ -34,9 +36,18 @@ class TopologyTest(TestCase):
         for i in range(10):
             TopologyFactory.create()
         t1 = dbnow()
-        self.assertTrue(t1 > Topology.objects.latest("date_update").date_update)
+        self.assertTrue(t1 > Topology.latest_updated())
         (Topology.objects.all()[0]).delete(force=True)
-        self.assertFalse(t1 > Topology.objects.latest("date_update").date_update)
+        self.assertFalse(t1 > Topology.latest_updated())
+
+    def test_table_version(self):
+        topology = TopologyFactory.create()
+        version, date = Topology.table_version()
+        self.assertTrue(date <= dbnow())
+        self.assertFalse(Topology.changed_since(version))
+        topology.delete(force=True)
+        self.assertTrue(Topology.changed_since(version))
+        self.assertTrue(Topology.table_version(['DELETE'])[0] > version)
 
     def test_length(self):
         e = TopologyFactory.build(no_path=True)
@@ -47,6 +58,57 @@ class TopologyTest(TestCase):
         e.save()
         self.assertNotEqual(e.length, 0)
 
+    def test_save_reads_back_computed_fields(self):
+        e = TopologyFactory.create(offset=0)
+        length, geom = e.length, e.geom
+        e.length = 0
+        e.geom = None
+        with self.assertNumQueries(1):
+            e.save()
+        self.assertEqual(e.length, length)
+        self.assertEqual(e.geom, geom)
+        e.offset = 1
+        e.save()
+        self.assertEqual(e.geom, Topology.objects.get(pk=e.pk).geom)
+        self.assertNotEqual(e.geom, geom)
+
+    def test_save_update_fields(self):
+        e = TopologyFactory.create(offset=0)
+        length = e.length
+        e.length = 0
+        e.offset = 1
+        with self.assertNumQueries(2):
+            e.save(update_fields=['offset'])
+        self.assertEqual(e.length, length)
+        self.assertEqual(e.geom, Topology.objects.get(pk=e.pk).geom)
+        # Nothing but computed fields: only read back
+        with self.assertNumQueries(1):
+            e.save(update_fields=['length'])
+        self.assertEqual(e.length, length)
+
+    def test_save_point_offset(self):
+        p = PathFactory.create(geom=LineString((0, 0), (10, 0)))
+        e = TopologyFactory.create(no_path=True, offset=0)
+        PathAggregationFactory.create(topo_object=e, path=p,
+                                      start_position=0.5, end_position=0.5)
+        e = Topology.objects.get(pk=e.pk)
+        self.assertEqual(e.geom, Point(5, 0, srid=settings.SRID))
+        e.offset = 2
+        with self.assertNumQueries(2):
+            e.save()
+        stored = Topology.objects.get(pk=e.pk).geom
+        self.assertEqual(e.geom, stored)
+        self.assertAlmostEqual(stored.distance(Point(5, 0, srid=settings.SRID)), 2)
+
+    def test_save_many(self):
+        topologies = [TopologyFactory.create(offset=0) for i in range(3)]
+        for topology in topologies:
+            topology.offset = 1
+        with self.assertNumQueries(2):
+            Topology.save_many(topologies, ['offset'])
+        for topology in topologies:
+            self.assertEqual(topology.geom, Topology.objects.get(pk=topology.pk).geom)
+
     def test_kind(self):
         from geotrek.land.models import LandEdge
         from geotrek.land.factories import LandEdgeFactory
@@ -482,6 +544,48 @@ class TopologyCornerCases(TestCase):
         topo.reload()
         self.assertEqual(topo.geom, expected)
 
+    def test_reverse_many_paths(self):
+        ab = PathFactory.create(geom=LineString((5, 0), (0, 0)))
+        ac = PathFactory.create(geom=LineString((5, 0), (10, 0)))
+        cd = PathFactory.create(geom=LineString((10, 0), (15, 0)))
+        topo = TopologyFactory.create(no_path=True)
+        topo.add_path(ab, start=0.2, end=0)
+        topo.add_path(ac)
+        topo.add_path(cd, start=0, end=0.2)
+        topo.save()
+        expected = LineString((4, 0), (5, 0), (10, 0), (11, 0))
+        Path.reverse_many(Path.objects.filter(pk__in=[ab.pk, ac.pk, cd.pk]))
+        self.assertEqual(Path.objects.get(pk=ab.pk).geom, LineString((0, 0), (5, 0)))
+        self.assertEqual(Path.objects.get(pk=cd.pk).geom, LineString((15, 0), (10, 0)))
+        topo.reload()
+        self.assertEqual(topo.geom, expected)
+        self.assertEqual([(a.start_position, a.end_position) for a in topo.aggregations.order_by('id')],
+                         [(0.8, 1.0), (1.0, 0.0), (1.0, 0.8)])
+
+    def test_reverse_path_with_offset_point(self):
+        p1 = PathFactory.create(geom=LineString((0, 0), (20, 0)))
+        poi = Point(5, 10, srid=settings.SRID)
+        poi.transform(settings.API_SRID)
+        poitopo = Topology.deserialize({'lat': poi.y, 'lng': poi.x})
+        self.assertTrue(almostequal(0.25, poitopo.aggregations.all()[0].start_position))
+
+        p1.reverse()
+        p1.save()
+        poitopo.reload()
+        aggr = poitopo.aggregations.all()[0]
+        self.assertTrue(almostequal(0.75, aggr.start_position))
+        self.assertTrue(almostequal(0.75, aggr.end_position))
+        self.assertTrue(almostequal(5, poitopo.geom.x))
+        self.assertTrue(almostequal(10, poitopo.geom.y))
+
+        Path.reverse_many(Path.objects.filter(pk=p1.pk))
+        poitopo.reload()
+        aggr = poitopo.aggregations.all()[0]
+        self.assertTrue(almostequal(0.25, aggr.start_position))
+        self.assertTrue(almostequal(0.25, aggr.end_position))
+        self.assertTrue(almostequal(5, poitopo.geom.x))
+        self.assertTrue(almostequal(10, poitopo.geom.y))
+
     def test_return_path(self):
         """
                      A
@@ -793,6 +897,51 @@ class TopologyDerialization(TestCase):
         self.assertTrue(almostequal(pagg.start_position, 0.5))
         self.assertTrue(almostequal(pagg.end_position, 0.5))
 
+    def test_closest_many(self):
+        p1 = PathFactory.create(geom=LineString((0, 0), (100, 0)))
+        p2 = PathFactory.create(geom=LineString((0, 1000), (100, 1000)))
+        points = [Point(50, 10, srid=settings.SRID),
+                  Point(50, 900, srid=settings.SRID),
+                  Point(25, -10, srid=settings.SRID)]
+        snapped = PathHelper.closest_many(points, radius=50)
+        self.assertEqual([s[0] for s in snapped], [p1.pk, p2.pk, p1.pk])
+        self.assertEqual([s[1] for s in snapped], [0.5, 0.5, 0.25])
+        self.assertEqual([abs(s[2]) for s in snapped], [10, 100, 10])
+
+    def test_closest_beyond_radius(self):
+        # Bounding box of the diagonal is closer, but not its line
+        PathFactory.create(geom=LineString((0, 0), (1000, 1000)))
+        p2 = PathFactory.create(geom=LineString((900, -200), (1000, -200)))
+        point = Point(900, 100, srid=settings.SRID)
+        self.assertEqual(PathHelper.closest(point, radius=10), p2.pk)
+
+    def test_interpolate_many(self):
+        p1 = PathFactory.create(geom=LineString((0, 0), (100, 0)))
+        p2 = PathFactory.create(geom=LineString((0, 1000), (100, 1000)))
+        points = [Point(50, 10, srid=settings.SRID),
+                  Point(25, 990, srid=settings.SRID)]
+        positions, offsets = PathHelper.interpolate_many([p1, p2], points)
+        self.assertEqual(positions, [0.5, 0.25])
+        self.assertEqual(offsets, [10, -10])
+        positions, offsets = PathHelper.interpolate_many(p1, points)
+        self.assertEqual(positions, [0.5, 0.25])
+        self.assertEqual(offsets, [10, 990])
+        snaps = PathHelper.snap_many(p1, points)
+        self.assertEqual([snap.coords for snap in snaps], [(50, 0), (25, 0)])
+
+    def test_interpolate_many_missing_path(self):
+        p1 = PathFactory.create(geom=LineString((0, 0), (100, 0)))
+        p2 = PathFactory.create(geom=LineString((0, 1000), (100, 1000)))
+        points = [Point(25, 990, srid=settings.SRID),
+                  Point(50, 10, srid=settings.SRID)]
+        p2.delete()
+        positions, offsets = PathHelper.interpolate_many([p2, p1], points)
+        self.assertEqual(positions, [None, 0.5])
+        self.assertEqual(offsets, [None, 10])
+        snaps = PathHelper.snap_many([p2, p1], points)
+        self.assertEqual(snaps[0], None)
+        self.assertEqual(snaps[1].coords, (50, 0))
+
     def test_deserialize_serialize(self):
         path = PathFactory.create(geom=LineString((1, 1), (2, 2), (2, 0)))
         before = TopologyFactory.create(offset=1, no_path=True)
@@ -809,6 +958,65 @@ class TopologyDerialization(TestCase):
         self.assertTrue(almostequal(start_before, start_after), '%s != %s' % (start_before, start_after))
         self.assertTrue(almostequal(end_before, end_after), '%s != %s' % (end_before, end_after))
 
+    def test_deserialize_unknown_path(self):
+        path = PathFactory.create()
+        count = Topology.objects.count()
+        self.assertRaises(ValueError, Topology.deserialize,
+                          '[{"paths": [%s, %s], "offset": 0}]' % (path.pk, path.pk + 1))
+        self.assertEqual(Topology.objects.count(), count)
+
+    def test_deserialize_geometry_with_intermediary_markers(self):
+        p1 = PathFactory.create(geom=LineString((0, 0), (2, 0)))
+        p2 = PathFactory.create(geom=LineString((2, 0), (4, 0)))
+        topology = Topology.deserialize('[{"paths": [%(p1)s], "positions": {"0": [0.0, 1.0]}},'
+                                        ' {"paths": [%(p2)s], "positions": {"0": [0.0, 0.5]}}]' % {'p1': p1.pk, 'p2': p2.pk})
+        self.assertEqual(len(topology.aggregations.all()), 3)
+        self.assertEqual(topology.geom.coords, ((0, 0), (2, 0), (3, 0)))
+
+
+class TopologyPostponedGeometryTest(TestCase):
+
+    def test_geometry_is_computed_when_leaving_block(self):
+        path = PathFactory.create(geom=LineString((0, 0), (10, 0)))
+        topology = TopologyFactory.create(no_path=True)
+        with TopologyHelper.postpone_geometry():
+            PathAggregation.objects.create(topo_object=topology, path=path,
+                                           start_position=0.0, end_position=0.5)
+            topology.reload()
+            self.assertEqual(topology.geom.coords, (0, 0))
+        topology.reload()
+        self.assertEqual(topology.geom.coords, ((0, 0), (5, 0)))
+
+    def test_geometry_is_computed_immediately_after_block(self):
+        path = PathFactory.create(geom=LineString((0, 0), (10, 0)))
+        topology = TopologyFactory.create(no_path=True)
+        with TopologyHelper.postpone_geometry():
+            pass
+        topology.add_path(path, start=0.0, end=0.5)
+        self.assertEqual(topology.geom.coords, ((0, 0), (5, 0)))
+
+    def test_database_error_in_block_is_not_hidden(self):
+        with self.assertRaisesRegexp(DatabaseError, 'no_such_table'):
+            with TopologyHelper.postpone_geometry():
+                connection.cursor().execute("SELECT * FROM no_such_table")
+
+    def test_path_and_offset_changes_are_queued_once(self):
+        path = PathFactory.create(geom=LineString((0, 0), (10, 0)))
+        topology = TopologyFactory.create(no_path=True)
+        topology.add_path(path, start=0.0, end=1.0)
+        with TopologyHelper.postpone_geometry():
+            path.geom = LineString((0, 0), (0, 10))
+            path.save()
+            topology.offset = 1
+            topology.save()
+            self.assertEqual(topology.geom.coords, ((0, 0), (10, 0)))
+            cursor = connection.cursor()
+            cursor.execute("SELECT COUNT(*) FROM e_t_evenement_dirty"
+                           " WHERE transaction = txid_current() AND evenement = %s", [topology.pk])
+            self.assertEqual(cursor.fetchone()[0], 1)
+        topology.reload()
+        self.assertEqual(topology.geom.coords, ((-1, 0), (-1, 10)))
+
 
 class TopologyOverlappingTest(TestCase):
 
@@ -860,6 +1068,15 @@ class TopologyOverlappingTest(TestCase):
         self.assertEqual(list(overlaps), [self.topo1,
                                           self.point2, self.point3, self.point1, self.topo2])
 
+    def test_overlapping_is_computed_in_one_query(self):
+        with self.assertNumQueries(1):
+            overlaps = list(Topology.overlapping(self.point3))
+        self.assertEqual(overlaps, [self.topo2, self.point3, self.topo1])
+
+    def test_overlapping_of_queryset(self):
+        overlaps = Topology.overlapping(Topology.objects.filter(pk__in=[self.point1.pk, self.point2.pk]))
+        self.assertEqual(set(overlaps), set([self.topo1, self.topo2, self.point1, self.point2]))
+
     def test_overlapping_does_not_fail_if_no_records(self):
         from geotrek.trekking.models import Trek
         overlaps = Topology.overlapping(Trek.objects.all())
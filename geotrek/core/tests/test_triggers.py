@@ -35,6 +35,18 @@ class SmartMakelineTest(TestCase):
         ])
         self.assertEqual(merged.geom_type, 'LineString')
 
+    def test_smart_makeline_many_ordered(self):
+        # One line out of three is reversed
+        lines = [LineString((i, 0), (i + 1, 0)) if i % 3 else LineString((i + 1, 0), (i, 0))
+                 for i in range(1, 300)]
+        merged = self.smart_makeline(lines)
+        self.assertEqual(merged, LineString(*[(i, 0) for i in range(1, 301)]))
+
+    def test_smart_makeline_first_reversed(self):
+        self.assertEqual(self.smart_makeline([
+            LineString((1, 0), (0, 0)),
+            LineString((1, 0), (2, 0))]), LineString((2, 0), (1, 0), (0, 0)))
+
     def test_smart_makeline_unordered(self):
         merged = self.smart_makeline([
             LineString((2, 0), (4, 0)),
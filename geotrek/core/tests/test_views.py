@@ -3,6 +3,8 @@ import json
 import re
 
 import mock
+from django.conf import settings
+from django.contrib.gis.geos import LineString, Point
 from django.utils.translation import ugettext_lazy as _
 from django.core.urlresolvers import reverse
 
@@ -96,6 +98,20 @@ class PathViewsTest(CommonTest):
         response = self.client.post(path.get_delete_url())
         self.assertEqual(response.status_code, 302)
 
+    def test_snap_points_json(self):
+        self.login()
+        path = PathFactory.create(geom=LineString((700000, 6600000), (700100, 6600000), srid=settings.SRID))
+        point = Point(700050, 6600010, srid=settings.SRID)
+        point.transform(settings.API_SRID)
+        response = self.client.post(reverse('core:path_json_snap'),
+                                    {'points': json.dumps([[point.x, point.y]])})
+        self.assertEqual(response.status_code, 200)
+        snapped = json.loads(response.content)
+        self.assertEqual(len(snapped), 1)
+        self.assertEqual(snapped[0]['path'], path.pk)
+        self.assertAlmostEqual(snapped[0]['position'], 0.5)
+        self.assertAlmostEqual(snapped[0]['offset'], 10)
+
     def test_elevation_area_json(self):
         self.login()
         path = self.modelfactory.create()
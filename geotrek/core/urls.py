@@ -5,12 +5,15 @@ from mapentity import registry
 
 from geotrek.altimetry.urls import AltimetryEntityOptions
 from geotrek.core.models import Path, Trail
-from geotrek.core.views import get_graph_json
+from geotrek.core.views import get_graph_json, get_graph_delta_json, get_route_json, snap_points_json
 
 
 urlpatterns = patterns(
     '',
     url(r'^api/graph.json$', get_graph_json, name="path_json_graph"),
+    url(r'^api/graph/delta.json$', get_graph_delta_json, name="path_json_graph_delta"),
+    url(r'^api/route.json$', get_route_json, name="path_json_route"),
+    url(r'^api/snap.json$', snap_points_json, name="path_json_snap"),
 )
 
 
@@ -3,9 +3,11 @@ import json
 import logging
 
 from django.conf import settings
+from django.contrib.gis.geos import Point
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import last_modified as cache_last_modified
 from django.views.decorators.cache import never_cache as force_cache_validation
+from django.views.decorators.http import require_POST
 from django.core.cache import get_cache
 from django.core.urlresolvers import reverse
 from django.shortcuts import redirect
@@ -18,9 +20,11 @@ from mapentity import app_settings
 
 from geotrek.authent.decorators import same_structure_required
 from geotrek.common.utils import classproperty
+from geotrek.common.views import PrefetchPropertiesFormatMixin
 from geotrek.core.models import AltimetryMixin
 
 from .models import Path, Trail, Topology
+from .helpers import PathHelper
 from .forms import PathForm, TrailForm
 from .filters import PathFilterSet, TrailFilterSet
 from . import graph as graph_lib
@@ -103,7 +107,7 @@ class PathJsonList(MapEntityJsonList, PathList):
     pass
 
 
-class PathFormatList(MapEntityFormat, PathList):
+class PathFormatList(PrefetchPropertiesFormatMixin, MapEntityFormat, PathList):
     columns = [
         'id', 'valid', 'visible', 'name', 'comments', 'departure', 'arrival',
         'comfort', 'source', 'stake', 'usages', 'networks',
@@ -153,31 +157,149 @@ class PathDelete(MapEntityDelete):
         return super(PathDelete, self).dispatch(*args, **kwargs)
 
 
+_graph_memory = {}
+
+
+def get_graph_state():
+    """
+    Return the incremental graph of paths network, brought up-to-date with
+    the paths changes since its version.
+
+    The graph is shared between processes through the 'fat' cache, and kept
+    in memory as long as no other process updated it.
+    """
+    cache = get_cache('fat')
+    state = _graph_memory.get('state')
+    if state is None or cache.get('path_graph_version') not in (None, (state['base'], state['version'])):
+        state = cache.get('path_graph_state') or state
+
+    since = state['version'] if state else 0
+    version, changed, known = PathHelper.graph_changes(since)
+    if state is None or not known:
+        state = graph_lib.graph_state_of_qs(Path.objects.order_by('pk'), version)
+    elif changed:
+        paths = Path.objects.filter(pk__in=changed).order_by('pk')
+        graph_lib.graph_update(state, version, changed, paths)
+    else:
+        _graph_memory['state'] = state
+        return state
+
+    cache.set('path_graph_state', state)
+    cache.set('path_graph_version', (state['base'], state['version']))
+    _graph_memory['state'] = state
+    return state
+
+
+def get_graph():
+    """
+    Return the graph of paths and its adjacency lists.
+    """
+    state = get_graph_state()
+    return state['graph'], state['adjacency']
+
+
 @login_required
 @cache_last_modified(lambda x: Path.latest_updated())
 @force_cache_validation
 def get_graph_json(request):
     cache = get_cache('fat')
+    state = get_graph_state()
     key = 'path_graph_json'
 
     result = cache.get(key)
-    latest = Path.latest_updated()
-
-    if result and latest:
-        cache_latest, json_graph = result
+    if result:
+        cache_version, json_graph = result
         # Not empty and still valid
-        if cache_latest and cache_latest >= latest:
+        if cache_version == (state['base'], state['version']):
             return HttpJSONResponse(json_graph)
 
     # cache does not exist or is not up to date
-    # rebuild the graph and cache the json
-    graph = graph_lib.graph_edges_nodes_of_qs(Path.objects.all())
-    json_graph = json.dumps(graph)
+    # dump the graph and cache the json
+    json_graph = json.dumps(state['graph'])
 
-    cache.set(key, (latest, json_graph))
+    cache.set(key, ((state['base'], state['version']), json_graph))
     return HttpJSONResponse(json_graph)
 
 
+@login_required
+@force_cache_validation
+def get_graph_delta_json(request):
+    """
+    Return the paths changed since the ``version`` of graph ``base`` given
+    as parameters, in a compact form (c.f. ``graph.graph_compact``):
+
+        {"base": "...", "version": 12, "full": false,
+         "edges": [[edge_id, start_node_id, end_node_id, length], ...],
+         "removed": [edge_id, ...]}
+
+    If the client graph is unknown, the whole graph is returned with ``full``.
+    """
+    state = get_graph_state()
+    try:
+        since = int(request.GET.get('version', 0))
+    except ValueError:
+        since = 0
+    full = (request.GET.get('base') != state['base'] or not 0 < since <= state['version'])
+    if not full:
+        _, changed, known = PathHelper.graph_changes(since, state['version'])
+        # Client version was pruned from the log
+        full = not known
+
+    result = {'base': state['base'], 'version': state['version'], 'full': full}
+    if full:
+        result.update(edges=graph_lib.graph_compact(state), removed=[])
+    else:
+        edges = state['graph']['edges']
+        result.update(edges=graph_lib.graph_compact(state, changed),
+                      removed=sorted([pk for pk in changed if pk not in edges]))
+    return HttpJSONResponse(json.dumps(result))
+
+
+@login_required
+@require_POST
+def snap_points_json(request):
+    """
+    Snap the points given in ``points`` parameter (JSON list of ``[lng, lat]``),
+    and return for each one its closest path, position and offset along it
+    (or null if there is no path).
+    """
+    try:
+        points = [Point(float(lng), float(lat), srid=settings.API_SRID)
+                  for lng, lat in json.loads(request.POST.get('points', ''))]
+    except (ValueError, TypeError) as e:
+        return HttpJSONResponse(json.dumps({'error': u"%s" % e}), status=400)
+
+    results = []
+    for snapped in PathHelper.closest_many(points):
+        if snapped is not None:
+            pk, position, offset = snapped
+            snapped = {'path': pk, 'position': position, 'offset': offset}
+        results.append(snapped)
+    return HttpJSONResponse(json.dumps(results))
+
+
+@login_required
+def get_route_json(request):
+    """
+    Compute the shortest way through the markers given in ``markers``
+    parameter (JSON list of ``{"path": <pk>, "position": <0..1>}``), and
+    return it as a serialized topology.
+    """
+    try:
+        markers = json.loads(request.GET.get('markers', ''))
+        markers = [(int(marker['path']), float(marker['position'])) for marker in markers]
+        if len(markers) < 2:
+            raise ValueError("At least two markers are expected")
+        graph, adjacency = get_graph()
+        subtopologies = graph_lib.route(graph, adjacency, markers)
+    except (ValueError, KeyError, TypeError) as e:
+        return HttpJSONResponse(json.dumps({'error': u"%s" % e}), status=400)
+
+    for subtopology in subtopologies:
+        subtopology.update(kind=Topology.KIND, offset=0)
+    return HttpJSONResponse(json.dumps(subtopologies))
+
+
 class TrailLayer(MapEntityLayer):
     queryset = Trail.objects.existing()
     properties = ['name']
@@ -193,7 +315,7 @@ class TrailJsonList(MapEntityJsonList, TrailList):
     pass
 
 
-class TrailFormatList(MapEntityFormat, TrailList):
+class TrailFormatList(PrefetchPropertiesFormatMixin, MapEntityFormat, TrailList):
     columns = [
         'id', 'name', 'comments', 'departure', 'arrival',
         'structure', 'date_insert', 'date_update',
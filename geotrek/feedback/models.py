@@ -8,9 +8,8 @@ from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import ugettext_lazy as _
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from mapentity.models import MapEntityMixin
 
-from geotrek.common.mixins import TimeStampedModelMixin
+from geotrek.common.mixins import MapEntityMixin, TimeStampedModelMixin
 
 from .helpers import send_report_managers
 
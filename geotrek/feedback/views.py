@@ -5,6 +5,8 @@ from rest_framework.decorators import list_route
 from rest_framework.permissions import AllowAny
 from mapentity import views as mapentity_views
 
+from geotrek.common.views import PrefetchPropertiesFormatMixin
+
 from geotrek.feedback import models as feedback_models
 from geotrek.feedback import serializers as feedback_serializers
 
@@ -19,7 +21,7 @@ class ReportList(mapentity_views.MapEntityList):
     columns = ['id', 'name', 'email', 'category', 'status', 'date_insert']
 
 
-class ReportFormatList(mapentity_views.MapEntityFormat, ReportList):
+class ReportFormatList(PrefetchPropertiesFormatMixin, mapentity_views.MapEntityFormat, ReportList):
     columns = [
         'id', 'name', 'email', 'comment', 'category', 'status',
         'date_insert', 'date_update',
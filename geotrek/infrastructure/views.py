@@ -2,6 +2,7 @@ from mapentity.views import (MapEntityLayer, MapEntityList, MapEntityJsonList, M
                              MapEntityDetail, MapEntityDocument, MapEntityCreate, MapEntityUpdate, MapEntityDelete)
 
 from geotrek.authent.decorators import same_structure_required
+from geotrek.common.views import PrefetchPropertiesFormatMixin
 from geotrek.core.views import CreateFromTopologyMixin
 from geotrek.core.models import AltimetryMixin
 from .models import Infrastructure, Signage
@@ -24,7 +25,7 @@ class InfrastructureJsonList(MapEntityJsonList, InfrastructureList):
     pass
 
 
-class InfrastructureFormatList(MapEntityFormat, InfrastructureList):
+class InfrastructureFormatList(PrefetchPropertiesFormatMixin, MapEntityFormat, InfrastructureList):
     columns = [
         'id', 'name', 'type', 'description',
         'structure', 'date_insert', 'date_update',
@@ -82,7 +83,7 @@ class SignageJsonList(MapEntityJsonList, SignageList):
     pass
 
 
-class SignageFormatList(MapEntityFormat, SignageList):
+class SignageFormatList(PrefetchPropertiesFormatMixin, MapEntityFormat, SignageList):
     columns = [
         'id', 'name', 'type', 'description',
         'structure', 'date_insert', 'date_update',
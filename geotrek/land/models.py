@@ -1,10 +1,9 @@
 from django.contrib.gis.db import models
 from django.utils.translation import ugettext_lazy as _
 
-from mapentity.models import MapEntityMixin
-
 from geotrek.authent.models import StructureRelated
 from geotrek.core.models import Topology, Path
+from geotrek.common.mixins import MapEntityMixin
 from geotrek.common.models import Organism
 from geotrek.maintenance.models import Intervention, Project
 
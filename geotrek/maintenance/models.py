@@ -7,13 +7,12 @@ from django.utils.translation import ugettext_lazy as _
 from django.contrib.gis.db import models
 from django.contrib.gis.geos import GeometryCollection
 
-from mapentity.models import MapEntityMixin
-
 from geotrek.authent.models import StructureRelated
 from geotrek.altimetry.models import AltimetryMixin
 from geotrek.core.models import Topology, Path, Trail
 from geotrek.common.models import Organism
-from geotrek.common.mixins import TimeStampedModelMixin, NoDeleteMixin, AddPropertyMixin
+from geotrek.common.mixins import (TimeStampedModelMixin, NoDeleteMixin, AddPropertyMixin,
+                                   MapEntityMixin, prefetch_properties)
 from geotrek.common.utils import classproperty
 from geotrek.infrastructure.models import Infrastructure, Signage
 
@@ -273,6 +272,18 @@ class Intervention(AddPropertyMixin, MapEntityMixin, AltimetryMixin,
         topos = Topology.overlapping(topology).values_list('pk', flat=True)
         return cls.objects.existing().filter(topology__in=topos).distinct('pk')
 
+    @classmethod
+    def topology_property_prefetch(cls, name):
+        """ Returns a function prefetching the property ``name`` of the
+        interventions topologies (c.f. ``prefetch_properties()``).
+        """
+        def prefetch(interventions):
+            topologies = Topology.objects.in_bulk([i.topology_id for i in interventions if i.topology_id])
+            prefetch_properties(topologies.values(), [name])
+            return dict((i.pk, getattr(topologies[i.topology_id], name) if i.topology_id in topologies else [])
+                        for i in interventions)
+        return prefetch
+
 Path.add_property('interventions', lambda self: Intervention.path_interventions(self), _(u"Interventions"))
 Topology.add_property('interventions', lambda self: Intervention.topology_interventions(self), _(u"Interventions"))
 
@@ -8,7 +8,7 @@ from mapentity.views import (MapEntityLayer, MapEntityList, MapEntityJsonList, M
 
 from geotrek.core.views import CreateFromTopologyMixin
 from geotrek.altimetry.models import AltimetryMixin
-from geotrek.common.views import FormsetMixin
+from geotrek.common.views import FormsetMixin, PrefetchPropertiesFormatMixin
 from geotrek.authent.decorators import same_structure_required
 from geotrek.infrastructure.models import Infrastructure, Signage
 from .models import Intervention, Project
@@ -35,7 +35,7 @@ class InterventionJsonList(MapEntityJsonList, InterventionList):
     pass
 
 
-class InterventionFormatList(MapEntityFormat, InterventionList):
+class InterventionFormatList(PrefetchPropertiesFormatMixin, MapEntityFormat, InterventionList):
     columns = [
         'id', 'name', 'date', 'type', 'infrastructure', 'status', 'stake',
         'disorders', 'total_manday', 'project', 'subcontracting',
@@ -129,7 +129,7 @@ class ProjectJsonList(MapEntityJsonList, ProjectList):
     pass
 
 
-class ProjectFormatList(MapEntityFormat, ProjectList):
+class ProjectFormatList(PrefetchPropertiesFormatMixin, MapEntityFormat, ProjectList):
     columns = [
         'id', 'name', 'period', 'type', 'domain', 'constraint', 'global_cost',
         'interventions', 'interventions_total_cost', 'comments', 'contractors',
@@ -405,6 +405,8 @@ VIEWPORT_MARGIN = 0.1  # On list page, around spatial extent from settings.ini
 
 PATHS_LINE_MARKER = 'dotL'
 PATH_SNAPPING_DISTANCE = 1  # Distance of path snapping in meters
+PATH_CLOSEST_SEARCH_RADIUS = 100  # Radius of closest path search in meters (before nearest candidates)
+PATH_GRAPH_LOG_SIZE = 1000  # Number of paths network versions kept to update graphs incrementally
 SNAP_DISTANCE = 30  # Distance of snapping in pixels
 
 ALTIMETRIC_PROFILE_PRECISION = 25  # Sampling precision in meters
@@ -415,8 +417,10 @@ ALTIMETRIC_PROFILE_WIDTH = 800
 ALTIMETRIC_PROFILE_FONTSIZE = 25
 ALTIMETRIC_PROFILE_FONT = 'ubuntu'
 ALTIMETRIC_PROFILE_MIN_YSCALE = 1200  # Minimum y scale (in meters)
+ALTIMETRIC_PROFILE_LOCAL_RENDERING = False  # Convert charts to PNG with CairoSVG instead of convertit
 ALTIMETRIC_AREA_MAX_RESOLUTION = 150  # Maximum number of points (by width/height)
 ALTIMETRIC_AREA_MARGIN = 0.15
+ALTIMETRIC_DEM_CACHE = None  # Path of the DEM copy used to sample elevations in Python (c.f. ``loaddem``)
 
 
 # Let this be defined at instance-level
@@ -529,6 +533,9 @@ TOPOLOGY_STATIC_OFFSETS = {'land': -5,
                            'signagemanagement': -10,
                            'workmanagement': 10}
 
+# Compute topologies geometries once per transaction, at commit
+TOPOLOGY_DEFERRED_GEOMETRY = False
+
 
 MESSAGE_TAGS = {
     messages.SUCCESS: 'alert-success',
@@ -43,6 +43,7 @@ MEDIA_URL = '%s%s' % (ROOT_URL, envini.get('mediaurl', section="django", default
 MEDIA_ROOT = envini.get('mediaroot', section="django", default=os.path.join(DEPLOY_ROOT, 'var', 'media'))
 STATIC_ROOT = envini.get('staticroot', section="django", default=os.path.join(DEPLOY_ROOT, 'var', 'static'))
 CACHE_ROOT = envini.get('cacheroot', section="django", default=os.path.join(DEPLOY_ROOT, 'var', 'cache'))
+ALTIMETRIC_DEM_CACHE = envini.get('demcache', section="django", default=ALTIMETRIC_DEM_CACHE)
 UPLOAD_DIR = envini.get('uploaddir', section="django", default=UPLOAD_DIR)
 MAPENTITY_CONFIG['TEMP_DIR'] = envini.get('tmproot', section="django", default=os.path.join(DEPLOY_ROOT, 'var', 'tmp'))
 SYNC_RANDO_ROOT = envini.get('syncrandoroot', section="django", default=os.path.join(DEPLOY_ROOT, 'data'))
@@ -12,7 +12,6 @@ from easy_thumbnails.alias import aliases
 from easy_thumbnails.exceptions import InvalidImageFormatError
 from easy_thumbnails.files import get_thumbnailer
 from mapentity import registry
-from mapentity.models import MapEntityMixin
 from mapentity.serializers import smart_plain_text
 from modeltranslation.manager import MultilingualManager
 
@@ -21,7 +20,7 @@ from geotrek.core.models import Topology
 from geotrek.common.mixins import (NoDeleteMixin, TimeStampedModelMixin,
                                    PictogramMixin, OptionalPictogramMixin,
                                    PublishableMixin, PicturesMixin,
-                                   AddPropertyMixin)
+                                   AddPropertyMixin, MapEntityMixin)
 from geotrek.common.models import Theme
 from geotrek.common.utils import intersecting
 
@@ -20,7 +20,8 @@ from rest_framework_gis.serializers import GeoFeatureModelSerializer
 
 from geotrek.authent.decorators import same_structure_required
 from geotrek.common.utils import plain_text_preserve_linebreaks
-from geotrek.common.views import DocumentPublic
+from geotrek.common.views import (DocumentPublic, PrefetchPropertiesFormatMixin,
+                                  PrefetchPropertiesViewSetMixin)
 from geotrek.tourism.models import DataSource, InformationDesk
 from geotrek.trekking.models import Trek
 from geotrek.trekking.serializers import POISerializer
@@ -100,7 +101,7 @@ class TouristicContentList(MapEntityList):
         return TouristicContentCategory.objects.filter(pk__in=used)
 
 
-class TouristicContentFormatList(MapEntityFormat, TouristicContentList):
+class TouristicContentFormatList(PrefetchPropertiesFormatMixin, MapEntityFormat, TouristicContentList):
     columns = [
         'id', 'eid', 'name', 'category', 'type1', 'type2', 'description_teaser',
         'description', 'themes', 'contact', 'email', 'website', 'practical_info',
@@ -186,7 +187,7 @@ class TouristicEventList(MapEntityList):
     columns = ['id', 'name', 'type']
 
 
-class TouristicEventFormatList(MapEntityFormat, TouristicEventList):
+class TouristicEventFormatList(PrefetchPropertiesFormatMixin, MapEntityFormat, TouristicEventList):
     columns = [
         'id', 'eid', 'name', 'type', 'description_teaser', 'description', 'themes',
         'begin_date', 'end_date', 'duration', 'meeting_point', 'meeting_time',
@@ -251,7 +252,7 @@ class TouristicEventDocumentPublic(DocumentPublic):
         return context
 
 
-class TouristicContentViewSet(MapEntityViewSet):
+class TouristicContentViewSet(PrefetchPropertiesViewSetMixin, MapEntityViewSet):
     model = TouristicContent
     serializer_class = TouristicContentSerializer
     permission_classes = [rest_permissions.DjangoModelPermissionsOrAnonReadOnly]
@@ -263,7 +264,7 @@ class TouristicContentViewSet(MapEntityViewSet):
         return qs
 
 
-class TouristicEventViewSet(MapEntityViewSet):
+class TouristicEventViewSet(PrefetchPropertiesViewSetMixin, MapEntityViewSet):
     model = TouristicEvent
     serializer_class = TouristicEventSerializer
     permission_classes = [rest_permissions.DjangoModelPermissionsOrAnonReadOnly]
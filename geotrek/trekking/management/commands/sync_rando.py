@@ -80,6 +80,10 @@ class Command(BaseCommand):
                     default=False, help='Skip generation of zip tiles files'),
         make_option('--skip-dem', '-d', action='store_true', dest='skip_dem',
                     default=False, help='Skip generation of DEM files for mobile app'),
+        make_option('--compact-dem', '-c', action='store_true', dest='compact_dem',
+                    default=False, help='Generate DEM files with compact altitudes (base64 of int16)'),
+        make_option('--profile-points', action='store', type='int', dest='profile_points',
+                    default=None, help='Simplify elevation profiles to this number of points'),
     )
 
     def mkdirs(self, name):
@@ -208,7 +212,8 @@ class Command(BaseCommand):
 
     def sync_profile_json(self, lang, obj, zipfile=None):
         view = ElevationProfile.as_view(model=type(obj))
-        self.sync_object_view(lang, obj, view, 'profile.json', zipfile=zipfile)
+        url = '/?points=%s' % self.profile_points if self.profile_points else '/'
+        self.sync_object_view(lang, obj, view, 'profile.json', zipfile=zipfile, url=url)
 
     def sync_profile_png(self, lang, obj, zipfile=None):
         view = serve_elevation_chart
@@ -219,7 +224,8 @@ class Command(BaseCommand):
         if self.skip_dem:
             return
         view = ElevationArea.as_view(model=type(obj))
-        self.sync_object_view(lang, obj, view, 'dem.json')
+        url = '/?compact=1' if self.compact_dem else '/'
+        self.sync_object_view(lang, obj, view, 'dem.json', url=url)
 
     def sync_gpx(self, lang, obj):
         self.sync_object_view(lang, obj, TrekGPXDetail.as_view(), '{obj.slug}.gpx')
@@ -376,6 +382,8 @@ class Command(BaseCommand):
         self.skip_pdf = options['skip_pdf']
         self.skip_tiles = options['skip_tiles']
         self.skip_dem = options['skip_dem']
+        self.compact_dem = options['compact_dem']
+        self.profile_points = options['profile_points']
         self.builder_args = {
             'tiles_url': settings.MOBILE_TILES_URL,
             'tiles_headers': {"Referer": self.referer},
@@ -9,14 +9,15 @@ from django.template.defaultfilters import slugify
 from django.utils.translation import get_language, ugettext_lazy as _
 
 import simplekml
-from mapentity.models import MapEntityMixin
 from mapentity.serializers import plain_text
 
 from geotrek.authent.models import StructureRelated
+from geotrek.core.helpers import TopologyHelper, PathHelper
 from geotrek.core.models import Path, Topology
-from geotrek.common.utils import intersecting, classproperty
+from geotrek.common.utils import intersecting, intersecting_many, classproperty
 from geotrek.common.mixins import (PicturesMixin, PublishableMixin,
-                                   PictogramMixin, OptionalPictogramMixin)
+                                   PictogramMixin, OptionalPictogramMixin,
+                                   MapEntityMixin)
 from geotrek.common.models import Theme
 from geotrek.maintenance.models import Intervention, Project
 from geotrek.tourism import models as tourism_models
@@ -210,6 +211,16 @@ class Trek(StructureRelated, PicturesMixin, PublishableMixin, MapEntityMixin, To
             qs = cls.objects.existing().filter(geom__intersects=area)
         return qs
 
+    @classmethod
+    def path_treks_many(cls, paths):
+        return PathHelper.topologies_many(cls.objects.existing(), paths)
+
+    @classmethod
+    def topology_treks_many(cls, topologies):
+        if settings.TREKKING_TOPOLOGY_ENABLED:
+            return TopologyHelper.overlapping_many(cls.objects.existing(), topologies)
+        return intersecting_many(cls, topologies, distance=settings.TREK_POI_INTERSECTION_MARGIN)
+
     @classmethod
     def published_topology_treks(cls, topology):
         return cls.topology_treks(topology).filter(published=True)
@@ -283,13 +294,14 @@ class Trek(StructureRelated, PicturesMixin, PublishableMixin, MapEntityMixin, To
             return super(Trek, self).save(update_fields=field_names, *args, **kwargs)
         super(Trek, self).save(*args, **kwargs)
 
-Path.add_property('treks', Trek.path_treks, _(u"Treks"))
-Topology.add_property('treks', Trek.topology_treks, _(u"Treks"))
+Path.add_property('treks', Trek.path_treks, _(u"Treks"), prefetch=Trek.path_treks_many)
+Topology.add_property('treks', Trek.topology_treks, _(u"Treks"), prefetch=Trek.topology_treks_many)
 if settings.HIDE_PUBLISHED_TREKS_IN_TOPOLOGIES:
     Topology.add_property('published_treks', lambda self: [], _(u"Published treks"))
 else:
     Topology.add_property('published_treks', lambda self: intersecting(Trek, self).filter(published=True), _(u"Published treks"))
-Intervention.add_property('treks', lambda self: self.topology.treks if self.topology else [], _(u"Treks"))
+Intervention.add_property('treks', lambda self: self.topology.treks if self.topology else [], _(u"Treks"),
+                          prefetch=Intervention.topology_property_prefetch('treks'))
 Project.add_property('treks', lambda self: self.edges_by_attr('treks'), _(u"Treks"))
 tourism_models.TouristicContent.add_property('treks', lambda self: intersecting(Trek, self), _(u"Treks"))
 tourism_models.TouristicContent.add_property('published_treks', lambda self: intersecting(Trek, self).filter(published=True), _(u"Published treks"))
@@ -6,6 +6,7 @@ from django.core.exceptions import ValidationError
 from bs4 import BeautifulSoup
 
 from geotrek.common.tests import TranslationResetMixin
+from geotrek.common.utils import dbnow
 from geotrek.core.factories import PathFactory, PathAggregationFactory
 from geotrek.zoning.factories import DistrictFactory, CityFactory
 from geotrek.trekking.factories import (POIFactory, TrekFactory,
@@ -32,6 +33,15 @@ class TrekTest(TranslationResetMixin, TestCase):
         self.assertFalse(t.has_geom_valid())
         self.assertFalse(t.is_publishable())
 
+    def test_latest_updated_after_hard_delete(self):
+        trek = TrekFactory.create()
+        trek.name = 'Changed'
+        trek.save(update_fields=['name'])
+        t1 = dbnow()
+        self.assertTrue(t1 > Trek.latest_updated())
+        trek.delete(force=True)
+        self.assertFalse(t1 > Trek.latest_updated())
+
     def test_any_published_property(self):
         t = TrekFactory.create(published=False)
         t.published_fr = False
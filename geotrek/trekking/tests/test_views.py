@@ -413,6 +413,22 @@ class TrekCustomPublicViewTests(TrekkingManagerTest):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 403)
 
+    def test_simplified_profile_json(self):
+        trek = TrekFactory.create(published=True)
+        url = '/api/en/treks/{pk}/profile.json?points=2'.format(pk=trek.pk)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)['profile']), 2)
+
+    def test_simplified_profile_json_invalid_parameters(self):
+        trek = TrekFactory.create(published=True)
+        url = '/api/en/treks/{pk}/profile.json'.format(pk=trek.pk)
+        full = json.loads(self.client.get(url).content)['profile']
+        for query in ('tolerance=nan', 'tolerance=inf', 'tolerance=-1', 'points=-1', 'points=abc'):
+            response = self.client.get(url + '?' + query)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.content)['profile'], full)
+
     def test_elevation_area_json(self):
         trek = TrekFactory.create(published=True)
         url = '/api/en/treks/{pk}/dem.json'.format(pk=trek.pk)
@@ -22,8 +22,8 @@ from geotrek.core.views import CreateFromTopologyMixin
 
 from geotrek.authent.decorators import same_structure_required
 from geotrek.common.utils import plain_text_preserve_linebreaks
-from geotrek.common.views import FormsetMixin, PublicOrReadPermMixin, DocumentPublic
-from geotrek.zoning.models import District, City, RestrictedArea
+from geotrek.common.views import (FormsetMixin, PublicOrReadPermMixin, DocumentPublic,
+                                  PrefetchPropertiesFormatMixin, PrefetchPropertiesViewSetMixin)
 
 from .models import Trek, POI, WebLink, Service
 from .filters import TrekFilterSet, POIFilterSet, ServiceFilterSet
@@ -94,7 +94,7 @@ class TrekJsonList(MapEntityJsonList, TrekList):
     pass
 
 
-class TrekFormatList(MapEntityFormat, TrekList):
+class TrekFormatList(PrefetchPropertiesFormatMixin, MapEntityFormat, TrekList):
     columns = [
         'id', 'eid', 'eid2', 'name', 'departure', 'arrival', 'duration',
         'duration_pretty', 'description', 'description_teaser',
@@ -262,7 +262,7 @@ class POIJsonList(MapEntityJsonList, POIList):
     pass
 
 
-class POIFormatList(MapEntityFormat, POIList):
+class POIFormatList(PrefetchPropertiesFormatMixin, MapEntityFormat, POIList):
     columns = [
         'id', 'eid', 'name', 'type', 'description', 'treks',
         'review', 'published', 'publication_date',
@@ -272,35 +272,6 @@ class POIFormatList(MapEntityFormat, POIList):
 
     set(POIList.columns + ['description', 'treks', 'districts', 'cities', 'areas', 'structure'])
 
-    def get_queryset(self):
-        qs = super(POIFormatList, self).get_queryset()
-
-        denormalized = {}
-
-        # Since Land layers should have less records, start by them.
-        land_layers = [('districts', District),
-                       ('cities', City),
-                       ('areas', RestrictedArea)]
-        for attrname, land_layer in land_layers:
-            denormalized[attrname] = {}
-            for d in land_layer.objects.all():
-                overlapping = POI.objects.existing().filter(geom__within=d.geom)
-                for pid in overlapping.values_list('id', flat=True):
-                    denormalized[attrname].setdefault(pid, []).append(d)
-
-        # Same for treks
-        denormalized['treks'] = {}
-        for d in Trek.objects.existing():
-            for pid in d.pois.all():
-                denormalized['treks'].setdefault(pid, []).append(d)
-
-        for poi in qs:
-            # Put denormalized in specific attribute used in serializers
-            for attrname in denormalized.keys():
-                overlapping = denormalized[attrname].get(poi.id, [])
-                setattr(poi, '%s_csv_display' % attrname, overlapping)
-            yield poi
-
 
 class POIDetail(MapEntityDetail):
     queryset = POI.objects.existing()
@@ -361,7 +332,7 @@ class WebLinkCreatePopup(CreateView):
         """ % (escape(form.instance._get_pk_val()), escape(form.instance)))
 
 
-class TrekViewSet(MapEntityViewSet):
+class TrekViewSet(PrefetchPropertiesViewSetMixin, MapEntityViewSet):
     model = Trek
     serializer_class = TrekSerializer
     permission_classes = [rest_permissions.DjangoModelPermissionsOrAnonReadOnly]
@@ -373,7 +344,7 @@ class TrekViewSet(MapEntityViewSet):
         return qs
 
 
-class POIViewSet(MapEntityViewSet):
+class POIViewSet(PrefetchPropertiesViewSetMixin, MapEntityViewSet):
     model = POI
     serializer_class = POISerializer
     permission_classes = [rest_permissions.DjangoModelPermissionsOrAnonReadOnly]
@@ -415,7 +386,7 @@ class ServiceJsonList(MapEntityJsonList, ServiceList):
     pass
 
 
-class ServiceFormatList(MapEntityFormat, ServiceList):
+class ServiceFormatList(PrefetchPropertiesFormatMixin, MapEntityFormat, ServiceList):
     columns = [
         'id', 'eid', 'type'
     ] + AltimetryMixin.COLUMNS
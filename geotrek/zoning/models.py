@@ -10,12 +10,20 @@ from django.contrib.gis.db import models
 from django.conf import settings
 from django.utils.translation import ugettext_lazy as _
 
-from geotrek.common.utils import uniquify, intersecting
+from geotrek.common.utils import uniquify, intersecting, intersecting_many
+from geotrek.core.helpers import TopologyHelper, PathHelper
 from geotrek.core.models import Topology, Path
 from geotrek.maintenance.models import Intervention, Project
 from geotrek.tourism.models import TouristicContent, TouristicEvent
 
 
+def unique_intersecting_many(cls, topologies):
+    """ Same as ``uniquify(intersecting())`` for several topologies at once
+    (c.f. ``intersecting_many()``).
+    """
+    return dict((pk, uniquify(values)) for pk, values in intersecting_many(cls, topologies, distance=0).items())
+
+
 class RestrictedAreaType(models.Model):
     name = models.CharField(max_length=200, verbose_name=_(u"Name"), db_column='nom')
 
@@ -80,21 +88,40 @@ class RestrictedAreaEdge(Topology):
                   .select_related('restricted_area')\
                   .select_related('restricted_area__area_type')
 
+    @classmethod
+    def path_area_edges_many(cls, paths):
+        qs = cls.objects.existing().select_related('restricted_area__area_type')
+        return PathHelper.topologies_many(qs, paths)
+
+    @classmethod
+    def topology_area_edges_many(cls, topologies):
+        qs = cls.objects.existing().select_related('restricted_area__area_type')
+        return TopologyHelper.overlapping_many(qs, topologies)
+
 
 if settings.TREKKING_TOPOLOGY_ENABLED:
-    Path.add_property('area_edges', RestrictedAreaEdge.path_area_edges, _(u"Restricted area edges"))
-    Path.add_property('areas', lambda self: uniquify(map(attrgetter('restricted_area'), self.area_edges)), _(u"Restricted areas"))
-    Topology.add_property('area_edges', RestrictedAreaEdge.topology_area_edges, _(u"Restricted area edges"))
-    Topology.add_property('areas', lambda self: uniquify(map(attrgetter('restricted_area'), self.area_edges)), _(u"Restricted areas"))
-    Intervention.add_property('area_edges', lambda self: self.topology.area_edges if self.topology else [], _(u"Restricted area edges"))
-    Intervention.add_property('areas', lambda self: self.topology.areas if self.topology else [], _(u"Restricted areas"))
+    Path.add_property('area_edges', RestrictedAreaEdge.path_area_edges, _(u"Restricted area edges"),
+                      prefetch=RestrictedAreaEdge.path_area_edges_many)
+    Path.add_property('areas', lambda self: uniquify(map(attrgetter('restricted_area'), self.area_edges)), _(u"Restricted areas"),
+                      prefetch=['area_edges'])
+    Topology.add_property('area_edges', RestrictedAreaEdge.topology_area_edges, _(u"Restricted area edges"),
+                          prefetch=RestrictedAreaEdge.topology_area_edges_many)
+    Topology.add_property('areas', lambda self: uniquify(map(attrgetter('restricted_area'), self.area_edges)), _(u"Restricted areas"),
+                          prefetch=['area_edges'])
+    Intervention.add_property('area_edges', lambda self: self.topology.area_edges if self.topology else [], _(u"Restricted area edges"),
+                              prefetch=Intervention.topology_property_prefetch('area_edges'))
+    Intervention.add_property('areas', lambda self: self.topology.areas if self.topology else [], _(u"Restricted areas"),
+                              prefetch=Intervention.topology_property_prefetch('areas'))
     Project.add_property('area_edges', lambda self: self.edges_by_attr('area_edges'), _(u"Restricted area edges"))
     Project.add_property('areas', lambda self: uniquify(map(attrgetter('restricted_area'), self.area_edges)), _(u"Restricted areas"))
 else:
-    Topology.add_property('areas', lambda self: uniquify(intersecting(RestrictedArea, self, distance=0)), _(u"Restricted areas"))
+    Topology.add_property('areas', lambda self: uniquify(intersecting(RestrictedArea, self, distance=0)), _(u"Restricted areas"),
+                          prefetch=lambda topologies: unique_intersecting_many(RestrictedArea, topologies))
 
-TouristicContent.add_property('areas', lambda self: intersecting(RestrictedArea, self, distance=0), _(u"Restricted areas"))
-TouristicEvent.add_property('areas', lambda self: intersecting(RestrictedArea, self, distance=0), _(u"Restricted areas"))
+TouristicContent.add_property('areas', lambda self: intersecting(RestrictedArea, self, distance=0), _(u"Restricted areas"),
+                              prefetch=lambda contents: intersecting_many(RestrictedArea, contents, distance=0))
+TouristicEvent.add_property('areas', lambda self: intersecting(RestrictedArea, self, distance=0), _(u"Restricted areas"),
+                            prefetch=lambda events: intersecting_many(RestrictedArea, events, distance=0))
 
 
 class City(models.Model):
@@ -140,21 +167,38 @@ class CityEdge(Topology):
     def topology_city_edges(cls, topology):
         return cls.overlapping(topology).select_related('city')
 
+    @classmethod
+    def path_city_edges_many(cls, paths):
+        return PathHelper.topologies_many(cls.objects.existing().select_related('city'), paths)
+
+    @classmethod
+    def topology_city_edges_many(cls, topologies):
+        return TopologyHelper.overlapping_many(cls.objects.existing().select_related('city'), topologies)
+
 
 if settings.TREKKING_TOPOLOGY_ENABLED:
-    Path.add_property('city_edges', CityEdge.path_city_edges, _(u"City edges"))
-    Path.add_property('cities', lambda self: uniquify(map(attrgetter('city'), self.city_edges)), _(u"Cities"))
-    Topology.add_property('city_edges', CityEdge.topology_city_edges, _(u"City edges"))
-    Topology.add_property('cities', lambda self: uniquify(map(attrgetter('city'), self.city_edges)), _(u"Cities"))
-    Intervention.add_property('city_edges', lambda self: self.topology.city_edges if self.topology else [], _(u"City edges"))
-    Intervention.add_property('cities', lambda self: self.topology.cities if self.topology else [], _(u"Cities"))
+    Path.add_property('city_edges', CityEdge.path_city_edges, _(u"City edges"),
+                      prefetch=CityEdge.path_city_edges_many)
+    Path.add_property('cities', lambda self: uniquify(map(attrgetter('city'), self.city_edges)), _(u"Cities"),
+                      prefetch=['city_edges'])
+    Topology.add_property('city_edges', CityEdge.topology_city_edges, _(u"City edges"),
+                          prefetch=CityEdge.topology_city_edges_many)
+    Topology.add_property('cities', lambda self: uniquify(map(attrgetter('city'), self.city_edges)), _(u"Cities"),
+                          prefetch=['city_edges'])
+    Intervention.add_property('city_edges', lambda self: self.topology.city_edges if self.topology else [], _(u"City edges"),
+                              prefetch=Intervention.topology_property_prefetch('city_edges'))
+    Intervention.add_property('cities', lambda self: self.topology.cities if self.topology else [], _(u"Cities"),
+                              prefetch=Intervention.topology_property_prefetch('cities'))
     Project.add_property('city_edges', lambda self: self.edges_by_attr('city_edges'), _(u"City edges"))
     Project.add_property('cities', lambda self: uniquify(map(attrgetter('city'), self.city_edges)), _(u"Cities"))
 else:
-    Topology.add_property('cities', lambda self: uniquify(intersecting(City, self, distance=0)), _(u"Cities"))
+    Topology.add_property('cities', lambda self: uniquify(intersecting(City, self, distance=0)), _(u"Cities"),
+                          prefetch=lambda topologies: unique_intersecting_many(City, topologies))
 
-TouristicContent.add_property('cities', lambda self: intersecting(City, self, distance=0), _(u"Cities"))
-TouristicEvent.add_property('cities', lambda self: intersecting(City, self, distance=0), _(u"Cities"))
+TouristicContent.add_property('cities', lambda self: intersecting(City, self, distance=0), _(u"Cities"),
+                              prefetch=lambda contents: intersecting_many(City, contents, distance=0))
+TouristicEvent.add_property('cities', lambda self: intersecting(City, self, distance=0), _(u"Cities"),
+                            prefetch=lambda events: intersecting_many(City, events, distance=0))
 
 
 class District(models.Model):
@@ -198,18 +242,35 @@ class DistrictEdge(Topology):
     def topology_district_edges(cls, topology):
         return cls.overlapping(topology).select_related('district')
 
+    @classmethod
+    def path_district_edges_many(cls, paths):
+        return PathHelper.topologies_many(cls.objects.existing().select_related('district'), paths)
+
+    @classmethod
+    def topology_district_edges_many(cls, topologies):
+        return TopologyHelper.overlapping_many(cls.objects.existing().select_related('district'), topologies)
+
 
 if settings.TREKKING_TOPOLOGY_ENABLED:
-    Path.add_property('district_edges', DistrictEdge.path_district_edges, _(u"District edges"))
-    Path.add_property('districts', lambda self: uniquify(map(attrgetter('district'), self.district_edges)), _(u"Districts"))
-    Topology.add_property('district_edges', DistrictEdge.topology_district_edges, _(u"District edges"))
-    Topology.add_property('districts', lambda self: uniquify(map(attrgetter('district'), self.district_edges)), _(u"Districts"))
-    Intervention.add_property('district_edges', lambda self: self.topology.district_edges if self.topology else [], _(u"District edges"))
-    Intervention.add_property('districts', lambda self: self.topology.districts if self.topology else [], _(u"Districts"))
+    Path.add_property('district_edges', DistrictEdge.path_district_edges, _(u"District edges"),
+                      prefetch=DistrictEdge.path_district_edges_many)
+    Path.add_property('districts', lambda self: uniquify(map(attrgetter('district'), self.district_edges)), _(u"Districts"),
+                      prefetch=['district_edges'])
+    Topology.add_property('district_edges', DistrictEdge.topology_district_edges, _(u"District edges"),
+                          prefetch=DistrictEdge.topology_district_edges_many)
+    Topology.add_property('districts', lambda self: uniquify(map(attrgetter('district'), self.district_edges)), _(u"Districts"),
+                          prefetch=['district_edges'])
+    Intervention.add_property('district_edges', lambda self: self.topology.district_edges if self.topology else [], _(u"District edges"),
+                              prefetch=Intervention.topology_property_prefetch('district_edges'))
+    Intervention.add_property('districts', lambda self: self.topology.districts if self.topology else [], _(u"Districts"),
+                              prefetch=Intervention.topology_property_prefetch('districts'))
     Project.add_property('district_edges', lambda self: self.edges_by_attr('district_edges'), _(u"District edges"))
     Project.add_property('districts', lambda self: uniquify(map(attrgetter('district'), self.district_edges)), _(u"Districts"))
 else:
-    Topology.add_property('districts', lambda self: uniquify(intersecting(District, self, distance=0)), _(u"Districts"))
+    Topology.add_property('districts', lambda self: uniquify(intersecting(District, self, distance=0)), _(u"Districts"),
+                          prefetch=lambda topologies: unique_intersecting_many(District, topologies))
 
-TouristicContent.add_property('districts', lambda self: intersecting(District, self, distance=0), _(u"Districts"))
-TouristicEvent.add_property('districts', lambda self: intersecting(District, self, distance=0), _(u"Districts"))
+TouristicContent.add_property('districts', lambda self: intersecting(District, self, distance=0), _(u"Districts"),
+                              prefetch=lambda contents: intersecting_many(District, contents, distance=0))
+TouristicEvent.add_property('districts', lambda self: intersecting(District, self, distance=0), _(u"Districts"),
+                            prefetch=lambda events: intersecting_many(District, events, distance=0))
@@ -1,9 +1,11 @@
 from django.test import TestCase
+from django.db.models.query import QuerySet
 from django.conf import settings
 from django.contrib.gis.geos import LineString, Polygon, MultiPolygon
 
-from geotrek.core.models import Topology
-from geotrek.core.factories import PathFactory
+from geotrek.common.mixins import prefetch_properties
+from geotrek.core.models import Topology, Path
+from geotrek.core.factories import PathFactory, TopologyFactory
 from geotrek.land.tests.test_views import EdgeHelperTest
 from geotrek.zoning.models import City
 from geotrek.zoning.factories import (DistrictEdgeFactory, CityEdgeFactory,
@@ -168,3 +170,49 @@ class LandLayersUpdateTest(TestCase):
         self.assertEquals(Topology.objects.filter(pk=t_ra1.pk).count(), 0)
         self.assertEquals(ra2.restrictedareaedge_set.count(), 0)
         self.assertEquals(Topology.objects.filter(pk=t_ra2.pk).count(), 0)
+
+
+class PrefetchPropertiesTest(TestCase):
+
+    def setUp(self):
+        self.c1 = City.objects.create(code='005177', name='Trifouillis-les-oies',
+                                      geom=MultiPolygon(Polygon(((0, 0), (2, 0), (2, 4), (0, 4), (0, 0)),
+                                                                srid=settings.SRID)))
+        self.c2 = City.objects.create(code='005179', name='Trifouillis-les-poules',
+                                      geom=MultiPolygon(Polygon(((2, 0), (5, 0), (5, 4), (2, 4), (2, 0)),
+                                                                srid=settings.SRID)))
+        self.p1 = PathFactory.create(geom=LineString((0, 1), (1, 1)))
+        self.p2 = PathFactory.create(geom=LineString((1, 1), (3, 1)))
+        self.p3 = PathFactory.create(geom=LineString((3, 1), (4, 1)))
+
+    def test_paths_cities_are_prefetched(self):
+        paths = prefetch_properties(Path.objects.filter(pk__in=[self.p1.pk, self.p2.pk, self.p3.pk]).order_by('pk'),
+                                    ['cities', 'name'])
+        with self.assertNumQueries(0):
+            self.assertEqual([p.cities for p in paths], [[self.c1], [self.c1, self.c2], [self.c2]])
+
+    def test_topologies_cities_are_prefetched(self):
+        t1 = TopologyFactory.create(no_path=True)
+        t1.add_path(self.p3, order=0)
+        t1.add_path(self.p2, start=1, end=0, order=1)
+        t2 = TopologyFactory.create(no_path=True)
+        t2.add_path(self.p1)
+        expected = [list(Topology.objects.get(pk=t.pk).cities) for t in (t1, t2)]
+        topologies = prefetch_properties(Topology.objects.filter(pk__in=[t1.pk, t2.pk]).order_by('-pk'),
+                                         ['cities'])
+        with self.assertNumQueries(0):
+            self.assertEqual([t.cities for t in topologies], [[self.c1], [self.c2, self.c1]])
+        self.assertEqual([t.cities for t in topologies], expected[::-1])
+
+    def test_prefetched_querysets_are_evaluated(self):
+        paths = prefetch_properties(Path.objects.filter(pk=self.p2.pk), ['city_edges'])
+        self.assertTrue(isinstance(paths, QuerySet))
+        with self.assertNumQueries(0):
+            edges = paths[0].city_edges
+            self.assertTrue(isinstance(edges, QuerySet))
+            self.assertEqual(len(edges), 2)
+        self.assertEqual(set(edges), set(Path.objects.get(pk=self.p2.pk).city_edges))
+        # Clones query the database
+        first = list(edges)[0]
+        with self.assertNumQueries(1):
+            self.assertEqual(list(edges.filter(pk=first.pk)), [first])